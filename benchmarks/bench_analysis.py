@@ -0,0 +1,92 @@
+"""AI analysis of large note selections against a stub model: latency and prompt tokens.
+
+The stub answers every request after --base-delay plus --token-delay per prompt token, so a long
+prompt costs what it would upstream. "single prompt" is the old behaviour: every selected note
+joined into one request. "map-reduce" is AIService.prepare_analysis, which summarizes chunks of
+at most AI_CHUNK_TOKENS in parallel first. "+1 note" repeats it after one more note is added; the
+chunk summaries cached by the first run are reused. The largest single request is what has to fit
+the model's context.
+
+Run from the directory that contains the Note_bot checkout:
+    python -m Note_bot.benchmarks.bench_analysis --notes 500 2000
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from Note_bot.benchmarks.corpus import generate_notes
+from Note_bot.main.data.Storage import MemoryStorage
+from Note_bot.main.data.UserDataManager import UserDataManager
+from Note_bot.main.service.AIService import AIService, estimate_tokens
+
+
+class StubModel(BaseHTTPRequestHandler):
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        tokens = sum(estimate_tokens(message["content"]) for message in request["messages"])
+        with self.server.lock:
+            self.server.largest = max(self.server.largest, tokens)
+        time.sleep(self.server.base_delay + tokens * self.server.token_delay)
+        body = json.dumps({"choices": [{"message": {"content": "Кратко: планы, покупки, встречи и звонки."}}]})
+        body = body.encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--notes', type=int, nargs='+', default=[500, 2000])
+    parser.add_argument('--base-delay', type=float, default=0.3)
+    parser.add_argument('--token-delay', type=float, default=0.00005)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubModel)
+    server.base_delay, server.token_delay = args.base_delay, args.token_delay
+    server.lock, server.largest = threading.Lock(), 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    os.environ.update({"API_KEY": "bench", "API_URL": f"http://127.0.0.1:{server.server_port}/", "AI_CACHE_DIR": ""})
+
+    for count in args.notes:
+        user_data = UserDataManager(MemoryStorage())
+        for text in generate_notes(count):
+            user_data.add_note(1, text)
+        numbers = ",".join(str(number) for number in range(1, count + 1))
+
+        ai_service = AIService(user_data)
+        notes_text = " ".join(text for _, text in sorted(user_data.get_user_notes(1).items()))
+        single = {"model": ai_service.MODEL, "messages": [
+            {"role": "user", "content": f"Проанализируйте следующие заметки: {notes_text}."}
+        ]}
+        server.largest = 0
+        started = time.perf_counter()
+        ai_service.request_completion(single)
+        elapsed, tokens = time.perf_counter() - started, ai_service.prompt_tokens
+        print(f"{count} notes  single prompt  {elapsed:6.2f} s  {tokens:8} prompt tokens"
+              f"  largest request {server.largest}")
+
+        for label in ("map-reduce", "+1 note"):
+            if label == "+1 note":
+                user_data.add_note(1, "ещё одна заметка про отчёт")
+                numbers += f",{count + 1}"
+            ai_service.prompt_tokens = server.largest = 0
+            started = time.perf_counter()
+            payload, _ = ai_service.prepare_analysis(1, numbers)
+            ai_service.request_completion(payload)
+            print(f"{count} notes  {label:13}  {time.perf_counter() - started:6.2f} s  {ai_service.prompt_tokens:8}"
+                  f" prompt tokens  largest request {server.largest}")
+        ai_service.map_executor.shutdown()
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""Chart render latency and memory: the matplotlib process pool against the fast PNG renderer.
+
+Each renderer draws the 7- and 30-day charts through ChartRenderer, as the bot does. RSS is read from
+/proc: for matplotlib it is the pool workers, for the fast renderer the growth of this process. The
+import time of NoteBot shows that neither renderer is loaded at start-up.
+
+Run from the directory that contains the Note_bot checkout:
+    python -m Note_bot.benchmarks.bench_charts
+"""
+import argparse
+import asyncio
+import importlib.util
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+from Note_bot.main.ui.ChartRenderer import ChartRenderer
+
+
+def rss_mb(pid="self"):
+    with open(f"/proc/{pid}/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def chart_data(days, rng):
+    dates = [f"01-{day + 1:02d}" for day in range(days)]
+    return dates, *([rng.randrange(20) for _ in range(days)] for _ in range(3))
+
+
+async def measure(renderer, renders):
+    rng = random.Random(1)
+    latencies = {}
+    await renderer.render(*chart_data(7, rng))  # first render loads the backend
+    for _ in range(renders):
+        for days in (7, 30):
+            started = time.perf_counter()
+            await renderer.render(*chart_data(days, rng))
+            latencies.setdefault(days, []).append(time.perf_counter() - started)
+    return latencies
+
+
+def import_time():
+    code = ("import sys, time; started = time.perf_counter(); import Note_bot.main.NoteBot; "
+            "print(time.perf_counter() - started, 'matplotlib' in sys.modules)")
+    # Run from the same directory, so the fresh interpreter finds Note_bot the same way.
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    seconds, loaded = result.stdout.split()
+    return float(seconds), loaded == "True"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--renders', type=int, default=20)
+    parser.add_argument('--workers', type=int, default=2)
+    args = parser.parse_args()
+
+    seconds, loaded = import_time()
+    print(f"import NoteBot: {seconds * 1000:.0f} ms, matplotlib loaded: {loaded}")
+
+    modes = ["fast"]
+    if importlib.util.find_spec("matplotlib"):
+        modes.append("matplotlib")
+    else:
+        print("matplotlib is not installed; only the fast renderer is measured")
+
+    for mode in modes:
+        renderer = ChartRenderer(mode=mode, max_workers=args.workers)
+        before = rss_mb()
+        latencies = asyncio.run(measure(renderer, args.renders))
+        if mode == "matplotlib":
+            memory = sum(rss_mb(pid) for pid in renderer.executor._processes)
+            memory_label = f"workers RSS {memory:.0f} MB"
+        else:
+            memory_label = f"RSS growth {rss_mb() - before:.1f} MB"
+        for days, values in sorted(latencies.items()):
+            print(f"{mode:10} {days:2} days  median {statistics.median(values) * 1000:7.1f} ms"
+                  f"  max {max(values) * 1000:7.1f} ms")
+        print(f"{mode:10} {memory_label}")
+        renderer.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Memory for idle chats parked in a multi-step flow, and the cost of expiring them.
+
+Every chat has opened the notes page and is waiting for a note number. "next_steps" is the old
+layout: a bound step handler with its arguments in NoteBot.next_steps plus the page in current_page,
+never expired. "tuples" keeps (state, arg, expires_at) per chat, as the storage layer does.
+"ChatStates" is the packed int per chat that UserDataManager keeps. Memory is what tracemalloc
+sees allocated for the structure; chat ids are real-sized Telegram ids.
+
+Run from the directory that contains the Note_bot checkout:
+    python -m Note_bot.benchmarks.bench_chat_states --chats 1000000
+"""
+import argparse
+import gc
+import time
+import tracemalloc
+
+from Note_bot.main.data.ChatStates import EDIT_SELECT, ChatStates
+from Note_bot.main.data.Storage import MemoryStorage
+
+FIRST_CHAT_ID = 5_000_000_000
+
+
+class StepHandlers:
+    def edit_note_step2(self, message, page):
+        pass
+
+
+def next_steps(chat_ids, now):
+    handlers = StepHandlers()
+    steps, pages = {}, {}
+    for chat_id in chat_ids:
+        steps[chat_id] = (handlers.edit_note_step2, (3,))
+        pages[chat_id] = 3
+    return steps, pages
+
+
+def tuples(chat_ids, now):
+    return {chat_id: (EDIT_SELECT, 3, int(now) + 1800 + index * 600 // len(chat_ids)) for index, chat_id in enumerate(chat_ids)}
+
+
+def chat_states(chat_ids, now):
+    states = ChatStates()
+    for index, chat_id in enumerate(chat_ids):
+        # Chats arrive over ten minutes, in order, as the live updates do.
+        states.set(chat_id, EDIT_SELECT, 3, now=now + index * 600 // len(chat_ids))
+    return states
+
+
+def measure(build, chat_ids, now):
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    structure = build(chat_ids, now)
+    elapsed = time.perf_counter() - started
+    allocated = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return structure, allocated, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--chats', type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    now = time.time()
+    chat_ids = range(FIRST_CHAT_ID, FIRST_CHAT_ID + args.chats)
+    for label, build in (("next_steps", next_steps), ("tuples", tuples), ("ChatStates", chat_states)):
+        structure, allocated, elapsed = measure(build, chat_ids, now)
+        print(f"{label:10}  {allocated / 2**20:7.1f} MB  {allocated / args.chats:5.0f} B/chat"
+              f"  built in {elapsed:.2f} s")
+        del structure
+
+    states, _, _ = measure(chat_states, chat_ids, now)
+    started = time.perf_counter()
+    expired = len(states.expire(now=now + 1800 + 300))
+    print(f"expire()    {expired} chats in {(time.perf_counter() - started) * 1000:.0f} ms,"
+          f" a sweep with nothing due in", end=" ")
+    started = time.perf_counter()
+    states.expire(now=now)
+    print(f"{(time.perf_counter() - started) * 1e6:.0f} µs")
+
+    storage = MemoryStorage()
+    for chat_id, packed in states.states.items():
+        storage.save_chat_state(chat_id, *ChatStates.unpack(packed))
+    started = time.perf_counter()
+    restored = ChatStates()
+    for row in storage.load_chat_states(now):
+        restored.restore(*row)
+    print(f"restore     {len(restored.states)} chats from storage in {time.perf_counter() - started:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
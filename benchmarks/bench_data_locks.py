@@ -0,0 +1,44 @@
+"""Mixed handler load from many threads with one global lock versus striped per-chat locks.
+
+Run from the directory that contains the Note_bot checkout:
+    python -m Note_bot.benchmarks.bench_data_locks
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+from Note_bot.main.data.Storage import MemoryStorage, SQLiteStorage
+from Note_bot.main.data.UserDataManager import UserDataManager
+from Note_bot.main.service.NoteService import NoteManager
+from Note_bot.main.service.ReminderScheduler import ReminderScheduler
+from Note_bot.benchmarks.load import run_mixed_load
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--operations', type=int, default=3000)
+    parser.add_argument('--chats', type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        for backend in ("memory", "sqlite"):
+            for stripes in (1, 64):
+                if backend == "memory":
+                    storage = MemoryStorage()
+                else:
+                    storage = SQLiteStorage(str(Path(directory) / f"bench{stripes}.db"))
+                user_data = UserDataManager(storage, lock_stripes=stripes)
+                note_manager = NoteManager(user_data, ReminderScheduler())
+
+                started = time.perf_counter()
+                errors, delivered = run_mixed_load(note_manager, user_data, args.threads, args.operations, args.chats)
+                elapsed = time.perf_counter() - started
+                user_data.close()
+                print(f"{backend:6} stripes={stripes:<3} {args.threads * args.operations / elapsed:8.0f} ops/s"
+                      f"  reminders={delivered}  errors={len(errors)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Deleting notes from one large user: stable ids against the old full renumbering.
+
+Run from the directory that contains the Note_bot checkout:
+    python -m Note_bot.benchmarks.bench_delete --notes 50000
+"""
+import argparse
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from Note_bot.benchmarks.corpus import generate_notes
+from Note_bot.main.data.Storage import MemoryStorage, SQLiteStorage
+from Note_bot.main.data.UserDataManager import UserDataManager
+from Note_bot.main.service.NoteService import NoteManager
+from Note_bot.main.service.ReminderScheduler import ReminderScheduler
+
+
+def renumbering_delete(notes, reminders, note_id):
+    # The old NoteManager.delete_note: renumber every note, then find each reminder's note again by its text.
+    notes.pop(note_id)
+    old_notes = dict(notes)
+    notes.clear()
+    for new_id, old_id in enumerate(sorted(old_notes), start=1):
+        notes[new_id] = old_notes[old_id]
+
+    new_reminders = []
+    for reminder_note_id, remind_time in reminders:
+        if reminder_note_id == note_id:
+            continue
+        new_id = next((key for key, text in notes.items() if old_notes.get(reminder_note_id) == text), None)
+        if new_id is not None:
+            new_reminders.append((new_id, remind_time))
+    return new_reminders
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--notes', type=int, default=50000)
+    parser.add_argument('--reminders', type=int, default=100)
+    parser.add_argument('--deletes', type=int, default=200)
+    args = parser.parse_args()
+
+    texts = generate_notes(args.notes)
+    rng = random.Random(1)
+    reminder_ids = rng.sample(range(1, args.notes + 1), args.reminders)
+    remind_time = datetime.now() + timedelta(days=1)
+
+    notes = dict(enumerate(texts, 1))
+    reminders = [(note_id, remind_time) for note_id in reminder_ids]
+    started = time.perf_counter()
+    for _ in range(args.deletes):
+        reminders = renumbering_delete(notes, reminders, rng.randint(1, len(notes)))
+    elapsed = time.perf_counter() - started
+    print(f"renumbering      {elapsed / args.deletes * 1000:9.3f} ms per delete")
+
+    with tempfile.TemporaryDirectory() as directory:
+        for name, storage in (("stable ids", MemoryStorage()),
+                              ("stable ids+sql", SQLiteStorage(str(Path(directory) / "bench.db")))):
+            user_data = UserDataManager(storage)
+            user_data.import_notes(1, [(text, None, None) for text in texts])
+            for note_id in reminder_ids:
+                user_data.add_reminder(1, note_id, remind_time)
+            note_manager = NoteManager(user_data, ReminderScheduler())
+            note_manager.search_notes(1, "отчёт")  # the index is kept current, not rebuilt
+
+            started = time.perf_counter()
+            for _ in range(args.deletes):
+                note_manager.delete_note(1, str(rng.randint(1, len(user_data.get_note_order(1)))))
+            elapsed = time.perf_counter() - started
+            print(f"{name:16} {elapsed / args.deletes * 1000:9.3f} ms per delete")
+            user_data.close()
+
+
+if __name__ == "__main__":
+    main()
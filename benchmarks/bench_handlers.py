@@ -0,0 +1,131 @@
+"""Load test of the asyncio runtime: handler latency with synthetic updates and a fake Telegram API.
+
+Updates go through UpdateDispatcher into NoteBot at a fixed arrival rate. Every Bot API call goes to a
+local fake server that adds --api-delay, like the round-trip to Telegram. A few users meanwhile ask for
+an AI analysis from a stub model that takes --llm-delay seconds, which must not hold up anyone else.
+Latency is measured per update, from its arrival to the end of its handler, and reported per kind.
+
+Run from the directory that contains the Note_bot checkout:
+    python -m Note_bot.benchmarks.bench_handlers --users 200 --rate 100
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+from aiohttp import web
+
+from Note_bot.benchmarks.fake_telegram import FakeTelegram, text_update
+
+FLOWS = {
+    "add": ["➕ Добавить заметку", "позвонить клиенту {step} завтра в 10:{minute:02d}"],
+    "list": ["📋 Показать список заметок"],
+    "search": ["🔍 Поиск по заметкам", "клиенту"],
+    "stats": ["📊 Статистика"],
+}
+SLOW_FLOW = ["🤖 Анализ от ИИ", "1,2,3"]
+
+
+def build_updates(users, rounds, slow_users):
+    # [(kind, update)] with each user's updates in order and users interleaved.
+    updates = []
+    for step in range(rounds):
+        for chat_id in range(1, users + 1):
+            flows = ["add"] if step < 3 else list(FLOWS)
+            kind = flows[(chat_id + step) % len(flows)]
+            texts = FLOWS[kind]
+            if step == 3 and chat_id <= slow_users:
+                kind, texts = "analysis", SLOW_FLOW
+            for text in texts:
+                update = text_update(len(updates) + 1, chat_id, text.format(step=step, minute=step % 60))
+                updates.append((kind, update))
+    return updates
+
+
+async def start_llm_stub(delay):
+    async def complete(request):
+        await asyncio.sleep(delay)
+        return web.json_response({"choices": [{"message": {"content": "Анализ готов"}}]})
+
+    app = web.Application()
+    app.router.add_post("/", complete)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    return runner, f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}/"
+
+
+async def run(args):
+    telegram = FakeTelegram(delay=args.api_delay)
+    os.environ["TELEGRAM_API_URL"] = await telegram.start()
+    llm, os.environ["API_URL"] = await start_llm_stub(args.llm_delay)
+
+    from Note_bot.main.NoteBot import NoteBot
+    from Note_bot.main.TelegramSession import configure_session
+    from Note_bot.main.UpdateDispatcher import UpdateDispatcher
+
+    note_bot = NoteBot()
+    asyncio.get_running_loop().set_default_executor(note_bot.executor)
+    configure_session()
+    dispatcher = UpdateDispatcher(note_bot.bot, workers=args.workers)
+    dispatcher.start()
+
+    updates = build_updates(args.users, args.rounds, args.slow_users)
+    kinds = {update["update_id"]: kind for kind, update in updates}
+    arrived, latencies = {}, {}
+    process_new_updates = note_bot.bot.process_new_updates
+
+    async def timed(new_updates):
+        try:
+            await process_new_updates(new_updates)
+        finally:
+            for update in new_updates:
+                latency = time.perf_counter() - arrived[update.update_id]
+                latencies.setdefault(kinds[update.update_id], []).append(latency)
+
+    note_bot.bot.process_new_updates = timed
+
+    started = time.perf_counter()
+    for number, (_, update) in enumerate(updates):
+        # Open loop: updates keep arriving on schedule however far behind the handlers are.
+        delay = started + number / args.rate - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        arrived[update["update_id"]] = time.perf_counter()
+        await dispatcher.put(update)
+    await dispatcher.stop()
+    elapsed = time.perf_counter() - started
+
+    print(f"{len(updates)} updates from {args.users} users in {elapsed:.1f} s, "
+          f"{sum(telegram.calls.values())} Bot API calls")
+    for kind, values in sorted(latencies.items()):
+        values.sort()
+        print(f"  {kind:9} n={len(values):<6} p50 {statistics.median(values) * 1000:8.1f} ms"
+              f"   p99 {values[int(len(values) * 0.99)] * 1000:8.1f} ms   max {values[-1] * 1000:8.1f} ms")
+
+    note_bot.ui_manager.chart_renderer.close()
+    note_bot.user_data.close()
+    await llm.cleanup()
+    await telegram.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--rounds', type=int, default=8)
+    parser.add_argument('--rate', type=float, default=100, help="updates arriving per second")
+    parser.add_argument('--workers', type=int, default=64)
+    parser.add_argument('--api-delay', type=float, default=0.02)
+    parser.add_argument('--slow-users', type=int, default=5)
+    parser.add_argument('--llm-delay', type=float, default=3.0)
+    args = parser.parse_args()
+
+    os.environ.update({"BOT_TOKEN": "1:bench", "STORAGE_BACKEND": "memory", "PREWARM": "0", "API_KEY": "bench",
+                       "AI_STREAMING": "0", "AI_CACHE_DIR": ""})
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""Bulk import of a large TXT file: notes per second and memory.
+
+The file has --lines notes from the benchmark corpus, a note per line, so some carry times and
+repeats. "one by one" is the old way in: NoteManager.add_note per note, timed on the first
+--add-lines lines. "import" is NoteManager.import_notes with IMPORT_WORKERS 0 (time extraction in
+the importing thread) and with --workers processes, into memory and SQLite storage. Memory is the
+tracemalloc peak: the parse pipeline alone must stay flat as the file grows, while a whole import
+also holds the staged notes, which end up in memory anyway.
+
+Run from the directory that contains the Note_bot checkout:
+    python -m Note_bot.benchmarks.bench_import --lines 100000
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+from types import SimpleNamespace
+
+from Note_bot.benchmarks.corpus import generate_notes
+from Note_bot.main.data.Storage import MemoryStorage, SQLiteStorage
+from Note_bot.main.data.UserDataManager import UserDataManager
+from Note_bot.main.service.NoteImporter import NoteImporter
+from Note_bot.main.service.NoteService import NoteManager
+from Note_bot.main.service.ReminderScheduler import ReminderScheduler
+
+
+def write_file(path, lines):
+    with open(path, "w", encoding="utf-8") as file:
+        for note_text in generate_notes(lines):
+            file.write(note_text + "\n")
+
+
+def note_manager(storage, importer):
+    note_manager = NoteManager(UserDataManager(storage), ReminderScheduler())
+    note_manager.importer = importer
+    return note_manager
+
+
+def one_by_one(path, lines):
+    manager = note_manager(MemoryStorage(), NoteImporter())
+    with open(path, encoding="utf-8") as file:
+        texts = [next(file) for _ in range(lines)]
+    started = time.perf_counter()
+    for text in texts:
+        manager.add_note(SimpleNamespace(chat=SimpleNamespace(id=1), text=text))
+    return lines / (time.perf_counter() - started)
+
+
+def bulk_import(path, storage, workers):
+    manager = note_manager(storage, NoteImporter(workers=workers))
+    started = time.perf_counter()
+    with open(path, "rb") as document:
+        result = manager.import_notes(1, document, "txt")
+    manager.user_data.storage.flush()
+    elapsed = time.perf_counter() - started
+    manager.importer.close()
+    manager.user_data.close()
+    return elapsed, result
+
+
+def peak_memory(function):
+    tracemalloc.start()
+    function()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak / 2**20
+
+
+def parse_only(path):
+    with open(path, "rb") as document:
+        for _ in NoteImporter(workers=0).parse(document, "txt", datetime.now()):
+            pass
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--lines', type=int, default=100_000)
+    parser.add_argument('--add-lines', type=int, default=2000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "notes.txt")
+        write_file(path, args.lines)
+        print(f"{args.lines} lines, {os.path.getsize(path) / 2**20:.1f} MB")
+        print(f"one by one        {one_by_one(path, args.add_lines):8.0f} notes/s")
+
+        for workers in sorted({0, args.workers}):
+            for label in ("memory", "sqlite"):
+                storage = MemoryStorage() if label == "memory" else SQLiteStorage(os.path.join(directory, "notes.db"))
+                elapsed, result = bulk_import(path, storage, workers)
+                if label == "sqlite":
+                    os.remove(os.path.join(directory, "notes.db"))
+                print(f"import {label:6} w={workers}  {args.lines / elapsed:8.0f} notes/s  {result}")
+
+        small = os.path.join(directory, "small.txt")
+        write_file(small, args.lines // 10)
+        print(f"parse peak        {peak_memory(lambda: parse_only(small)):6.1f} MB for {args.lines // 10} lines,"
+              f" {peak_memory(lambda: parse_only(path)):6.1f} MB for {args.lines}")
+        print(f"import peak       {peak_memory(lambda: bulk_import(path, MemoryStorage(), 0)):6.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Rendering /notes for a large list: the old single message against the paginated pages.
+
+"full list" is the old behaviour: every note appended to one string with +=, which Telegram then
+rejects once it passes 4096 characters. The paginated list computes page boundaries once per notes
+version ("first page" pays for that), then renders only the requested page ("later page"); "all
+pages" walks every page like a user paging through the whole list.
+
+Run from the directory that contains the Note_bot checkout:
+    python -m Note_bot.benchmarks.bench_notes_list --notes 10000
+"""
+import argparse
+import time
+
+from Note_bot.benchmarks.corpus import generate_notes
+from Note_bot.main.data.Storage import MemoryStorage
+from Note_bot.main.data.UserDataManager import UserDataManager
+from Note_bot.main.ui.UIManager import UIManager
+
+
+def full_list(user_data, chat_id):
+    notes = user_data.get_user_notes(chat_id)
+    text = "Ваши заметки:\n"
+    for note_number, note_id in enumerate(user_data.get_note_order(chat_id), 1):
+        text += f"{note_number}. {notes[note_id]}\n"
+    return text
+
+
+def timed(function, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = function()
+    return (time.perf_counter() - started) / repeat, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--notes', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    for count in args.notes:
+        user_data = UserDataManager(MemoryStorage())
+        for text in generate_notes(count):
+            user_data.add_note(1, text)
+        ui_manager = UIManager(None, user_data)
+
+        seconds, text = timed(lambda: full_list(user_data, 1), args.repeat)
+        print(f"{count:6} notes  full list    {seconds * 1000:8.2f} ms  one message of {len(text)} chars")
+
+        ui_manager.list_pages_cache.clear()
+        seconds, _ = timed(lambda: ui_manager.render_notes_list_page(1, 0), 1)
+        pages = len(ui_manager.paginate_notes_list(1))
+        print(f"{count:6} notes  first page   {seconds * 1000:8.2f} ms  {pages} pages")
+
+        seconds, (text, _) = timed(lambda: ui_manager.render_notes_list_page(1, pages // 2), args.repeat)
+        print(f"{count:6} notes  later page   {seconds * 1000:8.2f} ms  {len(text)} chars")
+
+        seconds, _ = timed(lambda: [ui_manager.render_notes_list_page(1, page) for page in range(pages)], 1)
+        print(f"{count:6} notes  all pages    {seconds * 1000:8.2f} ms")
+        ui_manager.chart_renderer.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""Tick cost and firing lateness of the heap scheduler with many pending reminders.
+
+Run from the directory that contains the Note_bot checkout:
+    python -m Note_bot.benchmarks.bench_scheduler --reminders 1000000
+
+The baseline is the scan the worker used to run every 30 seconds: walk every chat and copy
+its reminder list to find the due ones.
+"""
+import argparse
+import random
+import statistics
+import threading
+import time
+from datetime import datetime, timedelta
+
+from Note_bot.main.service.ReminderScheduler import ReminderScheduler
+
+
+def pending_reminders(count, chats, now):
+    rng = random.Random(1)
+    reminders = {}
+    for number in range(count):
+        remind_time = now + timedelta(days=1, seconds=rng.randrange(30 * 24 * 60 * 60))
+        reminders.setdefault(number % chats, []).append((number, remind_time))
+    return reminders
+
+
+def scan_tick(user_reminders, now):
+    due = []
+    for chat_id, reminders in list(user_reminders.items()):
+        for note_id, remind_time in list(reminders):
+            if remind_time <= now:
+                due.append((chat_id, note_id, remind_time))
+    return due
+
+
+def measure_lateness(scheduler, due_count, spread):
+    lateness = []
+    started = datetime.now()
+    for number in range(due_count):
+        scheduler.schedule(-1, number, started + timedelta(seconds=spread * number / due_count))
+
+    def fire():
+        while len(lateness) < due_count:
+            for _, _, remind_time in scheduler.wait_due():
+                lateness.append((datetime.now() - remind_time).total_seconds())
+
+    thread = threading.Thread(target=fire, daemon=True)
+    thread.start()
+    thread.join(spread + 10)
+    return lateness
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--reminders', type=int, default=1000000)
+    parser.add_argument('--chats', type=int, default=100000)
+    parser.add_argument('--due', type=int, default=2000, help="reminders that fall due during the lateness run")
+    parser.add_argument('--spread', type=float, default=2.0, help="seconds over which they fall due")
+    args = parser.parse_args()
+
+    now = datetime.now()
+    reminders = pending_reminders(args.reminders, args.chats, now)
+
+    started = time.perf_counter()
+    scan_tick(reminders, now)
+    print(f"30 s scan tick:          {(time.perf_counter() - started) * 1000:9.1f} ms per tick")
+
+    scheduler = ReminderScheduler()
+    started = time.perf_counter()
+    scheduler.schedule_all(reminders)
+    print(f"heap load:               {(time.perf_counter() - started) * 1000:9.1f} ms for {len(scheduler)} reminders")
+
+    rng = random.Random(2)
+    samples = 10000
+    started = time.perf_counter()
+    for number in range(samples):
+        scheduler.schedule(-2, number, now + timedelta(days=1, seconds=rng.randrange(86400)))
+    print(f"schedule:                {(time.perf_counter() - started) / samples * 1e6:9.2f} us per reminder")
+
+    started = time.perf_counter()
+    for number in range(samples):
+        scheduler.cancel(-2, number)
+    print(f"cancel:                  {(time.perf_counter() - started) / samples * 1e6:9.2f} us per reminder")
+
+    # One tick pops what is due; the rest of the heap is not touched.
+    for number in range(samples):
+        scheduler.schedule(-3, number, now - timedelta(seconds=1))
+    started = time.perf_counter()
+    due = scheduler.wait_due()
+    elapsed = time.perf_counter() - started
+    print(f"heap tick:               {elapsed * 1000:9.1f} ms for {len(due)} due reminders"
+          f" ({elapsed / len(due) * 1e6:.2f} us each)")
+
+    lateness = measure_lateness(scheduler, args.due, args.spread)
+    if len(lateness) < args.due:
+        print(f"only {len(lateness)} of {args.due} reminders fired")
+        return
+    lateness.sort()
+    print(f"firing lateness:         {args.due} fired over {args.spread:.1f} s with {len(scheduler)} pending:"
+          f" p50 {statistics.median(lateness) * 1000:.2f} ms"
+          f"  p99 {lateness[int(len(lateness) * 0.99)] * 1000:.2f} ms  max {lateness[-1] * 1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""Search latency of the inverted index against the linear scan it replaced, for large note sets.
+
+Run from the directory that contains the Note_bot checkout:
+    python -m Note_bot.benchmarks.bench_search --notes 10000 50000
+"""
+import argparse
+import statistics
+import time
+
+from Note_bot.benchmarks.corpus import generate_notes
+from Note_bot.main.service.SearchIndex import SearchIndex
+
+QUERIES = ["отчёт", "встреча клиент", "проект бюджет отчёт", "докум", "английский курс урок"]
+
+
+def scan(notes, query):
+    # NoteManager.scan_notes, the fallback and the only search before the index.
+    return [note_id for note_id, note_text in notes.items() if query in note_text.lower()]
+
+
+def latency(search, repeats):
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        search()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--notes', type=int, nargs='+', default=[10000, 50000])
+    parser.add_argument('--repeats', type=int, default=20)
+    args = parser.parse_args()
+
+    for count in args.notes:
+        notes = dict(enumerate(generate_notes(count), 1))
+        index = SearchIndex()
+        started = time.perf_counter()
+        index.build(1, notes)
+        print(f"{count} notes: index build {(time.perf_counter() - started) * 1000:.0f} ms")
+
+        for query in QUERIES:
+            indexed = latency(lambda: index.search(1, query), args.repeats)
+            scanned = latency(lambda: scan(notes, query), args.repeats)
+            found = len(index.search(1, query))
+            print(f"  {query!r:26} index {indexed:8.2f} ms   scan {scanned:8.2f} ms   {found} found")
+
+        # Edits keep the index current instead of rebuilding it.
+        started = time.perf_counter()
+        for note_id in range(1, 1001):
+            index.add(1, note_id, notes[note_id] + " правка")
+        for note_id in range(1, 1001):
+            index.remove(1, note_id)
+        print(f"  add + remove: {(time.perf_counter() - started) / 1000 * 1e6:.0f} us per note")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""Multi-process load test: updates handled per second by the shard router with 1, 2, 4... worker processes.
+
+A local fake Bot API server hands out a fixed backlog of updates through getUpdates and answers every other
+method. Each user alternates "➕ Добавить заметку" and a note with a reminder time, so every update runs a real
+handler. The clock runs from the first to the last sendMessage; a run ends after --idle seconds without one. Throughput only scales
+with N on a machine with at least N free cores.
+
+Run from the directory that contains the Note_bot checkout:
+    python -m Note_bot.benchmarks.bench_shards --shards 1 2 4
+"""
+import argparse
+import multiprocessing
+import os
+import signal
+import socket
+import time
+
+from Note_bot.benchmarks.fake_telegram import FakeTelegram, text_update
+
+
+def build_updates(users, notes_per_user):
+    updates = []
+    for step in range(notes_per_user):
+        for chat_id in range(1, users + 1):
+            for text in ("➕ Добавить заметку", f"позвонить клиенту {step} завтра в 9:{step % 60:02d}"):
+                updates.append(text_update(len(updates) + 1, chat_id, text))
+    return updates
+
+
+def run_fake_server(port, updates, sent, first_sent, last_sent, ready):
+    import asyncio
+
+    def on_call(method):
+        if method == "sendMessage":
+            with sent.get_lock():
+                sent.value += 1
+                last_sent.value = time.monotonic()
+                if sent.value == 1:
+                    first_sent.value = last_sent.value
+
+    async def serve():
+        await FakeTelegram(updates, on_call=on_call).start(port)
+        ready.set()
+        await asyncio.Event().wait()
+
+    asyncio.run(serve())
+
+
+def run_router(shards):
+    from Note_bot.main.ShardRouter import ShardRouter
+
+    try:
+        ShardRouter(shards).run("polling")
+    except KeyboardInterrupt:
+        pass
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def measure(context, shards, updates, idle):
+    port = free_port()
+    sent, ready = context.Value('q', 0), context.Event()
+    first_sent, last_sent = context.Value('d', 0.0), context.Value('d', 0.0)
+    server = context.Process(target=run_fake_server, args=(port, updates, sent, first_sent, last_sent, ready),
+                             daemon=True)
+    server.start()
+    ready.wait(30)
+
+    os.environ["TELEGRAM_API_URL"] = f"http://127.0.0.1:{port}/bot{{0}}/{{1}}"
+    router = context.Process(target=run_router, args=(shards,))
+    router.start()
+    while sent.value == 0 or time.monotonic() - last_sent.value < idle:
+        time.sleep(0.1)
+    # Measured from the first reply, so process start-up and imports are left out.
+    elapsed = last_sent.value - first_sent.value
+
+    os.kill(router.pid, signal.SIGINT)  # the router stops its shards through their queues
+    router.join(30)
+    server.terminate()
+    server.join()
+    return sent.value, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--shards', type=int, nargs='+', default=[1, 2, 4])
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--notes', type=int, default=10, help="notes added by each user")
+    parser.add_argument('--idle', type=float, default=2.0, help="seconds without replies that end a run")
+    args = parser.parse_args()
+
+    os.environ.update({"BOT_TOKEN": "1:bench", "STORAGE_BACKEND": "memory", "PREWARM": "0"})
+    context = multiprocessing.get_context('spawn')
+    updates = build_updates(args.users, args.notes)
+    print(f"{len(updates)} updates from {args.users} users, {os.cpu_count()} CPUs")
+    for shards in args.shards:
+        replies, elapsed = measure(context, shards, updates, args.idle)
+        print(f"shards={shards:<3} {len(updates) / elapsed:8.0f} updates/s  ({replies} replies in {elapsed:.1f} s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""The similarity engine at tens of thousands of notes per user.
+
+"build" turns a chat's notes into the tf matrix, as the first /similar does. "similar" is one top-5
+query; "python loop" is the same tf-idf cosine computed note by note in plain Python, what the
+engine would cost without sparse matrices. "add + similar" changes a note and queries right after,
+so the delta rows are part of the product; "merge" folds them back into the base. "duplicates" is the
+whole-collection scan behind /duplicates, and "representative" the preselection for AI analysis.
+Some notes are near copies of others, so the scan has groups to find.
+
+Run from the directory that contains the Note_bot checkout:
+    python -m Note_bot.benchmarks.bench_similarity --notes 10000 50000
+"""
+import argparse
+import math
+import random
+import statistics
+import time
+from collections import Counter
+
+from Note_bot.benchmarks.corpus import generate_notes
+from Note_bot.main.service.SearchIndex import tokenize
+from Note_bot.main.service.SimilarityIndex import SimilarityIndex
+
+
+def python_loop(notes, note_id, limit=5):
+    terms = {other: Counter(tokenize(text)) for other, text in notes.items()}
+    df = Counter(term for counts in terms.values() for term in counts)
+    idf = {term: math.log((1 + len(notes)) / (1 + count)) + 1 for term, count in df.items()}
+
+    def vector(counts):
+        weights = {term: (1 + math.log(count)) * idf[term] for term, count in counts.items()}
+        norm = math.sqrt(sum(weight * weight for weight in weights.values())) or 1
+        return {term: weight / norm for term, weight in weights.items()}
+
+    query = vector(terms[note_id])
+    scores = [(sum(weight * query.get(term, 0) for term, weight in vector(counts).items()), other)
+              for other, counts in terms.items() if other != note_id]
+    return sorted(scores, reverse=True)[:limit]
+
+
+def timed(function):
+    started = time.perf_counter()
+    result = function()
+    return (time.perf_counter() - started) * 1000, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--notes', type=int, nargs='+', default=[10000, 50000])
+    parser.add_argument('--queries', type=int, default=50)
+    parser.add_argument('--copies', type=float, default=0.02)
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    for count in args.notes:
+        notes = dict(enumerate(generate_notes(count), 1))
+        for note_id in rng.sample(range(1, count + 1), int(count * args.copies)):
+            notes[len(notes) + 1] = notes[note_id].capitalize()
+        index = SimilarityIndex()
+        index.warm_up()
+
+        elapsed, _ = timed(lambda: index.build(1, notes))
+        print(f"{len(notes)} notes  build           {elapsed:9.1f} ms")
+
+        probes = rng.sample(list(notes), args.queries)
+        timings = [timed(lambda: index.similar(1, note_id))[0] for note_id in probes]
+        print(f"{len(notes)} notes  similar         {statistics.median(timings):9.2f} ms median")
+        elapsed, _ = timed(lambda: python_loop(notes, probes[0]))
+        print(f"{len(notes)} notes  python loop     {elapsed:9.1f} ms")
+
+        timings = []
+        for note_id in probes:
+            notes[note_id] = generate_notes(1, seed=note_id)[0]
+            timings.append(timed(lambda: (index.add(1, note_id, notes[note_id]), index.similar(1, note_id)))[0])
+        print(f"{len(notes)} notes  add + similar   {statistics.median(timings):9.2f} ms median")
+        elapsed, _ = timed(lambda: index._merge(index.vectors[1]))
+        print(f"{len(notes)} notes  merge           {elapsed:9.1f} ms")
+
+        elapsed, snapshot = timed(lambda: index.snapshot(1))
+        print(f"{len(notes)} notes  snapshot        {elapsed:9.1f} ms")
+        elapsed, groups = timed(lambda: index.duplicates(snapshot))
+        print(f"{len(notes)} notes  duplicates      {elapsed:9.1f} ms  {len(groups)} groups")
+        elapsed, _ = timed(lambda: index.representative(snapshot, list(notes), 200))
+        print(f"{len(notes)} notes  representative  {elapsed:9.1f} ms  200 of {len(notes)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Statistics chart requests per second with and without the rendered PNG cache.
+
+Users ask for their 7- or 30-day chart in a random order; before --change-rate of the requests
+one of their counters moves, which invalidates that user's cached charts. Without the cache every
+request renders. Use --renderer matplotlib for the full charts; fast needs no dependencies.
+
+Run from the directory that contains the Note_bot checkout:
+    python -m Note_bot.benchmarks.bench_statistics --renderer fast
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from Note_bot.main.data.Storage import MemoryStorage
+from Note_bot.main.data.UserDataManager import UserDataManager
+from Note_bot.main.data.UserStatistics import COUNTERS
+from Note_bot.main.ui.ChartRenderer import ChartRenderer
+from Note_bot.main.ui.UIManager import UIManager
+
+
+async def serve_requests(ui_manager, requests):
+    started = time.perf_counter()
+    for chat_id, days, change in requests:
+        if change:
+            ui_manager.user_data.update_user_statistics(chat_id, change)
+        stamp, plot_data, _ = ui_manager.collect_plot_data(chat_id, days)
+        await ui_manager.get_statistics_plot(chat_id, days, stamp, plot_data)
+    return len(requests) / (time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--renderer', choices=['fast', 'matplotlib'], default='fast')
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--change-rate', type=float, default=0.1)
+    args = parser.parse_args()
+
+    rng = random.Random(1)
+    requests = [(rng.randrange(args.users), rng.choice((7, 30)),
+                 rng.choice(COUNTERS) if rng.random() < args.change_rate else None) for _ in range(args.requests)]
+
+    for cache_size in (0, 256):
+        user_data = UserDataManager(MemoryStorage())
+        for chat_id in range(args.users):
+            for counter in COUNTERS:
+                user_data.update_user_statistics(chat_id, counter, amount=rng.randrange(1, 20))
+        ui_manager = UIManager(None, user_data)
+        ui_manager.chart_renderer.close()
+        ui_manager.chart_renderer = ChartRenderer(mode=args.renderer)
+        ui_manager.plot_cache_size = cache_size
+
+        rate = asyncio.run(serve_requests(ui_manager, requests))
+        ui_manager.chart_renderer.close()
+        label = "no cache" if cache_size == 0 else f"cache of {cache_size}"
+        print(f"{args.renderer:10} {label:13} {rate:9.1f} charts/s")
+
+
+if __name__ == "__main__":
+    main()
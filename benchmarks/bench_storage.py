@@ -0,0 +1,91 @@
+"""Notes written per second with group commit versus one transaction per write, and cold start at 100k users.
+
+Run from the directory that contains the Note_bot checkout:
+    python -m Note_bot.benchmarks.bench_storage
+"""
+import argparse
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from Note_bot.main.data.Storage import SCHEMA, SQLiteStorage
+from Note_bot.main.data.UserDataManager import UserDataManager
+
+
+class PerWriteStorage(SQLiteStorage):
+    # The baseline: every durable write is its own transaction, committed by the calling thread.
+    def _enqueue(self, statements, durable=True):
+        with self.connection_lock:
+            self._execute([(statements, durable)])
+
+
+def write_notes(storage, threads, notes_per_thread):
+    user_data = UserDataManager(storage)
+
+    def worker(chat_id):
+        for number in range(notes_per_thread):
+            user_data.add_note(chat_id, f"заметка {number} пользователя {chat_id}")
+
+    workers = [threading.Thread(target=worker, args=(chat_id,)) for chat_id in range(threads)]
+    started = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    user_data.close()
+    return threads * notes_per_thread / elapsed
+
+
+def populate(path, users):
+    now = datetime.now()
+    connection = sqlite3.connect(path)
+    connection.executescript(SCHEMA)
+    with connection:
+        connection.executemany(
+            "INSERT INTO notes (chat_id, note_id, note_text) VALUES (?, ?, ?)",
+            ((chat_id, note_id, f"заметка {note_id}") for chat_id in range(users) for note_id in range(1, 6))
+        )
+        connection.executemany(
+            "INSERT INTO reminders (chat_id, note_id, remind_time) VALUES (?, 1, ?)",
+            ((chat_id, (now + timedelta(minutes=chat_id)).isoformat()) for chat_id in range(0, users, 2))
+        )
+        connection.executemany(
+            "INSERT INTO reminder_series (chat_id, note_id, rule, next_time, paused) VALUES (?, 2, 'D540', ?, 0)",
+            ((chat_id, (now + timedelta(days=1)).isoformat()) for chat_id in range(0, users, 10))
+        )
+    connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--notes', type=int, default=200, help="notes written by each thread")
+    parser.add_argument('--users', type=int, default=100000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        for name, storage_class in (("per-write", PerWriteStorage), ("group commit", SQLiteStorage)):
+            storage = storage_class(str(Path(directory) / f"{storage_class.__name__}.db"))
+            rate = write_notes(storage, args.threads, args.notes)
+            print(f"{name:12} {rate:8.0f} notes/s ({args.threads} threads)")
+
+        path = str(Path(directory) / "cold.db")
+        populate(path, args.users)
+        started = time.perf_counter()
+        user_data = UserDataManager(SQLiteStorage(path))
+        loaded = time.perf_counter() - started
+        started = time.perf_counter()
+        for chat_id in range(0, args.users, 100):
+            user_data.get_user_notes(chat_id)
+        first_reads = (time.perf_counter() - started) / (args.users // 100)
+        user_data.close()
+        print(f"cold start   {loaded * 1000:8.0f} ms for {args.users} users"
+              f" ({len(user_data.user_reminders)} with reminders), first notes read {first_reads * 1e6:.0f} us")
+
+
+if __name__ == "__main__":
+    main()
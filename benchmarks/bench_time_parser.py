@@ -0,0 +1,76 @@
+"""Reminder time extraction throughput: the old regex list + dateparser versus TimeParser.
+
+Run from the directory that contains the Note_bot checkout:
+    python -m Note_bot.benchmarks.bench_time_parser
+
+The corpus is benchmarks/data/notes_ru.txt, one note per line. The first pass runs with empty
+caches; later passes show the steady state, where repeated phrases hit the LRU caches.
+"""
+import argparse
+import re
+import time
+from pathlib import Path
+
+import dateparser
+
+from Note_bot.main.service.TimeParser import TimeParser, parse_fallback, parse_phrase
+
+CORPUS = Path(__file__).parent / "data" / "notes_ru.txt"
+
+LEGACY_PATTERNS = [
+    r'через \d+ (минут|минуту|час|часов|день|дней|неделю|недель|месяц|месяцев)',
+    r'сегодня в \d{1,2}(:\d{2})?',
+    r'завтра в \d{1,2}(:\d{2})?',
+    r'послезавтра в \d{1,2}(:\d{2})?',
+    r'\d{1,2}(:\d{2})? (утра|вечера|дня|ночи)',
+    r'в \d{1,2}(:\d{2})?',
+    r'через час',
+    r'через минуту',
+]
+
+
+def legacy_extract(note_text):
+    # NoteManager.extract_time before the precompiled matcher.
+    for pattern in LEGACY_PATTERNS:
+        match = re.search(pattern, note_text.lower())
+        if match:
+            parsed_date = dateparser.parse(match.group(), settings={'PREFER_DATES_FROM': 'future'})
+            if parsed_date:
+                return parsed_date
+    return None
+
+
+def throughput(extract, notes, passes):
+    rates = []
+    for _ in range(passes):
+        started = time.perf_counter()
+        for note in notes:
+            extract(note)
+        rates.append(len(notes) / (time.perf_counter() - started))
+    return rates
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--passes', type=int, default=5)
+    args = parser.parse_args()
+
+    notes = CORPUS.read_text(encoding="utf-8").splitlines()
+
+    started = time.perf_counter()
+    dateparser.parse('15 марта')  # the heavy first import and locale load, paid once by either version
+    print(f"dateparser first call: {(time.perf_counter() - started) * 1000:.0f} ms")
+
+    time_parser = TimeParser()
+    parse_phrase.cache_clear()
+    parse_fallback.cache_clear()
+    for name, extract in (("before", legacy_extract), ("after", time_parser.extract)):
+        rates = throughput(extract, notes, args.passes)
+        print(f"{name:6}  first pass {rates[0]:9.0f} notes/s   steady {max(rates[1:] or rates):9.0f} notes/s")
+
+    recognized = sum(time_parser.extract(note) is not None for note in notes)
+    print(f"{len(notes)} notes, {recognized} with a reminder time")
+
+
+if __name__ == "__main__":
+    main()
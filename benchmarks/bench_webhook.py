@@ -0,0 +1,124 @@
+"""Replays recorded webhook updates against the local webhook server.
+
+benchmarks/data/updates.jsonl is one user's session as Telegram posts it. It is replayed for --users
+users, each session with its own chat and update ids, by --connections concurrent HTTP clients that
+send the secret token header like Telegram does. Outgoing Bot API calls go to a local fake server. The
+report gives the accepted updates per second, the webhook response latency, and how long a graceful
+shutdown takes to finish the updates still queued.
+
+Run from the directory that contains the Note_bot checkout:
+    python -m Note_bot.benchmarks.bench_webhook --users 500 --connections 32
+"""
+import argparse
+import asyncio
+import copy
+import json
+import os
+import socket
+import statistics
+import time
+from pathlib import Path
+
+import aiohttp
+
+from Note_bot.benchmarks.fake_telegram import FakeTelegram
+
+RECORDED = Path(__file__).parent / "data" / "updates.jsonl"
+SECRET = "bench-secret"
+
+
+def replayed_updates(users):
+    session = [json.loads(line) for line in RECORDED.read_text(encoding="utf-8").splitlines()]
+    sessions = []
+    for user in range(users):
+        chat_id = 10000 + user
+        updates = []
+        for number, recorded in enumerate(session):
+            update = copy.deepcopy(recorded)
+            update["update_id"] = user * len(session) + number + 1
+            message = update["message"]
+            message["chat"]["id"] = message["from"]["id"] = chat_id
+            updates.append(update)
+        sessions.append(updates)
+    return sessions
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def run(args):
+    telegram = FakeTelegram(delay=args.api_delay)
+    os.environ["TELEGRAM_API_URL"] = await telegram.start()
+
+    from Note_bot.main.NoteBot import NoteBot
+    from Note_bot.main.TelegramSession import configure_session
+    from Note_bot.main.UpdateDispatcher import UpdateDispatcher
+    from Note_bot.main.WebhookServer import WebhookServer
+
+    note_bot = NoteBot()
+    asyncio.get_running_loop().set_default_executor(note_bot.executor)
+    configure_session()
+    port = free_port()
+    server = WebhookServer(UpdateDispatcher(note_bot.bot), host="127.0.0.1", port=port, secret_token=SECRET)
+    await server.start()
+
+    sessions = replayed_updates(args.users)
+    # A user's updates are posted in order, like Telegram delivers them; users are spread over connections.
+    lanes = [[update for session in sessions[lane::args.connections] for update in session]
+             for lane in range(args.connections)]
+    latencies, statuses = [], {}
+    url = f"http://127.0.0.1:{port}/webhook"
+    headers = {"X-Telegram-Bot-Api-Secret-Token": SECRET}
+
+    async def post_lane(http, lane):
+        for update in lane:
+            while True:
+                started = time.perf_counter()
+                async with http.post(url, json=update, headers=headers) as response:
+                    await response.read()
+                latencies.append(time.perf_counter() - started)
+                statuses[response.status] = statuses.get(response.status, 0) + 1
+                if response.status != 503:
+                    break
+                await asyncio.sleep(0.05)  # shed: Telegram would redeliver it later
+
+    started = time.perf_counter()
+    async with aiohttp.ClientSession() as http:
+        await asyncio.gather(*(post_lane(http, lane) for lane in lanes))
+    accepted = time.perf_counter() - started
+
+    stopping = time.perf_counter()
+    await server.stop()
+    drained = time.perf_counter() - stopping
+
+    total = sum(len(session) for session in sessions)
+    latencies.sort()
+    print(f"{total} updates from {args.users} users over {args.connections} connections")
+    print(f"  accepted {total / accepted:8.0f} updates/s   statuses {dict(sorted(statuses.items()))}")
+    print(f"  response p50 {statistics.median(latencies) * 1000:.1f} ms"
+          f"  p99 {latencies[int(len(latencies) * 0.99)] * 1000:.1f} ms")
+    print(f"  graceful stop drained the queue in {drained:.2f} s;"
+          f" {(total / (accepted + drained)):.0f} updates/s handled end to end,"
+          f" {sum(telegram.calls.values())} Bot API calls")
+
+    note_bot.ui_manager.chart_renderer.close()
+    note_bot.user_data.close()
+    await telegram.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=int, default=500)
+    parser.add_argument('--connections', type=int, default=32)
+    parser.add_argument('--api-delay', type=float, default=0.02)
+    args = parser.parse_args()
+
+    os.environ.update({"BOT_TOKEN": "1:bench", "STORAGE_BACKEND": "memory", "PREWARM": "0"})
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
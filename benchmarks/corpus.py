@@ -0,0 +1,22 @@
+"""Synthetic notes for the benchmarks: the lines of data/notes_ru.txt padded with everyday words."""
+import random
+from pathlib import Path
+
+TEMPLATES = (Path(__file__).parent / "data" / "notes_ru.txt").read_text(encoding="utf-8").splitlines()
+WORDS = (
+    "проект отчёт встреча клиент бюджет договор задача план идея покупка ремонт квартира дача машина сервис "
+    "врач анализы спорт бег бассейн зал книга статья курс урок английский код сервер релиз баг тест ревью "
+    "документы паспорт виза билеты отпуск море горы поездка гостиница подарок праздник семья дети школа "
+    "сад кружок мама папа бабушка друг коллега команда созвон письмо счёт оплата налог банк карта кредит "
+    "продукты молоко хлеб овощи фрукты рецепт ужин обед завтрак кофе чай вода цветы кот собака корм "
+    "уборка стирка посуда мусор доставка посылка почта магазин рынок аптека лекарства витамины сон"
+).split()
+
+
+def generate_notes(count, seed=1, extra_words=(2, 12)):
+    rng = random.Random(seed)
+    notes = []
+    for number in range(count):
+        words = rng.choices(WORDS, k=rng.randint(*extra_words))
+        notes.append(f"{rng.choice(TEMPLATES)} {' '.join(words)} {number}")
+    return notes
@@ -0,0 +1,70 @@
+"""A local fake Bot API for the load tests: serves a backlog of updates and answers every other method."""
+import asyncio
+import time
+from collections import Counter
+from urllib.parse import parse_qsl
+
+from aiohttp import web
+
+
+def text_update(update_id, chat_id, text):
+    return {"update_id": update_id, "message": {
+        "message_id": update_id, "date": 0, "text": text,
+        "chat": {"id": chat_id, "type": "private"},
+        "from": {"id": chat_id, "is_bot": False, "first_name": "user"},
+    }}
+
+
+class FakeTelegram:
+    def __init__(self, updates=(), delay=0.0, on_call=None):
+        self.updates = list(updates)
+        self.delay = delay  # seconds added to every call, like the round-trip to the real API
+        self.on_call = on_call  # on_call(method), e.g. to count into shared memory from another process
+        self.calls = Counter()
+        self.message_ids = 0
+        self.runner = None
+        self.url = None
+
+    async def start(self, port=0):
+        app = web.Application()
+        app.router.add_route("*", "/bot{token}/{method}", self.handle)
+        self.runner = web.AppRunner(app, access_log=None)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        # The format TELEGRAM_API_URL expects.
+        self.url = f"http://127.0.0.1:{port}/bot{{0}}/{{1}}"
+        return self.url
+
+    async def stop(self):
+        await self.runner.cleanup()
+
+    async def handle(self, request):
+        method = request.match_info["method"]
+        params = dict(request.query)
+        if request.method == "POST":
+            params.update(await request.post())
+        elif request.can_read_body:  # telebot sends getUpdates as a GET with a form body
+            params.update(parse_qsl((await request.read()).decode()))
+        self.calls[method] += 1
+        if self.on_call is not None:
+            self.on_call(method)
+
+        if method == "getUpdates":
+            offset = int(params.get("offset") or 1)
+            batch = self.updates[offset - 1:offset - 1 + 100]
+            if not batch:
+                await asyncio.sleep(0.2)
+            return web.json_response({"ok": True, "result": batch})
+
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if method in ("answerCallbackQuery", "deleteMessage"):
+            return web.json_response({"ok": True, "result": True})
+        self.message_ids += 1
+        chat_id = int(params.get("chat_id") or 0)
+        return web.json_response({"ok": True, "result": {
+            "message_id": self.message_ids, "date": int(time.time()), "chat": {"id": chat_id, "type": "private"},
+            "text": "",
+        }})
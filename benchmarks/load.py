@@ -0,0 +1,73 @@
+"""Mixed handler load shared by the lock stress test and bench_data_locks.
+
+Handler threads add, delete, edit and search notes and set near-due reminders while
+a ReminderWorkerService fires them through a counting fake delivery.
+"""
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from Note_bot.main.service.ReminderWorkerService import ReminderWorkerService
+
+
+def message(chat_id, text):
+    return SimpleNamespace(chat=SimpleNamespace(id=chat_id), text=text)
+
+
+class CountingDelivery:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.sent = 0
+
+    def submit(self, chat_id, text, markup=None):
+        with self.lock:
+            self.sent += 1
+
+
+def run_mixed_load(note_manager, user_data, threads=8, operations=400, chats=20, drain_timeout=5):
+    errors = []
+    delivery = CountingDelivery()
+    reminder_worker = ReminderWorkerService(delivery, user_data, note_manager.scheduler)
+    reminder_worker.start()
+
+    def worker(seed):
+        rng = random.Random(seed)
+        try:
+            for _ in range(operations):
+                chat_id = rng.randrange(chats)
+                action = rng.random()
+                if action < 0.5:
+                    note_manager.add_note(message(chat_id, f"заметка {rng.randrange(100)} проект"))
+                elif action < 0.65:
+                    note_manager.delete_note(chat_id, str(rng.randint(1, 5)))
+                elif action < 0.8:
+                    note_id = user_data.resolve_note_id(chat_id, 1)
+                    if note_id is not None:
+                        note_manager.edit_note(chat_id, note_id, f"правка {rng.randrange(100)}")
+                elif action < 0.9:
+                    note_manager.search_notes(chat_id, "проект")
+                else:
+                    # Due within a few milliseconds, so the worker fires them while the load is still running.
+                    remind_time = datetime.now() + timedelta(milliseconds=rng.randrange(20))
+                    with user_data.chat_lock(chat_id):
+                        note_id = user_data.resolve_note_id(chat_id, 1)
+                        if note_id is not None:
+                            user_data.add_reminder(chat_id, note_id, remind_time)
+                            note_manager.scheduler.schedule(chat_id, note_id, remind_time)
+        except Exception as e:  # surfaced by the caller
+            errors.append(e)
+
+    workers = [threading.Thread(target=worker, args=(seed,)) for seed in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+
+    deadline = time.monotonic() + drain_timeout
+    while len(note_manager.scheduler) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    reminder_worker.stop()
+    reminder_worker.join(drain_timeout)
+    return errors, delivery.sent
@@ -1,219 +1,510 @@
+import asyncio
 import os
-
-import telebot
-from telebot.types import ReplyKeyboardMarkup, KeyboardButton
-
-from Note_bot.main.ui.UIManager import UIManager
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from telebot.async_telebot import AsyncTeleBot
+
+from Note_bot.main.TelegramSession import configure_session, count_api_calls, download_file
+from Note_bot.main.UpdateDispatcher import UpdateDispatcher
+from Note_bot.main.ui.StreamingMessage import StreamingMessage
+from Note_bot.main.ui.UIManager import (
+    MAIN_MENU_MARKUP, NOOP_CALLBACK, NOTES_LIST_CALLBACK, SERIES_CALLBACK, UIManager, build_series_markup
+)
+from Note_bot.main.service.NoteImporter import detect_import_format
 from Note_bot.main.service.NoteService import NoteManager
 from Note_bot.main.service.AIService import AIService
+from Note_bot.main.data.ChatStates import (
+    ADD_NOTE, ANALYZE_NOTES, DELETE_NOTE, EDIT_SELECT, EDIT_TEXT, EXPORT_NOTES, IMPORT_NOTES, SEARCH_NOTES,
+    SIMILAR_NOTES
+)
 from Note_bot.main.data.UserDataManager import UserDataManager
+from Note_bot.main.service.ReminderDeliveryService import ReminderDeliveryService
+from Note_bot.main.service.ReminderScheduler import ReminderScheduler
 from Note_bot.main.service.ReminderWorkerService import ReminderWorkerService
 
 
 class NoteBot:
-    def __init__(self):
-        self.bot = telebot.TeleBot(os.getenv('BOT_TOKEN'))
-        self.user_data = UserDataManager()
-        self.note_manager = NoteManager(self.user_data)
+    def __init__(self, bot=None, user_data=None, reminder_rate=None):
+        self.bot = bot or AsyncTeleBot(os.getenv('BOT_TOKEN'))
+        self.user_data = user_data or UserDataManager()
+        self.executor = ThreadPoolExecutor(max_workers=int(os.getenv('WORKER_THREADS', '8')))
+        self.reminder_scheduler = ReminderScheduler()
+        self.note_manager = NoteManager(self.user_data, self.reminder_scheduler)
         self.ui_manager = UIManager(self.bot, self.user_data)
-        self.ai_service = AIService(self.user_data)
-        self.reminder_worker = ReminderWorkerService(self.bot, self.user_data)
-
+        self.ai_service = AIService(self.user_data, preselect=self.note_manager.preselect_notes)
+        if reminder_rate is None:
+            reminder_rate = float(os.getenv('REMINDER_RATE', '25'))
+        self.reminder_delivery = ReminderDeliveryService(self.bot, global_rate=reminder_rate)
+        self.reminder_worker = ReminderWorkerService(self.reminder_delivery, self.user_data, self.reminder_scheduler)
+        self.prewarm_task = None
+        self.handler_stats = {}  # {handler_name: [count, total_seconds, max_seconds, api_calls]}
+        self.admin_ids = {int(chat_id) for chat_id in os.getenv('ADMIN_CHAT_IDS', '').split(',') if chat_id.strip()}
+        self.import_progress_interval = float(os.getenv('IMPORT_PROGRESS_INTERVAL', '2'))
+
+        self.build_commands()
         self.register_handlers()
-        self.reminder_worker.start()
+
+    def register_next_step(self, chat_id, state, arg=0):
+        self.user_data.set_chat_state(chat_id, state, arg)
+
+    def build_commands(self):
+        self.commands = {
+            "➕ Добавить заметку": self.add_note_step1,
+            "❌ Удалить заметку": self.delete_note_step1,
+            "✏️ Редактировать заметку": self.edit_note_step1,
+            "⬅️ Назад": self.show_previous_notes_page,
+            "Вперед ➡️": self.show_next_notes_page,
+            "📋 Показать список заметок": self.show_notes_list,
+            "🤖 Анализ от ИИ": self.analyze_notes_step1,
+            "🔍 Поиск по заметкам": self.search_notes_step1,
+            "🔗 Похожие заметки": self.similar_notes_step1,
+            "🧹 Найти дубликаты": self.find_duplicates,
+            "📊 Статистика": self.show_statistics,
+            "📈 7 дней": self.send_week_statistics,
+            "📉 30 дней": self.send_month_statistics,
+            "📤 Экспорт заметок": self.export_notes_step1,
+            "📥 Импорт заметок": self.import_notes_step1,
+            "ℹ️ О боте": self.about_bot,
+            "🔙 Назад": self.send_main_menu,
+        }
+        # Checked first while the user is paging through notes to pick one for editing.
+        self.page_commands = {
+            "⬅️ Назад": self.show_previous_notes_page,
+            "Вперед ➡️": self.show_next_notes_page,
+            "❌ Отмена": self.cancel_notes_page,
+        }
+        # The next message of a chat in one of these states is the answer to the bot's prompt.
+        self.step_handlers = {
+            ADD_NOTE: self.add_note_handler,
+            DELETE_NOTE: self.delete_note_handler,
+            EDIT_TEXT: self.edit_note_step2,
+            SEARCH_NOTES: self.search_notes_handler,
+            SIMILAR_NOTES: self.similar_notes_handler,
+            ANALYZE_NOTES: self.analyze_notes_step2,
+            EXPORT_NOTES: self.export_notes_step2,
+            IMPORT_NOTES: self.import_notes_text,
+        }
 
     def register_handlers(self):
         @self.bot.message_handler(commands=['start'])
-        def start_message(message):
-            self.ui_manager.send_main_menu(message.chat.id)
+        async def start_message(message):
+            self.user_data.clear_chat_state(message.chat.id)
+            await self.ui_manager.send_main_menu(message.chat.id, force=True)
+
+        @self.bot.message_handler(commands=['handler_stats'], func=lambda message: message.chat.id in self.admin_ids)
+        async def handler_stats_message(message):
+            await self.bot.send_message(message.chat.id, self.format_handler_stats())
+
+        @self.bot.callback_query_handler(func=lambda call: call.data.startswith(NOTES_LIST_CALLBACK))
+        async def notes_list_page(call):
+            await self.dispatch(self.handle_notes_list_page, call)
+
+        @self.bot.callback_query_handler(func=lambda call: call.data.startswith(SERIES_CALLBACK))
+        async def series_action(call):
+            await self.dispatch(self.handle_series_action, call)
+
+        @self.bot.callback_query_handler(func=lambda call: call.data == NOOP_CALLBACK)
+        async def noop_callback(call):
+            await self.dispatch(self.handle_noop_callback, call)
+
+        @self.bot.message_handler(content_types=['document'])
+        async def handle_document(message):
+            chat_state = self.user_data.get_chat_state(message.chat.id)
+            if chat_state is not None and chat_state[0] == IMPORT_NOTES:
+                self.user_data.clear_chat_state(message.chat.id)
+                await self.dispatch(self.import_notes_step2, message)
+            else:
+                await self.ui_manager.send_result(message.chat.id, "Чтобы импортировать заметки, нажмите «📥 Импорт заметок».")
 
         @self.bot.message_handler(func=lambda message: True)
-        def handle_other_messages(message):
+        async def handle_other_messages(message):
             chat_id = message.chat.id
             text = message.text
 
-            if chat_id in self.user_data.current_page and (text.isdigit() or (text and text.strip()[0].isdigit())):
-                self.process_note_selection_for_edit(message)
-                return
-
-            if text == "➕ Добавить заметку":
-                msg = self.bot.send_message(chat_id, "Введите текст заметки (можно с временем).")
-                self.bot.register_next_step_handler(msg, self.add_note_handler)
-
-            elif text == "❌ Удалить заметку":
-                notes = self.user_data.get_user_notes(chat_id)
-                if notes:
-                    self.ui_manager.send_notes_list(chat_id)
-                    msg = self.bot.send_message(chat_id, "Введите номер заметки для удаления:")
-                    self.bot.register_next_step_handler(msg, self.delete_note_handler)
-                else:
-                    self.bot.send_message(chat_id, "У вас пока нет заметок.")
-
-            elif text == "✏️ Редактировать заметку":
-                self.edit_note_step1(message)
-
-            elif text in ["⬅️ Назад", "Вперед ➡️"]:
-                self.process_note_selection_for_edit(message)
-
-            elif text == "📋 Показать список заметок":
-                self.ui_manager.send_notes_list(chat_id)
-
-            elif text == "🤖 Анализ от ИИ":
-                self.analyze_notes_step1(message)
-
-            elif text == "🔍 Поиск по заметкам":
-                notes = self.user_data.get_user_notes(chat_id)
-                if notes:
-                    msg = self.bot.send_message(chat_id, "Введите текст для поиска в заметках:")
-                    self.bot.register_next_step_handler(msg, self.search_notes_handler)
+            chat_state = self.user_data.get_chat_state(chat_id)
+            if chat_state is not None:
+                state, arg = chat_state
+                if state == EDIT_SELECT:
+                    handler = self.page_commands.get(text)
+                    if handler is None and text and text.lstrip()[:1].isdigit():
+                        handler = self.process_note_selection_for_edit
+                    if handler is not None:
+                        await self.dispatch(handler, message)
+                        return
+                    self.user_data.clear_chat_state(chat_id)  # any other button leaves the notes page
                 else:
-                    self.bot.send_message(chat_id, "У вас пока нет заметок для поиска.")
-
-            elif text == "📊 Статистика":
-                self.ui_manager.show_statistics(chat_id)
-
-            elif text in ["📈 7 дней", "📉 30 дней"]:
-                days_map = {
-                    "📈 7 дней": 7,
-                    "📉 30 дней": 30
-                }
-                self.ui_manager.send_statistics_plot(chat_id, days_map[text])
-                self.ui_manager.show_statistics(chat_id)
-
-            elif text == "📤 Экспорт заметок":
-                self.export_notes_step1(message)
-
-            elif text == "ℹ️ О боте":
-                self.ui_manager.about_bot(chat_id)
+                    self.user_data.clear_chat_state(chat_id)
+                    args = (arg,) if state == EDIT_TEXT else ()
+                    await self.dispatch(self.step_handlers[state], message, *args)
+                    return
+
+            await self.dispatch(self.commands.get(text, self.unknown_message), message)
+
+    async def handle_notes_list_page(self, call):
+        page = int(call.data[len(NOTES_LIST_CALLBACK):])
+        await self.ui_manager.edit_notes_list_page(call.message.chat.id, call.message.message_id, page)
+        await self.bot.answer_callback_query(call.id)
+
+    async def handle_noop_callback(self, call):
+        await self.bot.answer_callback_query(call.id)
+
+    async def handle_series_action(self, call):
+        # Buttons under a recurring reminder: "series:<pause|resume|end>:<note_id>".
+        chat_id = call.message.chat.id
+        action, note_id = call.data[len(SERIES_CALLBACK):].split(":")
+        note_id = int(note_id)
+        actions = {
+            "pause": self.note_manager.pause_series,
+            "resume": self.note_manager.resume_series,
+            "end": self.note_manager.end_series,
+        }
+        result = await asyncio.to_thread(actions[action], chat_id, note_id)
+
+        if result is None:
+            result = "Это напоминание уже завершено."
+            markup = None
+        elif action == "end":
+            markup = None
+        else:
+            markup = build_series_markup(note_id, paused=action == "pause")
+        await self.bot.edit_message_reply_markup(chat_id, call.message.message_id, reply_markup=markup)
+        await self.bot.answer_callback_query(call.id, result)
 
-            elif text == "🔙 Назад":
-                self.ui_manager.send_main_menu(chat_id)
+    async def dispatch(self, handler, message, *args):
+        started = time.perf_counter()
+        try:
+            with count_api_calls() as api_calls:
+                await handler(message, *args)
+        finally:
+            elapsed = time.perf_counter() - started
+            stats = self.handler_stats.setdefault(handler.__name__, [0, 0.0, 0.0, 0])
+            stats[0] += 1
+            stats[1] += elapsed
+            stats[2] = max(stats[2], elapsed)
+            stats[3] += sum(api_calls.values())
+
+    def format_handler_stats(self):
+        delivery = self.reminder_delivery.metrics()
+        lines = [
+            f"reminders: queued {delivery['queue_depth']} / delivered {delivery['delivered']}"
+            f" / failed {delivery['failed']} / retries {delivery['retries']}"
+            f" / avg latency {delivery['avg_latency'] * 1000:.0f} ms / max {delivery['max_latency'] * 1000:.0f} ms"
+        ]
+        cache = self.ai_service.cache.stats()
+        lines.append(
+            f"ai cache: hits {cache['hits']} (disk {cache['disk_hits']}) / misses {cache['misses']}"
+            f" / entries {cache['entries']} / disk {cache['disk_entries']} / evicted {cache['disk_evictions']}"
+        )
+        if not self.handler_stats:
+            return "\n".join(lines + ["Нет данных."])
+        lines.append("handler: count / total ms / avg ms / max ms / API calls per update")
+        for name, (count, total, slowest, calls) in sorted(self.handler_stats.items(), key=lambda item: -item[1][1]):
+            lines.append(
+                f"{name}: {count} / {total * 1000:.0f} / {total / count * 1000:.1f} / {slowest * 1000:.1f}"
+                f" / {calls / count:.2f}"
+            )
+        return "\n".join(lines)
+
+    async def unknown_message(self, message):
+        await self.ui_manager.send_main_menu(message.chat.id, force=True, text="Я не понял ваше сообщение. Вот меню:")
+
+    async def send_main_menu(self, message):
+        await self.ui_manager.send_main_menu(message.chat.id)
+
+    async def about_bot(self, message):
+        await self.ui_manager.about_bot(message.chat.id)
+
+    async def show_notes_list(self, message):
+        await self.ui_manager.send_notes_list(message.chat.id)
+
+    async def show_statistics(self, message):
+        await self.ui_manager.show_statistics(message.chat.id)
+
+    async def send_week_statistics(self, message):
+        await self.ui_manager.send_statistics_plot(message.chat.id, 7)
+
+    async def send_month_statistics(self, message):
+        await self.ui_manager.send_statistics_plot(message.chat.id, 30)
+
+    async def add_note_step1(self, message):
+        self.register_next_step(message.chat.id, ADD_NOTE)
+        await self.bot.send_message(message.chat.id, "Введите текст заметки (можно с временем).")
+
+    async def delete_note_step1(self, message):
+        chat_id = message.chat.id
+        if await asyncio.to_thread(self.user_data.has_notes, chat_id):
+            self.register_next_step(chat_id, DELETE_NOTE)
+            await self.ui_manager.send_notes_list(chat_id)
+            await self.bot.send_message(chat_id, "Введите номер заметки для удаления:")
+        else:
+            await self.bot.send_message(chat_id, "У вас пока нет заметок.")
 
-            else:
-                self.bot.send_message(chat_id, "Я не понял ваше сообщение. Вот меню:")
-                self.ui_manager.send_main_menu(chat_id)
+    async def search_notes_step1(self, message):
+        chat_id = message.chat.id
+        if await asyncio.to_thread(self.user_data.has_notes, chat_id):
+            self.register_next_step(chat_id, SEARCH_NOTES)
+            await self.bot.send_message(chat_id, "Введите текст для поиска в заметках:")
+        else:
+            await self.bot.send_message(chat_id, "У вас пока нет заметок для поиска.")
 
-    def add_note_handler(self, message):
-        result = self.note_manager.add_note(message)
-        self.bot.send_message(message.chat.id, result)
-        self.ui_manager.send_main_menu(message.chat.id)
+    async def add_note_handler(self, message):
+        result = await asyncio.to_thread(self.note_manager.add_note, message)
+        await self.ui_manager.send_result(message.chat.id, result)
 
-    def delete_note_handler(self, message):
-        result = self.note_manager.delete_note(message.chat.id, message.text)
-        self.bot.send_message(message.chat.id, result)
-        self.ui_manager.send_main_menu(message.chat.id)
+    async def delete_note_handler(self, message):
+        result = await asyncio.to_thread(self.note_manager.delete_note, message.chat.id, message.text)
+        await self.ui_manager.send_result(message.chat.id, result)
 
-    def edit_note_step1(self, message):
+    async def edit_note_step1(self, message):
         chat_id = message.chat.id
-        notes = self.user_data.get_user_notes(chat_id)
-
-        if not notes:
-            self.bot.send_message(chat_id, "У вас пока нет заметок для редактирования.")
-            self.ui_manager.send_main_menu(chat_id)
+        if not await asyncio.to_thread(self.user_data.has_notes, chat_id):
+            await self.ui_manager.send_result(chat_id, "У вас пока нет заметок для редактирования.")
             return
 
-        self.user_data.set_current_page(chat_id, 0)
-        self.ui_manager.show_notes_page(chat_id)
+        await self.ui_manager.show_notes_page(chat_id)
+
+    async def cancel_notes_page(self, message):
+        self.user_data.clear_chat_state(message.chat.id)
+        await self.ui_manager.send_main_menu(message.chat.id)
 
-    def process_note_selection_for_edit(self, message):
+    async def show_previous_notes_page(self, message):
         chat_id = message.chat.id
+        await self.ui_manager.show_notes_page(chat_id, self.user_data.get_current_page(chat_id) - 1)
 
-        if message.text == "❌ Отмена":
-            self.ui_manager.send_main_menu(chat_id)
-            return
+    async def show_next_notes_page(self, message):
+        chat_id = message.chat.id
+        await self.ui_manager.show_notes_page(chat_id, self.user_data.get_current_page(chat_id) + 1)
 
-        if message.text == "⬅️ Назад":
-            self.ui_manager.show_notes_page(chat_id, self.user_data.get_current_page(chat_id) - 1)
-            return
-        elif message.text == "Вперед ➡️":
-            self.ui_manager.show_notes_page(chat_id, self.user_data.get_current_page(chat_id) + 1)
-            return
+    async def process_note_selection_for_edit(self, message):
+        chat_id = message.chat.id
 
         try:
-            note_id = int(message.text.split(":")[0].strip())
-            notes = self.user_data.get_user_notes(chat_id)
+            note_number = int(message.text.split(":")[0].strip())
+            note_id, current_text = await asyncio.to_thread(self.user_data.get_numbered_note, chat_id, note_number)
 
-            if note_id in notes:
-                current_text = notes[note_id]
+            if current_text is not None:
 
-                markup = ReplyKeyboardMarkup(resize_keyboard=True)
-                markup.add(KeyboardButton("❌ Отмена редактирования"))
-
-                msg = self.bot.send_message(
+                self.register_next_step(chat_id, EDIT_TEXT, note_id)
+                await self.ui_manager.send_cancel_edit_keyboard(
                     chat_id,
-                    f"Текущий текст заметки #{note_id}:\n\n{current_text}\n\nВведите новый текст для заметки:",
-                    reply_markup=markup
+                    f"Текущий текст заметки #{note_number}:\n\n{current_text}\n\nВведите новый текст для заметки:"
                 )
-                self.bot.register_next_step_handler(msg, self.edit_note_step2, note_id)
             else:
-                self.bot.send_message(chat_id, "Такой заметки нет.")
-                self.ui_manager.show_notes_page(chat_id, self.user_data.get_current_page(chat_id))
+                await self.ui_manager.show_notes_page(
+                    chat_id, self.user_data.get_current_page(chat_id), notice="Такой заметки нет."
+                )
         except (ValueError, IndexError):
-            self.bot.send_message(chat_id, "Пожалуйста, выберите заметку из списка.")
-            self.ui_manager.show_notes_page(chat_id, self.user_data.get_current_page(chat_id))
+            await self.ui_manager.show_notes_page(
+                chat_id, self.user_data.get_current_page(chat_id), notice="Пожалуйста, выберите заметку из списка."
+            )
 
-    def edit_note_step2(self, message, note_id):
+    async def edit_note_step2(self, message, note_id):
         chat_id = message.chat.id
 
         if message.text == "❌ Отмена редактирования":
-            self.ui_manager.send_main_menu(chat_id)
+            await self.ui_manager.send_main_menu(chat_id)
             return
 
-        result = self.note_manager.edit_note(chat_id, note_id, message.text)
-        self.bot.send_message(chat_id, result)
-        self.ui_manager.send_main_menu(chat_id)
+        result = await asyncio.to_thread(self.note_manager.edit_note, chat_id, note_id, message.text)
+        await self.ui_manager.send_result(chat_id, result)
 
-    def search_notes_handler(self, message):
-        result = self.note_manager.search_notes(message.chat.id, message.text)
+    async def search_notes_handler(self, message):
+        result = await asyncio.to_thread(self.note_manager.search_notes, message.chat.id, message.text)
         if result.startswith("🔍 Найдены заметки:"):
-            self.bot.send_message(message.chat.id, result, parse_mode="Markdown")
+            await self.ui_manager.send_result(message.chat.id, result, parse_mode="Markdown")
         else:
-            self.bot.send_message(message.chat.id, result)
-        self.ui_manager.send_main_menu(message.chat.id)
+            await self.ui_manager.send_result(message.chat.id, result)
 
-    def analyze_notes_step1(self, message):
+    async def similar_notes_step1(self, message):
         chat_id = message.chat.id
-        notes = self.user_data.get_user_notes(chat_id)
+        if await asyncio.to_thread(self.user_data.has_notes, chat_id):
+            self.register_next_step(chat_id, SIMILAR_NOTES)
+            await self.ui_manager.send_notes_list(chat_id)
+            await self.bot.send_message(chat_id, "Введите номер заметки, для которой искать похожие:")
+        else:
+            await self.bot.send_message(chat_id, "У вас пока нет заметок.")
 
-        if not notes:
-            self.bot.send_message(chat_id, "У вас пока нет заметок для анализа.")
-            return
+    async def similar_notes_handler(self, message):
+        result = await asyncio.to_thread(self.note_manager.similar_notes, message.chat.id, message.text)
+        await self.ui_manager.send_result(message.chat.id, result)
+
+    async def find_duplicates(self, message):
+        result = await asyncio.to_thread(self.note_manager.find_duplicates, message.chat.id)
+        await self.ui_manager.send_result(message.chat.id, result)
 
-        self.ui_manager.send_notes_list(chat_id)
-        self.bot.send_message(chat_id, "Введите номера заметок через запятую, которые хотите отправить на анализ:")
-        self.bot.register_next_step_handler(message, self.analyze_notes_step2)
+    async def analyze_notes_step1(self, message):
+        chat_id = message.chat.id
+        if not await asyncio.to_thread(self.user_data.has_notes, chat_id):
+            await self.bot.send_message(chat_id, "У вас пока нет заметок для анализа.")
+            return
 
-    def analyze_notes_step2(self, message):
-        result = self.ai_service.analyze_notes(message.chat.id, message.text)
-        self.bot.send_message(message.chat.id, result)
-        self.ui_manager.send_main_menu(message.chat.id)
+        await self.ui_manager.send_notes_list(chat_id)
+        self.register_next_step(chat_id, ANALYZE_NOTES)
+        await self.bot.send_message(chat_id, "Введите номера заметок через запятую, которые хотите отправить на анализ:")
 
-    def export_notes_step1(self, message):
+    async def analyze_notes_step2(self, message):
         chat_id = message.chat.id
-        notes = self.user_data.get_user_notes(chat_id)
 
-        if not notes:
-            self.bot.send_message(chat_id, "У вас пока нет заметок для экспорта.")
-            self.ui_manager.send_main_menu(chat_id)
+        if self.ai_service.streaming:
+            payload, error = await asyncio.to_thread(self.ai_service.prepare_analysis, chat_id, message.text)
+            if error:
+                await self.ui_manager.send_result(chat_id, error)
+            else:
+                await self.stream_analysis(chat_id, payload)
+                # The streamed message is edited in place and cannot carry a reply keyboard.
+                await self.ui_manager.send_main_menu(chat_id)
+        else:
+            result = await asyncio.to_thread(self.ai_service.analyze_notes, chat_id, message.text)
+            await self.ui_manager.send_result(chat_id, result)
+
+    async def stream_analysis(self, chat_id, payload):
+        stream = StreamingMessage(self.bot, chat_id, header="Анализ ваших заметок:\n\n")
+        await stream.start()
+
+        chunks = self.ai_service.stream_completion(payload)
+        try:
+            while True:
+                chunk = await asyncio.to_thread(next, chunks, None)
+                if chunk is None:
+                    break
+                await stream.append(chunk)
+        except Exception as e:
+            await stream.finish(f"Произошла ошибка: {str(e)}")
             return
 
-        self.ui_manager.send_notes_list(chat_id)
-        self.bot.send_message(chat_id, "Введите номера заметок через запятую, которые хотите экспортировать:")
-        self.bot.register_next_step_handler(message, self.export_notes_step2)
+        await stream.finish("Ошибка анализа. Попробуйте позже.")
 
-    def export_notes_step2(self, message):
-        result = self.note_manager.export_notes(message.chat.id, message.text)
+    async def export_notes_step1(self, message):
+        chat_id = message.chat.id
+        if not await asyncio.to_thread(self.user_data.has_notes, chat_id):
+            await self.ui_manager.send_result(chat_id, "У вас пока нет заметок для экспорта.")
+            return
 
-        if isinstance(result, list):
-            for file_name in result:
-                with open(file_name, "rb") as file:
-                    self.bot.send_document(message.chat.id, file)
-                os.remove(file_name)
-            self.bot.send_message(message.chat.id, "Экспорт завершён.")
+        await self.ui_manager.send_notes_list(chat_id)
+        self.register_next_step(chat_id, EXPORT_NOTES)
+        await self.bot.send_message(chat_id, (
+            "Введите номера заметок через запятую, диапазон (например, 1-500) или «все». "
+            "В конце можно указать формат: zip, md или jsonl."
+        ))
+
+    async def export_notes_step2(self, message):
+        result = await asyncio.to_thread(self.note_manager.export_notes, message.chat.id, message.text)
+
+        if isinstance(result, tuple):
+            archive, file_name, count = result
+            try:
+                await self.ui_manager.attach_keyboard(
+                    self.bot.send_document, message.chat.id, "main", MAIN_MENU_MARKUP, archive,
+                    visible_file_name=file_name, caption=f"Экспорт завершён: {count} заметок."
+                )
+            finally:
+                archive.close()
         else:
-            self.bot.send_message(message.chat.id, result)
+            await self.ui_manager.send_result(message.chat.id, result)
+
+    async def import_notes_step1(self, message):
+        self.register_next_step(message.chat.id, IMPORT_NOTES)
+        await self.bot.send_message(message.chat.id, (
+            "Отправьте файл .txt (заметка на строку), .md (заметка на заголовок) "
+            "или .jsonl (как при экспорте). Время и повторы в тексте станут напоминаниями."
+        ))
 
-        self.ui_manager.send_main_menu(message.chat.id)
+    async def import_notes_text(self, message):
+        await self.ui_manager.send_result(message.chat.id, "Импорт отменён: нужен файл, а не текст.")
 
-    def run(self):
-        self.bot.infinity_polling()
+    async def import_notes_step2(self, message):
+        chat_id = message.chat.id
+        document = message.document
+        import_format = detect_import_format(document.file_name)
+        if import_format is None:
+            await self.ui_manager.send_result(chat_id, "Поддерживаются файлы .txt, .md и .jsonl.")
+            return
+
+        status = await self.bot.send_message(chat_id, "📥 Загружаю файл…")
+        spool = self.note_manager.importer.spool()
+        try:
+            file_info = await self.bot.get_file(document.file_id)
+            await download_file(self.bot.token, file_info.file_path, spool)
+            spool.seek(0)
+
+            # The import runs on a worker thread; its progress is shown by editing the status message.
+            progress = {"notes": 0}
+            task = asyncio.ensure_future(
+                asyncio.to_thread(self.note_manager.import_notes, chat_id, spool, import_format, progress)
+            )
+            shown = 0
+            while not (await asyncio.wait({task}, timeout=self.import_progress_interval))[0]:
+                if progress["notes"] != shown:
+                    shown = progress["notes"]
+                    try:
+                        await self.bot.edit_message_text(f"📥 Обработано заметок: {shown}…", chat_id, status.message_id)
+                    except Exception:
+                        pass  # progress is best effort; the import itself keeps running
+            result = task.result()
+        except Exception as e:
+            result = f"Произошла ошибка при импорте заметок: {str(e)}"
+        finally:
+            spool.close()
+
+        await self.bot.edit_message_text(result, chat_id, status.message_id)
+        await self.ui_manager.send_main_menu(chat_id)
+
+    async def serve(self, mode="polling", update_queue=None):
+        asyncio.get_running_loop().set_default_executor(self.executor)
+        configure_session()
+        self.reminder_delivery.start()
+        self.reminder_worker.start()
+        if os.getenv('PREWARM', '1') == '1':
+            self.prewarm_task = asyncio.create_task(self.prewarm())
+        expiry_task = asyncio.create_task(self.expire_chat_states())
+        try:
+            if mode == "webhook":
+                await self.serve_webhook()
+            elif mode == "shard":
+                await self.serve_queue(update_queue)
+            else:
+                await self.bot.infinity_polling()
+        finally:
+            expiry_task.cancel()
+            self.reminder_worker.stop()
+            await asyncio.to_thread(self.reminder_worker.join, 5)  # its last reminders reach the queue first
+            await self.reminder_delivery.stop(float(os.getenv('REMINDER_DRAIN_TIMEOUT', '10')))
+            self.ui_manager.chart_renderer.close()
+            self.note_manager.importer.close()
+            self.user_data.close()
+
+    async def expire_chat_states(self, interval=60):
+        while True:
+            await asyncio.sleep(interval)
+            self.user_data.expire_chat_states()
+
+    async def prewarm(self):
+        # Heavy optional dependencies load in the background once the bot is serving.
+        await asyncio.gather(
+            asyncio.to_thread(self.note_manager.time_parser.warm_up),
+            asyncio.to_thread(self.note_manager.similarity_index.warm_up),
+            self.ui_manager.chart_renderer.warm_up(),
+            return_exceptions=True
+        )
+
+    async def serve_webhook(self):
+        from Note_bot.main.WebhookServer import serve_webhook
+
+        await serve_webhook(self.bot, UpdateDispatcher(self.bot))
+
+    async def serve_queue(self, update_queue):
+        # Sharded mode: the front process forwards raw updates over a multiprocessing queue; None stops the shard.
+        dispatcher = UpdateDispatcher(self.bot)
+        dispatcher.start()
+        loop = asyncio.get_running_loop()
+        with ThreadPoolExecutor(max_workers=1) as reader:
+            while True:
+                data = await loop.run_in_executor(reader, update_queue.get)
+                if data is None:
+                    break
+                await dispatcher.put(data)
+        await dispatcher.stop()
+
+    def run(self, mode="polling", update_queue=None):
+        asyncio.run(self.serve(mode, update_queue))
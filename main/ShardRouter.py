@@ -0,0 +1,190 @@
+import asyncio
+import hashlib
+import logging
+import multiprocessing
+import os
+import queue
+import signal
+import sqlite3
+
+from telebot import asyncio_helper
+from telebot.async_telebot import AsyncTeleBot
+
+from Note_bot.main.TelegramSession import configure_api_urls
+from Note_bot.main.UpdateDispatcher import chat_id_of
+from Note_bot.main.data.Storage import SCHEMA
+
+logger = logging.getLogger(__name__)
+
+SHARD_TABLES = ("notes", "note_ids", "reminders", "reminder_series", "statistics", "chat_states")
+
+
+def shard_for(chat_id, shards):
+    # Rendezvous hashing: changing the shard count only moves the chats whose best shard changed.
+    def weight(shard):
+        return hashlib.blake2b(f"{shard}:{chat_id}".encode(), digest_size=8).digest()
+
+    return max(range(shards), key=weight)
+
+
+def shard_database_path(shard, shards):
+    # A single shard is the unsharded deployment, so growing from one shard starts from its database.
+    if shards == 1:
+        return os.getenv('DATABASE_PATH', 'notes.db')
+    return os.getenv('SHARD_DATABASE_PATH', 'notes.shard{shard}.db').format(shard=shard)
+
+
+def run_shard(shard, shards, update_queue, reminder_rate):
+    from Note_bot.main.NoteBot import NoteBot
+    from Note_bot.main.data.Storage import MemoryStorage, SQLiteStorage
+    from Note_bot.main.data.UserDataManager import UserDataManager
+
+    # Ctrl+C reaches the whole process group; the router stops shards through their queues.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if os.getenv('STORAGE_BACKEND', 'sqlite') == 'memory':
+        storage = MemoryStorage()
+    else:
+        storage = SQLiteStorage(shard_database_path(shard, shards))
+    NoteBot(user_data=UserDataManager(storage), reminder_rate=reminder_rate).run("shard", update_queue)
+
+
+class ShardRouter:
+    def __init__(self, shards, queue_size=10000):
+        self.shards = shards
+        # Telegram's limit is per bot token, which every shard shares.
+        self.reminder_rate = float(os.getenv('REMINDER_RATE', '25')) / shards
+        self.context = multiprocessing.get_context('spawn')
+        self.queues = [self.context.Queue(maxsize=queue_size) for _ in range(shards)]
+        self.processes = [None] * shards
+        self.running = False
+
+    def start(self):
+        # WebhookServer starts its dispatcher too; a second start would spawn a second set of shards.
+        if self.running:
+            return
+        self.running = True
+        for shard in range(self.shards):
+            self._spawn(shard)
+
+    async def stop(self):
+        self.running = False
+        for update_queue in self.queues:
+            await asyncio.to_thread(update_queue.put, None)
+        for process in self.processes:
+            await asyncio.to_thread(process.join)
+
+    def submit(self, data):
+        try:
+            self.queues[shard_for(chat_id_of(data), self.shards)].put_nowait(data)
+            return True
+        except queue.Full:
+            return False
+
+    async def put(self, data):
+        update_queue = self.queues[shard_for(chat_id_of(data), self.shards)]
+        await asyncio.to_thread(update_queue.put, data)
+
+    async def poll(self, bot, timeout=30):
+        # Raw update dicts are forwarded as they are; only the owning shard parses them.
+        offset = None
+        while True:
+            try:
+                updates = await asyncio_helper.get_updates(bot.token, offset=offset, timeout=timeout)
+            except Exception:
+                logger.exception("Failed to fetch updates")
+                await asyncio.sleep(3)
+                continue
+            for data in updates:
+                await self.put(data)
+                offset = data["update_id"] + 1
+
+    async def supervise(self, interval=5):
+        while self.running:
+            await asyncio.sleep(interval)
+            for shard, process in enumerate(self.processes):
+                if self.running and not process.is_alive():
+                    logger.error("Shard %d exited with code %s, restarting", shard, process.exitcode)
+                    self._spawn(shard)
+
+    async def serve(self, mode="polling"):
+        bot = AsyncTeleBot(os.getenv('BOT_TOKEN'))
+        configure_api_urls()
+        self.start()
+        supervisor = asyncio.create_task(self.supervise())
+        try:
+            if mode == "webhook":
+                from Note_bot.main.WebhookServer import serve_webhook
+
+                # serve_webhook stops the router together with the HTTP server.
+                await serve_webhook(bot, self)
+            else:
+                try:
+                    await self.poll(bot)
+                finally:
+                    await self.stop()
+        finally:
+            supervisor.cancel()
+            try:
+                await bot.close_session()
+            except AttributeError:
+                pass  # no API call was made, so telebot never opened a session
+
+    def run(self, mode="polling"):
+        asyncio.run(self.serve(mode))
+
+    def _spawn(self, shard):
+        process = self.context.Process(target=run_shard, args=(shard, self.shards, self.queues[shard], self.reminder_rate),
+                                       name=f"shard-{shard}")
+        process.start()
+        self.processes[shard] = process
+
+
+def rebalance_shards(old_shards, new_shards):
+    # Moves every chat's rows to the shard database that owns it under the new shard count.
+    targets = [shard_database_path(shard, new_shards) for shard in range(new_shards)]
+    for path in {*targets, *(shard_database_path(shard, old_shards) for shard in range(old_shards))}:
+        with sqlite3.connect(path) as connection:
+            connection.executescript(SCHEMA)
+
+    moved = 0
+    for source in range(old_shards):
+        source_path = shard_database_path(source, old_shards)
+        connection = sqlite3.connect(source_path, isolation_level=None)
+        try:
+            chat_ids = {
+                chat_id
+                for table in SHARD_TABLES
+                for (chat_id,) in connection.execute(f"SELECT DISTINCT chat_id FROM {table}")
+            }
+            # Paths rather than shard numbers decide what moves: going from one shard, shard 0 is a new file.
+            moves = {}
+            for chat_id in chat_ids:
+                target_path = targets[shard_for(chat_id, new_shards)]
+                if target_path != source_path:
+                    moves.setdefault(target_path, []).append((chat_id,))
+
+            for target_path, rows in moves.items():
+                connection.execute("ATTACH DATABASE ? AS target", (target_path,))
+                try:
+                    connection.execute("BEGIN")
+                    connection.execute("CREATE TEMP TABLE moving (chat_id INTEGER PRIMARY KEY)")
+                    connection.executemany("INSERT INTO moving (chat_id) VALUES (?)", rows)
+                    for table in SHARD_TABLES:
+                        # Clearing the target first keeps an interrupted rebalance safe to run again.
+                        connection.execute(f"DELETE FROM target.{table} WHERE chat_id IN (SELECT chat_id FROM moving)")
+                        connection.execute(
+                            f"INSERT INTO target.{table} SELECT * FROM main.{table} "
+                            f"WHERE chat_id IN (SELECT chat_id FROM moving)"
+                        )
+                        connection.execute(f"DELETE FROM main.{table} WHERE chat_id IN (SELECT chat_id FROM moving)")
+                    connection.execute("DROP TABLE moving")
+                    connection.execute("COMMIT")
+                except sqlite3.Error:
+                    connection.execute("ROLLBACK")
+                    raise
+                finally:
+                    connection.execute("DETACH DATABASE target")
+                moved += len(rows)
+        finally:
+            connection.close()
+    return moved
@@ -1,12 +1,46 @@
-from dotenv import load_dotenv
-import matplotlib
+import argparse
+import os
+import time
 
-from Note_bot.main.NoteBot import NoteBot
+STARTED_AT = time.perf_counter()
 
-matplotlib.use('Agg')
+from dotenv import load_dotenv
 
 load_dotenv()
 
 if __name__ == "__main__":
-    note_bot = NoteBot()
-    note_bot.run()
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--mode', choices=['polling', 'webhook'], default=os.getenv('BOT_MODE', 'polling'))
+    parser.add_argument('--profile-startup', action='store_true',
+                        help="print import times per module and time to the first update")
+    parser.add_argument('--shards', type=int, default=int(os.getenv('SHARDS', '1')),
+                        help="number of worker processes; users are assigned to them by chat id")
+    parser.add_argument('--rebalance-from', type=int, metavar='SHARDS',
+                        help="move shard databases from the given shard count to --shards before starting")
+    args = parser.parse_args()
+
+    if args.rebalance_from:
+        from Note_bot.main.ShardRouter import rebalance_shards
+
+        print(f"Moved {rebalance_shards(args.rebalance_from, args.shards)} chats between shards.")
+
+    if args.shards > 1:
+        from Note_bot.main.ShardRouter import ShardRouter
+
+        ShardRouter(args.shards).run(args.mode)
+    else:
+        profiler = None
+        if args.profile_startup:
+            from Note_bot.main.StartupProfiler import StartupProfiler
+
+            profiler = StartupProfiler(STARTED_AT)
+            profiler.start_imports()
+
+        from Note_bot.main.NoteBot import NoteBot
+
+        note_bot = NoteBot()
+        if profiler:
+            profiler.stop_imports()
+            profiler.mark("bot ready")
+            profiler.watch_first_update(note_bot.bot)
+        note_bot.run(args.mode)
@@ -0,0 +1,63 @@
+import builtins
+import sys
+import time
+
+
+class StartupProfiler:
+    def __init__(self, started_at=None, top=25):
+        self.started_at = started_at or time.perf_counter()
+        self.top = top
+        self.imports = []  # [(module, self_seconds, cumulative_seconds)]
+        self.marks = []  # [(label, seconds_since_start)]
+        self.stack = []
+        self.original_import = None
+
+    def start_imports(self):
+        self.original_import = builtins.__import__
+        builtins.__import__ = self._timed_import
+
+    def stop_imports(self):
+        if self.original_import is not None:
+            builtins.__import__ = self.original_import
+            self.original_import = None
+
+    def mark(self, label):
+        self.marks.append((label, time.perf_counter() - self.started_at))
+
+    def watch_first_update(self, bot):
+        process_new_updates = bot.process_new_updates
+
+        async def first_update(updates):
+            bot.process_new_updates = process_new_updates
+            self.mark("first update")
+            self.report()
+            return await process_new_updates(updates)
+
+        bot.process_new_updates = first_update
+
+    def report(self, file=None):
+        file = file or sys.stderr
+        print("Startup profile", file=file)
+        for label, seconds in self.marks:
+            print(f"  {label:<24} {seconds * 1000:9.1f} ms", file=file)
+        print(f"Slowest imports (top {self.top}, self / cumulative):", file=file)
+        for module, own, cumulative in sorted(self.imports, key=lambda item: item[1], reverse=True)[:self.top]:
+            print(f"  {own * 1000:9.1f} ms {cumulative * 1000:9.1f} ms  {module}", file=file)
+
+    def _timed_import(self, name, globals=None, locals=None, fromlist=(), level=0):
+        if level == 0 and name in sys.modules:
+            return self.original_import(name, globals, locals, fromlist, level)
+
+        start = time.perf_counter()
+        self.stack.append(0.0)
+        try:
+            return self.original_import(name, globals, locals, fromlist, level)
+        finally:
+            elapsed = time.perf_counter() - start
+            children = self.stack.pop()
+            if self.stack:
+                self.stack[-1] += elapsed
+            if level:
+                package = (globals or {}).get('__package__') or ''
+                name = f"{package}.{name}" if name else package
+            self.imports.append((name, elapsed - children, elapsed))
@@ -0,0 +1,74 @@
+import contextvars
+import os
+from collections import Counter
+from contextlib import contextmanager
+
+import aiohttp
+from telebot import asyncio_helper
+
+# Counter of Bot API methods called by the current update, or None outside of a counted block.
+api_calls = contextvars.ContextVar('api_calls', default=None)
+
+_process_request = asyncio_helper._process_request
+
+
+async def _counted_request(token, url, *args, **kwargs):
+    counter = api_calls.get()
+    if counter is not None:
+        counter[url] += 1
+    return await _process_request(token, url, *args, **kwargs)
+
+
+def configure_api_urls():
+    if os.getenv('TELEGRAM_API_URL'):
+        # e.g. a local Bot API server: http://127.0.0.1:8081/bot{0}/{1}
+        asyncio_helper.API_URL = os.getenv('TELEGRAM_API_URL')
+    if os.getenv('TELEGRAM_FILE_URL'):
+        asyncio_helper.FILE_URL = os.getenv('TELEGRAM_FILE_URL')
+
+
+def configure_session(pool_size=None, keepalive=None):
+    # All requests go to one host, so the per-host limit is the whole pool; idle connections are kept
+    # long enough to be reused by the next update instead of paying a new TLS handshake.
+    configure_api_urls()
+    pool_size = pool_size or int(os.getenv('TELEGRAM_POOL_SIZE', '100'))
+    keepalive = keepalive or float(os.getenv('TELEGRAM_KEEPALIVE', '60'))
+    manager = asyncio_helper.session_manager
+    asyncio_helper.REQUEST_LIMIT = pool_size
+
+    async def create_session():
+        manager.session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(
+            limit=pool_size,
+            limit_per_host=pool_size,
+            keepalive_timeout=keepalive,
+            ttl_dns_cache=300,
+            ssl=manager.ssl_context
+        ))
+        return manager.session
+
+    manager.create_session = create_session
+    asyncio_helper._process_request = _counted_request
+
+
+async def download_file(token, file_path, destination, chunk_size=64 * 1024):
+    # Streams the file into destination; telebot's download_file reads the whole body into memory.
+    if asyncio_helper.FILE_URL is None:
+        url = "https://api.telegram.org/file/bot{0}/{1}".format(token, file_path)
+    else:
+        url = asyncio_helper.FILE_URL.format(token, file_path)
+    session = await asyncio_helper.session_manager.get_session()
+    async with session.get(url, proxy=asyncio_helper.proxy) as response:
+        if response.status != 200:
+            raise asyncio_helper.ApiHTTPException('Download file', response)
+        async for chunk in response.content.iter_chunked(chunk_size):
+            destination.write(chunk)
+
+
+@contextmanager
+def count_api_calls():
+    counter = Counter()
+    token = api_calls.set(counter)
+    try:
+        yield counter
+    finally:
+        api_calls.reset(token)
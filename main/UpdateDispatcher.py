@@ -0,0 +1,85 @@
+import asyncio
+import logging
+from collections import deque
+
+from telebot.types import Update
+
+logger = logging.getLogger(__name__)
+
+
+def chat_id_of(data):
+    # Works on the raw update dict so routing does not need to parse the whole update.
+    message = data.get("message") or data.get("edited_message") or (data.get("callback_query") or {}).get("message")
+    if message:
+        return message["chat"]["id"]
+    return data["update_id"]
+
+
+class UpdateDispatcher:
+    def __init__(self, bot, workers=64, queue_size=10000):
+        self.bot = bot
+        # Each chat's updates run in order, one at a time; different chats run side by side, up to workers
+        # at once. A slow handler, e.g. an AI analysis, so holds up only its own chat.
+        self.workers = workers
+        self.queue_size = queue_size  # pending updates across all chats
+        self.chats = {}  # {chat_id: deque of updates}, present while the chat has a running task
+        self.tasks = set()
+        self.pending = 0
+        self.slots = None
+        self.space = None
+        self.idle = None
+
+    def start(self):
+        self.slots = asyncio.Semaphore(self.workers)
+        self.space = asyncio.Event()
+        self.space.set()
+        self.idle = asyncio.Event()
+        self.idle.set()
+
+    async def stop(self):
+        await self.idle.wait()
+        for task in list(self.tasks):
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+
+    def submit(self, data):
+        if self.pending >= self.queue_size:
+            return False
+        self._enqueue(data)
+        return True
+
+    async def put(self, data):
+        while self.pending >= self.queue_size:
+            self.space.clear()
+            await self.space.wait()
+        self._enqueue(data)
+
+    def _enqueue(self, data):
+        self.pending += 1
+        self.idle.clear()
+        chat_id = chat_id_of(data)
+        chat_queue = self.chats.get(chat_id)
+        if chat_queue is not None:
+            chat_queue.append(data)
+            return
+        self.chats[chat_id] = deque([data])
+        task = asyncio.create_task(self._work(chat_id))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def _work(self, chat_id):
+        chat_queue = self.chats[chat_id]
+        async with self.slots:
+            while chat_queue:
+                data = chat_queue.popleft()
+                try:
+                    await self.bot.process_new_updates([Update.de_json(data)])
+                except Exception:
+                    logger.exception("Failed to process update %s", data.get("update_id"))
+                finally:
+                    self.pending -= 1
+                    self.space.set()
+                    if not self.pending:
+                        self.idle.set()
+        # Nothing can be appended between the last popleft and here: there is no await in between.
+        del self.chats[chat_id]
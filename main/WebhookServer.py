@@ -0,0 +1,73 @@
+import asyncio
+import hmac
+import os
+import signal
+
+from aiohttp import web
+
+
+class WebhookServer:
+    def __init__(self, dispatcher, host="0.0.0.0", port=8080, path="/webhook", secret_token=None):
+        # The dispatcher is an UpdateDispatcher in a single process or a ShardRouter in sharded mode.
+        self.dispatcher = dispatcher
+        self.host = host
+        self.port = port
+        self.path = path
+        self.secret_token = secret_token
+        self.runner = None
+
+    async def start(self):
+        self.dispatcher.start()
+        app = web.Application()
+        app.router.add_post(self.path, self.handle_update)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, self.host, self.port).start()
+
+    async def stop(self):
+        if self.runner is not None:
+            await self.runner.cleanup()
+        await self.dispatcher.stop()
+
+    async def handle_update(self, request):
+        if self.secret_token:
+            token = request.headers.get("X-Telegram-Bot-Api-Secret-Token", "")
+            if not hmac.compare_digest(token, self.secret_token):
+                return web.Response(status=403)
+
+        try:
+            data = await request.json()
+        except ValueError:
+            return web.Response(status=400)
+        if not isinstance(data, dict) or "update_id" not in data:
+            return web.Response(status=400)
+
+        if not self.dispatcher.submit(data):
+            # Telegram retries undelivered updates, so shed load instead of buffering without bound.
+            return web.Response(status=503)
+        return web.Response()
+
+
+async def serve_webhook(bot, dispatcher):
+    secret_token = os.getenv('WEBHOOK_SECRET')
+    server = WebhookServer(
+        dispatcher,
+        host=os.getenv('WEBHOOK_HOST', '0.0.0.0'),
+        port=int(os.getenv('WEBHOOK_PORT', '8080')),
+        path=os.getenv('WEBHOOK_PATH', '/webhook'),
+        secret_token=secret_token
+    )
+    await server.start()
+
+    webhook_url = os.getenv('WEBHOOK_URL')
+    if webhook_url:
+        await bot.set_webhook(url=webhook_url, secret_token=secret_token)
+
+    stopped = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stopped.set)
+    try:
+        await stopped.wait()
+    finally:
+        await server.stop()
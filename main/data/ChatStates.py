@@ -0,0 +1,69 @@
+import time
+
+# Conversation states; the argument is the notes page for EDIT_SELECT and the note id for EDIT_TEXT.
+ADD_NOTE = 1
+DELETE_NOTE = 2
+EDIT_SELECT = 3
+EDIT_TEXT = 4
+SEARCH_NOTES = 5
+ANALYZE_NOTES = 6
+EXPORT_NOTES = 7
+IMPORT_NOTES = 8
+SIMILAR_NOTES = 9
+
+STATE_BITS = 4
+ARG_BITS = 28
+
+
+class ChatStates:
+    def __init__(self, ttl=30 * 60):
+        self.ttl = ttl
+        # {chat_id: expires_at << 32 | arg << 4 | state}; kept in expiry order because the ttl is fixed
+        # and every update re-inserts the chat at the end.
+        self.states = {}
+
+    @staticmethod
+    def pack(state, arg, expires_at):
+        if not 0 <= arg < 1 << ARG_BITS:
+            raise ValueError(f"state argument out of range: {arg}")
+        return (int(expires_at) << (STATE_BITS + ARG_BITS)) | (arg << STATE_BITS) | state
+
+    @staticmethod
+    def unpack(packed):
+        return (
+            packed & ((1 << STATE_BITS) - 1),
+            (packed >> STATE_BITS) & ((1 << ARG_BITS) - 1),
+            packed >> (STATE_BITS + ARG_BITS),
+        )
+
+    def get(self, chat_id, now=None):
+        packed = self.states.get(chat_id)
+        if packed is None:
+            return None
+        state, arg, expires_at = self.unpack(packed)
+        if expires_at <= (now or time.time()):
+            return None  # dropped, together with its stored copy, by the next expire()
+        return state, arg
+
+    def set(self, chat_id, state, arg=0, now=None):
+        expires_at = int((now or time.time()) + self.ttl)
+        self.states.pop(chat_id, None)
+        self.states[chat_id] = self.pack(state, arg, expires_at)
+        return expires_at
+
+    def restore(self, chat_id, state, arg, expires_at):
+        self.states[chat_id] = self.pack(state, arg, expires_at)
+
+    def clear(self, chat_id):
+        return self.states.pop(chat_id, None) is not None
+
+    def expire(self, now=None):
+        now = now or time.time()
+        expired = []
+        for chat_id, packed in self.states.items():
+            if packed >> (STATE_BITS + ARG_BITS) > now:
+                break
+            expired.append(chat_id)
+        for chat_id in expired:
+            del self.states[chat_id]
+        return expired
@@ -0,0 +1,403 @@
+import copy
+import json
+import logging
+import os
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS notes (
+    chat_id INTEGER NOT NULL,
+    note_id INTEGER NOT NULL,
+    note_text TEXT NOT NULL,
+    PRIMARY KEY (chat_id, note_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS note_ids (
+    chat_id INTEGER PRIMARY KEY,
+    last_note_id INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS reminders (
+    chat_id INTEGER NOT NULL,
+    note_id INTEGER NOT NULL,
+    remind_time TEXT NOT NULL
+);
+DROP INDEX IF EXISTS reminders_chat_id;
+CREATE INDEX IF NOT EXISTS reminders_chat_note ON reminders (chat_id, note_id);
+CREATE TABLE IF NOT EXISTS reminder_series (
+    chat_id INTEGER NOT NULL,
+    note_id INTEGER NOT NULL,
+    rule TEXT NOT NULL,
+    next_time TEXT NOT NULL,
+    paused INTEGER NOT NULL,
+    PRIMARY KEY (chat_id, note_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS statistics (
+    chat_id INTEGER PRIMARY KEY,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS chat_states (
+    chat_id INTEGER PRIMARY KEY,
+    state INTEGER NOT NULL,
+    arg INTEGER NOT NULL,
+    expires_at INTEGER NOT NULL
+);
+"""
+# Ids are never reused: the mark only moves up, even when an import commits after a later note.
+SAVE_LAST_NOTE_ID = (
+    "INSERT INTO note_ids (chat_id, last_note_id) VALUES (?, ?) "
+    "ON CONFLICT (chat_id) DO UPDATE SET last_note_id = MAX(last_note_id, excluded.last_note_id)"
+)
+
+
+class MemoryStorage:
+    def __init__(self):
+        self.notes = {}  # {chat_id: {note_id: note_text}}
+        self.last_note_ids = {}  # {chat_id: highest note_id ever issued}
+        self.reminders = {}  # {chat_id: {note_id: [remind_time]}}
+        self.series = {}  # {chat_id: {note_id: (rule, next_time, paused)}}
+        self.statistics = {}  # {chat_id: statistics_dict}
+        self.chat_states = {}  # {chat_id: (state, arg, expires_at)}
+
+    def load_notes(self, chat_id):
+        return dict(self.notes.get(chat_id, {}))
+
+    def load_last_note_id(self, chat_id):
+        return self.last_note_ids.get(chat_id)
+
+    def load_reminders(self):
+        return {
+            chat_id: {note_id: list(times) for note_id, times in reminders.items()}
+            for chat_id, reminders in self.reminders.items() if reminders
+        }
+
+    def load_series(self):
+        return {chat_id: dict(series) for chat_id, series in self.series.items() if series}
+
+    def load_statistics(self, chat_id):
+        return copy.deepcopy(self.statistics.get(chat_id))
+
+    def load_chat_states(self, now):
+        rows = [(chat_id, *row) for chat_id, row in self.chat_states.items() if row[2] > now]
+        return sorted(rows, key=lambda row: row[3])
+
+    def save_note(self, chat_id, note_id, note_text):
+        self.notes.setdefault(chat_id, {})[note_id] = note_text
+
+    def add_note(self, chat_id, note_id, note_text):
+        self.save_note(chat_id, note_id, note_text)
+        self.save_last_note_id(chat_id, note_id)
+
+    def save_last_note_id(self, chat_id, note_id):
+        self.last_note_ids[chat_id] = max(self.last_note_ids.get(chat_id, 0), note_id)
+
+    def delete_note(self, chat_id, note_id):
+        self.notes.get(chat_id, {}).pop(note_id, None)
+
+    def add_reminder(self, chat_id, note_id, remind_time):
+        self.reminders.setdefault(chat_id, {}).setdefault(note_id, []).append(remind_time)
+
+    def delete_reminder(self, chat_id, note_id, remind_time):
+        times = self.reminders.get(chat_id, {}).get(note_id, [])
+        if remind_time in times:
+            times.remove(remind_time)
+        if not times:
+            self.delete_note_reminders(chat_id, note_id)
+
+    def delete_note_reminders(self, chat_id, note_id):
+        reminders = self.reminders.get(chat_id, {})
+        reminders.pop(note_id, None)
+        if not reminders:
+            self.reminders.pop(chat_id, None)
+
+    def save_series(self, chat_id, note_id, rule, next_time, paused):
+        self.series.setdefault(chat_id, {})[note_id] = (rule, next_time, paused)
+
+    def delete_series(self, chat_id, note_id):
+        self.series.get(chat_id, {}).pop(note_id, None)
+
+    def save_statistics(self, chat_id, stats):
+        self.statistics[chat_id] = copy.deepcopy(stats)
+
+    def import_notes(self, chat_id, notes, reminders, series):
+        self.notes.setdefault(chat_id, {}).update(notes)
+        if notes:
+            self.save_last_note_id(chat_id, max(note_id for note_id, _ in notes))
+        for note_id, remind_time in reminders:
+            self.add_reminder(chat_id, note_id, remind_time)
+        for note_id, rule, next_time in series:
+            self.save_series(chat_id, note_id, rule, next_time, False)
+
+    def save_chat_state(self, chat_id, state, arg, expires_at):
+        self.chat_states[chat_id] = (state, arg, expires_at)
+
+    def delete_chat_states(self, chat_ids):
+        for chat_id in chat_ids:
+            self.chat_states.pop(chat_id, None)
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class SQLiteStorage:
+    def __init__(self, path, flush_interval=0.05, max_batch=1000):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+
+        self.connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        # FULL syncs the WAL on every commit, so an acknowledged write survives a power loss too;
+        # group commit keeps that to one sync per batch. NORMAL only protects against process crashes.
+        synchronous = os.getenv('SQLITE_SYNCHRONOUS', 'FULL').upper()
+        if synchronous not in ('OFF', 'NORMAL', 'FULL', 'EXTRA'):
+            raise ValueError(f"Unknown SQLITE_SYNCHRONOUS value: {synchronous}")
+        self.connection.execute(f"PRAGMA synchronous={synchronous}")
+        self.connection.executescript(SCHEMA)
+        self.connection_lock = threading.Lock()
+
+        # Writes are queued and committed by a single writer thread in batches,
+        # so a burst of updates costs one transaction instead of one per call (see _enqueue).
+        self.condition = threading.Condition()
+        self.pending = []  # [(statements, durable)], one entry per _enqueue call
+        self.enqueued = 0
+        self.committed = 0
+        self.waiting = 0  # callers blocked until their write commits
+        self.failed = {}  # {ticket: error} for durable writes whose transaction failed
+        self.flush_requested = False
+        self.running = True
+        self.writer = threading.Thread(target=self._write_loop, daemon=True)
+        self.writer.start()
+
+    def load_notes(self, chat_id):
+        rows = self._query("SELECT note_id, note_text FROM notes WHERE chat_id = ?", (chat_id,))
+        return {note_id: note_text for note_id, note_text in rows}
+
+    def load_last_note_id(self, chat_id):
+        rows = self._query("SELECT last_note_id FROM note_ids WHERE chat_id = ?", (chat_id,))
+        return rows[0][0] if rows else None
+
+    def load_reminders(self):
+        self.flush()
+        reminders = {}
+        rows = self._query("SELECT chat_id, note_id, remind_time FROM reminders ORDER BY rowid")
+        for chat_id, note_id, remind_time in rows:
+            reminders.setdefault(chat_id, {}).setdefault(note_id, []).append(datetime.fromisoformat(remind_time))
+        return reminders
+
+    def load_series(self):
+        self.flush()
+        series = {}
+        rows = self._query("SELECT chat_id, note_id, rule, next_time, paused FROM reminder_series")
+        for chat_id, note_id, rule, next_time, paused in rows:
+            series.setdefault(chat_id, {})[note_id] = (sys.intern(rule), datetime.fromisoformat(next_time), bool(paused))
+        return series
+
+    def load_statistics(self, chat_id):
+        rows = self._query("SELECT data FROM statistics WHERE chat_id = ?", (chat_id,))
+        return json.loads(rows[0][0]) if rows else None
+
+    def load_chat_states(self, now):
+        self._enqueue([("DELETE FROM chat_states WHERE expires_at <= ?", (now,))], durable=False)
+        self.flush()
+        return self._query(
+            "SELECT chat_id, state, arg, expires_at FROM chat_states WHERE expires_at > ? ORDER BY expires_at",
+            (now,)
+        )
+
+    def save_note(self, chat_id, note_id, note_text):
+        self._enqueue([(
+            "INSERT OR REPLACE INTO notes (chat_id, note_id, note_text) VALUES (?, ?, ?)",
+            (chat_id, note_id, note_text)
+        )])
+
+    def add_note(self, chat_id, note_id, note_text):
+        self._enqueue([
+            ("INSERT OR REPLACE INTO notes (chat_id, note_id, note_text) VALUES (?, ?, ?)", (chat_id, note_id, note_text)),
+            (SAVE_LAST_NOTE_ID, (chat_id, note_id)),
+        ])
+
+    def delete_note(self, chat_id, note_id):
+        self._enqueue([("DELETE FROM notes WHERE chat_id = ? AND note_id = ?", (chat_id, note_id))])
+
+    def add_reminder(self, chat_id, note_id, remind_time):
+        self._enqueue([(
+            "INSERT INTO reminders (chat_id, note_id, remind_time) VALUES (?, ?, ?)",
+            (chat_id, note_id, remind_time.isoformat())
+        )])
+
+    def delete_reminder(self, chat_id, note_id, remind_time):
+        # A note can hold the same time twice; only one of the rows goes, as in UserDataManager.
+        self._enqueue([(
+            "DELETE FROM reminders WHERE rowid = (SELECT rowid FROM reminders "
+            "WHERE chat_id = ? AND note_id = ? AND remind_time = ? LIMIT 1)",
+            (chat_id, note_id, remind_time.isoformat())
+        )])
+
+    def delete_note_reminders(self, chat_id, note_id):
+        self._enqueue([("DELETE FROM reminders WHERE chat_id = ? AND note_id = ?", (chat_id, note_id))])
+
+    def save_series(self, chat_id, note_id, rule, next_time, paused):
+        self._enqueue([(
+            "INSERT OR REPLACE INTO reminder_series (chat_id, note_id, rule, next_time, paused) VALUES (?, ?, ?, ?, ?)",
+            (chat_id, note_id, rule, next_time.isoformat(), int(paused))
+        )])
+
+    def delete_series(self, chat_id, note_id):
+        self._enqueue([("DELETE FROM reminder_series WHERE chat_id = ? AND note_id = ?", (chat_id, note_id))])
+
+    def import_notes(self, chat_id, notes, reminders, series):
+        # One enqueue is never split between commits, so the whole import lands in a single transaction.
+        self._enqueue([
+            ("INSERT OR REPLACE INTO notes (chat_id, note_id, note_text) VALUES (?, ?, ?)",
+             [(chat_id, note_id, note_text) for note_id, note_text in notes]),
+            (SAVE_LAST_NOTE_ID, [(chat_id, max((note_id for note_id, _ in notes), default=0))]),
+            ("INSERT INTO reminders (chat_id, note_id, remind_time) VALUES (?, ?, ?)",
+             [(chat_id, note_id, remind_time.isoformat()) for note_id, remind_time in reminders]),
+            ("INSERT OR REPLACE INTO reminder_series (chat_id, note_id, rule, next_time, paused) VALUES (?, ?, ?, ?, 0)",
+             [(chat_id, note_id, rule, next_time.isoformat()) for note_id, rule, next_time in series]),
+        ])
+
+    def save_statistics(self, chat_id, stats):
+        self._enqueue([(
+            "INSERT OR REPLACE INTO statistics (chat_id, data) VALUES (?, ?)",
+            (chat_id, json.dumps(stats, ensure_ascii=False))
+        )], durable=False)
+
+    def save_chat_state(self, chat_id, state, arg, expires_at):
+        self._enqueue([(
+            "INSERT OR REPLACE INTO chat_states (chat_id, state, arg, expires_at) VALUES (?, ?, ?, ?)",
+            (chat_id, state, arg, expires_at)
+        )], durable=False)
+
+    def delete_chat_states(self, chat_ids):
+        statements = [("DELETE FROM chat_states WHERE chat_id = ?", (chat_id,)) for chat_id in chat_ids]
+        self._enqueue(statements, durable=False)
+
+    def flush(self):
+        with self.condition:
+            target = self.enqueued
+            if self.committed >= target:
+                return
+            self.flush_requested = True
+            self.condition.notify_all()
+            while self.committed < target:
+                self.condition.wait()
+
+    def close(self):
+        self.flush()
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+        self.writer.join()
+        with self.connection_lock:
+            self.connection.close()
+
+    def _query(self, sql, params=()):
+        # UserDataManager caches everything it has written, so lazy per-chat loads
+        # never depend on queued writes and do not wait for the writer.
+        with self.connection_lock:
+            return self.connection.execute(sql, params).fetchall()
+
+    def _enqueue(self, statements, durable=True):
+        # Durable writes return only once their transaction has committed, so nothing the user was told is saved
+        # can be lost to a crash; the writer commits whatever piled up meanwhile together (group commit).
+        # Chat states and statistics are cheap to lose and are written behind.
+        with self.condition:
+            self.pending.append((statements, durable))
+            self.enqueued += 1
+            ticket = self.enqueued
+            if not durable:
+                self.condition.notify_all()
+                return
+            self.waiting += 1
+            self.condition.notify_all()
+            try:
+                while self.committed < ticket:
+                    self.condition.wait()
+            finally:
+                self.waiting -= 1
+            error = self.failed.pop(ticket, None)
+        if error is not None:
+            raise error
+
+    def _write_loop(self):
+        while True:
+            with self.condition:
+                while self.running and not self.pending:
+                    self.condition.wait()
+                if not self.pending:
+                    return
+
+                # Writes behind are held back for flush_interval to batch up; a waiting caller is served at once,
+                # and everything that arrives while that commit runs goes into the next one.
+                deadline = time.monotonic() + self.flush_interval
+                while (self.running and not self.flush_requested and not self.waiting
+                       and len(self.pending) < self.max_batch):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.condition.wait(remaining)
+
+                groups, self.pending = self.pending, []
+                self.flush_requested = False
+                first_ticket = self.enqueued - len(groups) + 1
+
+            failed = self._commit(groups)
+
+            with self.condition:
+                for index, error in failed.items():
+                    if groups[index][1]:  # someone is waiting for it
+                        self.failed[first_ticket + index] = error
+                self.committed = first_ticket + len(groups) - 1
+                self.condition.notify_all()
+
+    def _commit(self, groups):
+        # Returns {group index: error}. A failing batch is retried group by group, so only the group that
+        # actually fails is dropped and the other chats' writes still land.
+        with self.connection_lock:
+            try:
+                self._execute(groups)
+                return {}
+            except sqlite3.Error:
+                if len(groups) == 1:
+                    logger.exception("Failed to commit storage statements")
+                    return {0: sys.exc_info()[1]}
+
+            failed = {}
+            for index, group in enumerate(groups):
+                try:
+                    self._execute([group])
+                except sqlite3.Error as e:
+                    logger.exception("Failed to commit storage statements")
+                    failed[index] = e
+            return failed
+
+    def _execute(self, groups):
+        try:
+            self.connection.execute("BEGIN")
+            for statements, _ in groups:
+                for sql, params in statements:
+                    if isinstance(params, list):  # rows of a bulk statement
+                        self.connection.executemany(sql, params)
+                    else:
+                        self.connection.execute(sql, params)
+            self.connection.execute("COMMIT")
+        except sqlite3.Error:
+            if self.connection.in_transaction:
+                self.connection.execute("ROLLBACK")
+            raise
+
+
+def create_storage():
+    backend = os.getenv('STORAGE_BACKEND', 'sqlite')
+    if backend == 'memory':
+        return MemoryStorage()
+    return SQLiteStorage(os.getenv('DATABASE_PATH', 'notes.db'))
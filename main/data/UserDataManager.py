@@ -1,48 +1,300 @@
-from datetime import datetime
+import bisect
+import os
+import threading
+import time
+
+from Note_bot.main.data.ChatStates import EDIT_SELECT, ChatStates
+from Note_bot.main.data.Storage import create_storage
+from Note_bot.main.data.UserStatistics import UserStatistics
+from Note_bot.main.service.Recurrence import advance
 
 
 class UserDataManager:
-    def __init__(self):
-        self.user_notes = {}  # {chat_id: {note_id: note_text}}
-        self.user_reminders = {}  # {chat_id: [(note_id, remind_time)]}
-        self.user_statistics = {}  # {chat_id: statistics_dict}
-        self.current_page = {}  # {chat_id: page_number}
+    def __init__(self, storage=None, lock_stripes=None):
+        self.storage = storage if storage is not None else create_storage()
+        # Per-chat state is guarded by one of a fixed set of locks picked by chat id, so handlers for
+        # different users rarely contend and the reminder thread only blocks the chat it is touching.
+        stripes = lock_stripes or int(os.getenv('DATA_LOCK_STRIPES', '64'))
+        self.locks = [threading.RLock() for _ in range(stripes)]
+        self.user_notes = {}  # {chat_id: {note_id: note_text}}, loaded lazily from storage
+        self.note_order = {}  # {chat_id: sorted [note_id]}, position + 1 is the number shown to the user
+        self.last_note_id = {}  # {chat_id: highest note_id ever issued}, persisted so deleted ids stay retired
+        self.notes_version = {}  # {chat_id: int}, bumped on every note change
+        self.user_reminders = self.storage.load_reminders()  # {chat_id: {note_id: [remind_time]}}
+        self.reminder_series = self.storage.load_series()  # {chat_id: {note_id: (rule, next_time, paused)}}
+        self.user_statistics = {}  # {chat_id: UserStatistics}, loaded lazily from storage
+        self.chat_states = ChatStates(ttl=int(os.getenv('CHAT_STATE_TTL', str(30 * 60))))
+        for row in self.storage.load_chat_states(time.time()):
+            self.chat_states.restore(*row)
+
+    def chat_lock(self, chat_id):
+        return self.locks[hash(chat_id) % len(self.locks)]
 
     def get_user_notes(self, chat_id):
-        if chat_id not in self.user_notes:
-            self.user_notes[chat_id] = {}
-        return self.user_notes[chat_id]
+        with self.chat_lock(chat_id):
+            if chat_id not in self.user_notes:
+                self.user_notes[chat_id] = self.storage.load_notes(chat_id)
+            return self.user_notes[chat_id]
+
+    def has_notes(self, chat_id):
+        with self.chat_lock(chat_id):
+            return bool(self.get_user_notes(chat_id))
+
+    def get_numbered_note(self, chat_id, number):
+        # (note_id, note_text) of the note shown as number, or (None, None).
+        with self.chat_lock(chat_id):
+            note_id = self.resolve_note_id(chat_id, number)
+            if note_id is None:
+                return None, None
+            return note_id, self.get_user_notes(chat_id).get(note_id)
+
+    def get_notes_snapshot(self, chat_id):
+        # A copy that stays consistent while other threads keep changing the chat's notes.
+        with self.chat_lock(chat_id):
+            return dict(self.get_user_notes(chat_id))
 
-    def get_user_reminders(self, chat_id):
-        if chat_id not in self.user_reminders:
-            self.user_reminders[chat_id] = []
-        return self.user_reminders[chat_id]
+    def get_note_reminders(self, chat_id, note_id):
+        with self.chat_lock(chat_id):
+            return list(self.user_reminders.get(chat_id, {}).get(note_id, ()))
+
+    def get_pending_reminders(self):
+        # {chat_id: [(note_id, remind_time)]} in the shape ReminderScheduler.schedule_all expects, copied chat by
+        # chat under its lock so handlers can keep adding reminders meanwhile.
+        pending = {}
+        for chat_id in list(self.user_reminders):
+            with self.chat_lock(chat_id):
+                reminders = [(note_id, remind_time) for note_id, times in self.user_reminders.get(chat_id, {}).items()
+                             for remind_time in times]
+            if reminders:
+                pending[chat_id] = reminders
+        return pending
 
     def get_user_statistics(self, chat_id):
-        if chat_id not in self.user_statistics:
-            self.user_statistics[chat_id] = {
-                "notes_created": {},  # {date: count}
-                "notes_deleted": {},  # {date: count}
-                "ai_analysis": {},  # {date: count}
-                "total_ai_used": 0
-            }
-        return self.user_statistics[chat_id]
-
-    def update_user_statistics(self, chat_id, stat_type):
-        stats = self.get_user_statistics(chat_id)
-        today = datetime.now().strftime("%m-%d")
-
-        if stat_type in stats:
-            if today in stats[stat_type]:
-                stats[stat_type][today] += 1
-            else:
-                stats[stat_type][today] = 1
-
-            if stat_type == "ai_analysis":
-                stats["total_ai_used"] += 1
+        with self.chat_lock(chat_id):
+            if chat_id not in self.user_statistics:
+                data = self.storage.load_statistics(chat_id)
+                self.user_statistics[chat_id] = UserStatistics.from_dict(data) if data else UserStatistics()
+            return self.user_statistics[chat_id]
+
+    def get_note_order(self, chat_id):
+        with self.chat_lock(chat_id):
+            if chat_id not in self.note_order:
+                self.note_order[chat_id] = sorted(self.get_user_notes(chat_id))
+            return self.note_order[chat_id]
+
+    def resolve_note_id(self, chat_id, number):
+        with self.chat_lock(chat_id):
+            order = self.get_note_order(chat_id)
+            if 1 <= number <= len(order):
+                return order[number - 1]
+            return None
+
+    def get_display_number(self, chat_id, note_id):
+        with self.chat_lock(chat_id):
+            order = self.get_note_order(chat_id)
+            position = bisect.bisect_left(order, note_id)
+            if position < len(order) and order[position] == note_id:
+                return position + 1
+            return None
+
+    def get_numbered_notes(self, chat_id):
+        with self.chat_lock(chat_id):
+            notes = self.get_user_notes(chat_id)
+            return [(number, note_id, notes[note_id]) for number, note_id in enumerate(self.get_note_order(chat_id), 1)]
+
+    def select_notes(self, chat_id, numbers):
+        # {note_id: note_text} of the notes shown as numbers, resolved and read in one go so a concurrent
+        # delete cannot shift the numbering in between; unknown numbers are skipped.
+        with self.chat_lock(chat_id):
+            notes = self.get_user_notes(chat_id)
+            order = self.get_note_order(chat_id)
+            return {order[number - 1]: notes[order[number - 1]] for number in numbers if 1 <= number <= len(order)}
+
+    def get_notes_version(self, chat_id):
+        return self.notes_version.get(chat_id, 0)
+
+    def add_note(self, chat_id, note_text):
+        with self.chat_lock(chat_id):
+            note_id = self.reserve_note_ids(chat_id, 1)
+            # Stored first: if the write fails the error reaches the user and the cache never shows the note.
+            self.storage.add_note(chat_id, note_id, note_text)
+            self.get_user_notes(chat_id)[note_id] = note_text
+            if chat_id in self.note_order:
+                self.note_order[chat_id].append(note_id)
+            self.notes_version[chat_id] = self.get_notes_version(chat_id) + 1
+            return note_id
+
+    def reserve_note_ids(self, chat_id, count):
+        # Returns the first of count fresh ids. The stored mark is checked against the notes themselves
+        # in case a crash kept a note but lost the mark written after it.
+        with self.chat_lock(chat_id):
+            if chat_id not in self.last_note_id:
+                stored = self.storage.load_last_note_id(chat_id) or 0
+                self.last_note_id[chat_id] = max(stored, max(self.get_user_notes(chat_id), default=0))
+            first_id = self.last_note_id[chat_id] + 1
+            self.last_note_id[chat_id] += count
+            return first_id
+
+    def set_note(self, chat_id, note_id, note_text):
+        with self.chat_lock(chat_id):
+            self.storage.save_note(chat_id, note_id, note_text)
+            self.get_user_notes(chat_id)[note_id] = note_text
+            self.notes_version[chat_id] = self.get_notes_version(chat_id) + 1
+
+    def delete_note(self, chat_id, note_id):
+        with self.chat_lock(chat_id):
+            self.storage.delete_note(chat_id, note_id)
+            self.get_user_notes(chat_id).pop(note_id, None)
+            self.notes_version[chat_id] = self.get_notes_version(chat_id) + 1
+
+            order = self.note_order.get(chat_id)
+            if order is not None:
+                position = bisect.bisect_left(order, note_id)
+                if position < len(order) and order[position] == note_id:
+                    del order[position]
+
+            self.remove_note_reminders(chat_id, note_id)
+            self.delete_series(chat_id, note_id)
+
+    def import_notes(self, chat_id, staged):
+        # staged: [(note_text, remind_time, rule)]. The ids are reserved first and the rows are built outside
+        # the chat lock; notes, reminders and series are then applied together and stored in one transaction.
+        # Returns the new reminders and series.
+        first_id = self.reserve_note_ids(chat_id, len(staged))
+
+        rows, reminders, series = [], [], []
+        for note_id, (note_text, remind_time, rule) in enumerate(staged, first_id):
+            rows.append((note_id, note_text))
+            if rule:
+                series.append((note_id, rule, remind_time))
+            elif remind_time:
+                reminders.append((note_id, remind_time))
+
+        with self.chat_lock(chat_id):
+            self.storage.import_notes(chat_id, rows, reminders, series)
+            notes = self.get_user_notes(chat_id)
+            notes.update(rows)
+            order = self.note_order.get(chat_id)
+            if order and order[-1] > first_id:
+                del self.note_order[chat_id]  # a note was added meanwhile; the order is rebuilt lazily
+            elif order is not None:
+                order.extend(range(first_id, first_id + len(staged)))
+            self.notes_version[chat_id] = self.get_notes_version(chat_id) + 1
+
+            chat_reminders = self.user_reminders.setdefault(chat_id, {})
+            for note_id, remind_time in reminders:
+                chat_reminders.setdefault(note_id, []).append(remind_time)
+            if not chat_reminders:
+                del self.user_reminders[chat_id]
+            chat_series = self.reminder_series.setdefault(chat_id, {})
+            for note_id, rule, next_time in series:
+                chat_series[note_id] = (rule, next_time, False)
+            if not chat_series:
+                del self.reminder_series[chat_id]
+            return reminders, series
+
+    # Reminders are kept per note and stored as one row each, so adding or firing one never rewrites the
+    # chat's whole list.
+    def add_reminder(self, chat_id, note_id, remind_time):
+        with self.chat_lock(chat_id):
+            self.storage.add_reminder(chat_id, note_id, remind_time)
+            self.user_reminders.setdefault(chat_id, {}).setdefault(note_id, []).append(remind_time)
+
+    def remove_reminder(self, chat_id, note_id, remind_time):
+        with self.chat_lock(chat_id):
+            reminders = self.user_reminders.get(chat_id, {})
+            times = reminders.get(note_id)
+            if times is None or remind_time not in times:
+                return
+            self.storage.delete_reminder(chat_id, note_id, remind_time)
+            times.remove(remind_time)
+            if not times:
+                del reminders[note_id]
+            if not reminders:
+                del self.user_reminders[chat_id]
+
+    def remove_note_reminders(self, chat_id, note_id):
+        with self.chat_lock(chat_id):
+            reminders = self.user_reminders.get(chat_id, {})
+            if note_id not in reminders:
+                return False
+            self.storage.delete_note_reminders(chat_id, note_id)
+            del reminders[note_id]
+            if not reminders:
+                del self.user_reminders[chat_id]
+            return True
+
+    def get_series(self, chat_id, note_id):
+        with self.chat_lock(chat_id):
+            return self.reminder_series.get(chat_id, {}).get(note_id)
+
+    def get_active_series(self):
+        # {chat_id: [(note_id, next_time)]} in the shape ReminderScheduler.schedule_all expects.
+        active = {}
+        for chat_id in list(self.reminder_series):
+            with self.chat_lock(chat_id):
+                series = [(note_id, next_time) for note_id, (_, next_time, paused)
+                          in self.reminder_series.get(chat_id, {}).items() if not paused]
+            if series:
+                active[chat_id] = series
+        return active
+
+    def set_series(self, chat_id, note_id, rule, next_time, paused=False):
+        with self.chat_lock(chat_id):
+            self.storage.save_series(chat_id, note_id, rule, next_time, paused)
+            self.reminder_series.setdefault(chat_id, {})[note_id] = (rule, next_time, paused)
+
+    def delete_series(self, chat_id, note_id):
+        with self.chat_lock(chat_id):
+            chat_series = self.reminder_series.get(chat_id, {})
+            if note_id not in chat_series:
+                return False
+            self.storage.delete_series(chat_id, note_id)
+            del chat_series[note_id]
+            if not chat_series:
+                del self.reminder_series[chat_id]
+            return True
+
+    def advance_series(self, chat_id, note_id, fired_at, now):
+        # Moves an active series past the occurrence that just fired; None if it is paused, ended or was
+        # rescheduled meanwhile, so the worker never schedules a second copy.
+        with self.chat_lock(chat_id):
+            series = self.reminder_series.get(chat_id, {}).get(note_id)
+            if series is None or series[2] or series[1] != fired_at:
+                return None
+            next_time = advance(series[0], fired_at, now)
+            self.set_series(chat_id, note_id, series[0], next_time)
+            return next_time
+
+    def update_user_statistics(self, chat_id, stat_type, amount=1):
+        with self.chat_lock(chat_id):
+            stats = self.get_user_statistics(chat_id)
+            if stats.increment(stat_type, amount=amount):
+                self.storage.save_statistics(chat_id, stats.to_dict())
+
+    def get_chat_state(self, chat_id):
+        return self.chat_states.get(chat_id)
+
+    def set_chat_state(self, chat_id, state, arg=0):
+        expires_at = self.chat_states.set(chat_id, state, arg)
+        self.storage.save_chat_state(chat_id, state, arg, expires_at)
+
+    def clear_chat_state(self, chat_id):
+        if self.chat_states.clear(chat_id):
+            self.storage.delete_chat_states([chat_id])
+
+    def expire_chat_states(self):
+        expired = self.chat_states.expire()
+        if expired:
+            self.storage.delete_chat_states(expired)
+        return len(expired)
 
     def get_current_page(self, chat_id):
-        return self.current_page.get(chat_id, 0)
+        state = self.chat_states.get(chat_id)
+        return state[1] if state is not None and state[0] == EDIT_SELECT else 0
 
     def set_current_page(self, chat_id, page):
-        self.current_page[chat_id] = page
+        self.set_chat_state(chat_id, EDIT_SELECT, page)
+
+    def close(self):
+        self.storage.close()
@@ -0,0 +1,80 @@
+from array import array
+from datetime import date
+
+HISTORY_DAYS = 30
+COUNTERS = ("notes_created", "notes_deleted", "ai_analysis")
+
+
+class UserStatistics:
+    def __init__(self, history_days=HISTORY_DAYS):
+        self.history_days = history_days
+        self.day = date.today().toordinal()  # ordinal of the newest day in the ring buffers
+        self.counters = {name: array('l', [0]) * history_days for name in COUNTERS}
+        self.totals = {name: 0 for name in COUNTERS}
+        self.version = 0
+
+    def increment(self, counter, today=None, amount=1):
+        if counter not in self.counters:
+            return False
+        day = (today or date.today()).toordinal()
+        self._advance(day)
+        self.counters[counter][day % self.history_days] += amount
+        self.totals[counter] += amount
+        self.version += 1
+        return True
+
+    def series(self, counter, days, today=None):
+        day = (today or date.today()).toordinal()
+        buffer = self.counters[counter]
+        return [
+            buffer[d % self.history_days] if self.day - self.history_days < d <= self.day else 0
+            for d in range(day - days + 1, day + 1)
+        ]
+
+    def total(self, counter):
+        return self.totals[counter]
+
+    def to_dict(self):
+        return {
+            "day": self.day,
+            "counters": {name: list(buffer) for name, buffer in self.counters.items()},
+            "totals": dict(self.totals),
+            "version": self.version,
+        }
+
+    @classmethod
+    def from_dict(cls, data, today=None):
+        stats = cls()
+        if "counters" in data:
+            stats.day = data["day"]
+            for name, values in data["counters"].items():
+                if name in stats.counters and len(values) == stats.history_days:
+                    stats.counters[name] = array('l', values)
+            stats.totals.update(data["totals"])
+            stats.version = data.get("version", 0)
+            return stats
+
+        # Legacy format: {"notes_created": {"%m-%d": count}, ..., "total_ai_used": count}
+        today = today or date.today()
+        stats.day = today.toordinal()
+        for name in COUNTERS:
+            for day_key, count in data.get(name, {}).items():
+                month, day = map(int, day_key.split("-"))
+                year = today.year if (month, day) <= (today.month, today.day) else today.year - 1
+                try:
+                    ordinal = date(year, month, day).toordinal()
+                except ValueError:
+                    continue
+                if stats.day - ordinal < stats.history_days:
+                    stats.counters[name][ordinal % stats.history_days] += count
+                stats.totals[name] += count
+        stats.totals["ai_analysis"] = max(stats.totals["ai_analysis"], data.get("total_ai_used", 0))
+        return stats
+
+    def _advance(self, day):
+        if day <= self.day:
+            return
+        for d in range(max(self.day + 1, day - self.history_days + 1), day + 1):
+            for buffer in self.counters.values():
+                buffer[d % self.history_days] = 0
+        self.day = day
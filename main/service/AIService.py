@@ -1,35 +1,92 @@
+import json
 import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
 
 import requests
+from requests.adapters import HTTPAdapter
+
+from Note_bot.main.service.AnalysisCache import AnalysisCache
+
+
+def estimate_tokens(text):
+    # Roughly three characters per token for mixed Russian/English text.
+    return len(text) // 3 + 1
 
 
 class AIService:
-    def __init__(self, user_data_manager):
+    def __init__(self, user_data_manager, preselect=None):
         self.user_data = user_data_manager
+        self.preselect = preselect  # (chat_id, note_ids, limit) -> the note_ids worth sending
+        self.preselect_limit = int(os.getenv('AI_PRESELECT_NOTES', '200'))
         self.API_KEY = os.getenv('API_KEY')
         self.API_URL = os.getenv('API_URL')
+        self.MODEL = os.getenv('AI_MODEL', 'qwen/qwq-32b:free')
+        self.streaming = os.getenv('AI_STREAMING', '1') == '1'
+        self.timeout = (float(os.getenv('AI_CONNECT_TIMEOUT', '5')), float(os.getenv('AI_READ_TIMEOUT', '120')))
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self.cache = AnalysisCache(
+            max_entries=int(os.getenv('AI_CACHE_SIZE', '1024')),
+            ttl=float(os.getenv('AI_CACHE_TTL', str(24 * 60 * 60))),
+            directory=os.getenv('AI_CACHE_DIR'),
+            max_disk_entries=int(os.getenv('AI_CACHE_DISK_SIZE', '10000'))
+        )
+        self.in_flight = {}  # {cache_key: Future}
+        self.in_flight_lock = threading.Lock()
+
+        self.chunk_tokens = int(os.getenv('AI_CHUNK_TOKENS', '3000'))
+        self.map_executor = ThreadPoolExecutor(max_workers=int(os.getenv('AI_MAX_PARALLEL', '4')))
+        self.prompt_tokens = 0
 
     def analyze_notes(self, chat_id, note_ids_str):
-        notes = self.user_data.get_user_notes(chat_id)
+        payload, error = self.prepare_analysis(chat_id, note_ids_str)
+        if error:
+            return error
 
+        try:
+            analysis = self.request_completion(payload)
+
+            if analysis is not None:
+                return f"Анализ ваших заметок:\n\n{analysis}"
+            else:
+                return "Ошибка анализа. Попробуйте позже."
+        except Exception as e:
+            return f"Произошла ошибка: {str(e)}"
+
+    def prepare_analysis(self, chat_id, note_ids_str):
         if not self.API_KEY or not self.API_URL:
-            return "Ошибка: API-ключ или URL не настроены."
+            return None, "Ошибка: API-ключ или URL не настроены."
 
         try:
-            note_ids = list(map(int, note_ids_str.split(',')))
+            numbers = [int(number) for number in note_ids_str.split(',')]
             self.user_data.update_user_statistics(chat_id, "ai_analysis")
 
-            selected_notes = [notes[note_id] for note_id in note_ids if note_id in notes]
+            # A copy taken under the chat lock; notes deleted meanwhile simply stay in this analysis.
+            selected = self.user_data.select_notes(chat_id, numbers)
+            selected_notes = list(selected.values())
 
             if not selected_notes:
-                return "Вы ввели неверные номера заметок. Попробуйте снова."
+                return None, "Вы ввели неверные номера заметок. Попробуйте снова."
+
+            if len(numbers) < 3:
+                return None, "Для анализа нужно хотя бы 3 заметки."
+
+            if self.preselect is not None and 0 < self.preselect_limit < len(selected_notes):
+                # Only the most central notes go upstream instead of summarizing the whole selection.
+                note_ids = self.preselect(chat_id, list(selected), self.preselect_limit)
+                selected_notes = [selected[note_id] for note_id in note_ids]
 
-            if len(note_ids) < 3:
-                return "Для анализа нужно хотя бы 3 заметки."
+            notes_text = self.condense_notes(selected_notes)
+            if notes_text is None:
+                return None, "Ошибка анализа. Попробуйте позже."
 
-            notes_text = " ".join(selected_notes)
             payload = {
-                "model": "qwen/qwq-32b:free",
+                "model": self.MODEL,
                 "messages": [
                     {"role": "system", "content": "Вы — дружелюбный помощник для анализа заметок. Общайтесь так, будто вы "
                                               "отвечаете пользователю лично, помогаете ему разобраться и находите "
@@ -39,16 +96,153 @@ class AIService:
                                                 f"деятельности пользователя и возможные рекомендации"}
                 ]
             }
-            headers = {"Authorization": f"Bearer {self.API_KEY}"}
-            response = requests.post(self.API_URL, json=payload, headers=headers)
-
-            if response.status_code == 200:
-                response_data = response.json()
-                analysis = response_data.get("choices", [{}])[0].get("message", {}).get("content", "Нет данных.")
-                return f"Анализ ваших заметок:\n\n{analysis}"
-            else:
-                return "Ошибка анализа. Попробуйте позже."
+            return payload, None
         except ValueError:
-            return "Введите корректные номера заметок через запятую."
+            return None, "Введите корректные номера заметок через запятую."
         except Exception as e:
-            return f"Произошла ошибка: {str(e)}"
+            return None, f"Произошла ошибка: {str(e)}"
+
+    def condense_notes(self, notes):
+        texts = list(notes)
+        for _ in range(3):
+            if sum(estimate_tokens(text) for text in texts) <= self.chunk_tokens:
+                break
+            summaries = list(self.map_executor.map(self.summarize_chunk, self.split_chunks(texts)))
+            if None in summaries:
+                return None
+            texts = summaries
+        return " ".join(texts)
+
+    def split_chunks(self, texts):
+        max_chars = self.chunk_tokens * 3
+        chunks, current, current_tokens = [], [], 0
+        for text in texts:
+            for start in range(0, len(text), max_chars):
+                piece = text[start:start + max_chars]
+                piece_tokens = estimate_tokens(piece)
+                if current and current_tokens + piece_tokens > self.chunk_tokens:
+                    chunks.append("\n".join(current))
+                    current, current_tokens = [], 0
+                current.append(piece)
+                current_tokens += piece_tokens
+        if current:
+            chunks.append("\n".join(current))
+        return chunks
+
+    def summarize_chunk(self, chunk):
+        payload = {
+            "model": self.MODEL,
+            "messages": [
+                {"role": "system", "content": "Кратко перескажите заметки пользователя, сохранив факты, планы, даты и "
+                                              "повторяющиеся темы. Отвечайте только пересказом."},
+                {"role": "user", "content": chunk}
+            ]
+        }
+        return self.request_completion(payload)
+
+    def request_completion(self, payload):
+        key = AnalysisCache.make_key(payload)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        # Identical requests that arrive while one is already running wait for its result.
+        with self.in_flight_lock:
+            future = self.in_flight.get(key)
+            is_owner = future is None
+            if is_owner:
+                future = Future()
+                self.in_flight[key] = future
+
+        if not is_owner:
+            return future.result()
+
+        try:
+            content = self._post_completion(payload)
+            if content is not None:
+                self.cache.put(key, content)
+            future.set_result(content)
+            return content
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self.in_flight_lock:
+                self.in_flight.pop(key, None)
+
+    def _post_completion(self, payload):
+        self._count_prompt_tokens(payload)
+        headers = {"Authorization": f"Bearer {self.API_KEY}"}
+        response = self.session.post(self.API_URL, json=payload, headers=headers, timeout=self.timeout)
+
+        if response.status_code == 200:
+            response_data = response.json()
+            return response_data.get("choices", [{}])[0].get("message", {}).get("content", "Нет данных.")
+        return None
+
+    def stream_completion(self, payload):
+        key = AnalysisCache.make_key(payload)
+        cached = self.cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+
+        # Shares request_completion's in-flight futures: a duplicate request waits for the running one
+        # and receives its whole answer at once.
+        with self.in_flight_lock:
+            future = self.in_flight.get(key)
+            is_owner = future is None
+            if is_owner:
+                future = Future()
+                self.in_flight[key] = future
+
+        if not is_owner:
+            content = future.result()
+            if content is not None:
+                yield content
+            return
+
+        content = None
+        try:
+            content = yield from self._stream_post(payload)
+            if content is not None:
+                self.cache.put(key, content)
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            if not future.done():
+                future.set_result(content)  # None if the reader stopped early
+            with self.in_flight_lock:
+                self.in_flight.pop(key, None)
+
+    def _stream_post(self, payload):
+        parts = []
+        self._count_prompt_tokens(payload)
+        headers = {"Authorization": f"Bearer {self.API_KEY}", "Accept": "text/event-stream"}
+        with self.session.post(self.API_URL, json={**payload, "stream": True}, headers=headers,
+                               timeout=self.timeout, stream=True) as response:
+            if response.status_code != 200:
+                return None
+
+            for line in response.iter_lines():
+                if not line.startswith(b"data:"):
+                    continue
+                data = line[5:].strip()
+                if data == b"[DONE]":
+                    break
+                event = json.loads(data)
+                # Errors after the 200 arrive as an event; the partial answer must not be cached.
+                if "error" in event:
+                    raise RuntimeError(event["error"].get("message", "ошибка API"))
+                delta = event.get("choices", [{}])[0].get("delta", {}).get("content")
+                if delta:
+                    parts.append(delta)
+                    yield delta
+
+        return "".join(parts) if parts else None
+
+    def _count_prompt_tokens(self, payload):
+        tokens = sum(estimate_tokens(message["content"]) for message in payload["messages"])
+        with self.in_flight_lock:
+            self.prompt_tokens += tokens
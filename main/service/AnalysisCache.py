@@ -0,0 +1,141 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+class AnalysisCache:
+    def __init__(self, max_entries=1024, ttl=24 * 60 * 60, directory=None, max_disk_entries=10000):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.directory = directory
+        self.max_disk_entries = max_disk_entries
+        self.entries = OrderedDict()  # {key: (created_at, value)}
+        self.disk_entries = OrderedDict()  # {key: created_at}, least recently used first
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self.disk_evictions = 0
+
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self._load_disk_index()
+
+    @staticmethod
+    def make_key(payload):
+        return hashlib.sha256(json.dumps(payload, ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        now = time.time()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and now - entry[0] < self.ttl:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.entries.pop(key, None)
+
+        entry = self._read_disk(key)
+        with self.lock:
+            if entry is not None and now - entry[0] < self.ttl:
+                self._remember(key, entry)
+                self._touch_disk(key, now)
+                self.hits += 1
+                self.disk_hits += 1
+                return entry[1]
+            self.misses += 1
+            if entry is not None:
+                self._evict_disk(key)
+            return None
+
+    def put(self, key, value):
+        entry = (time.time(), value)
+        with self.lock:
+            self._remember(key, entry)
+        self._write_disk(key, entry)
+
+    def stats(self):
+        with self.lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self.entries),
+                "disk_hits": self.disk_hits,
+                "disk_entries": len(self.disk_entries),
+                "disk_evictions": self.disk_evictions,
+            }
+
+    def _remember(self, key, entry):
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def _read_disk(self, key):
+        if not self.directory:
+            return None
+        try:
+            with open(os.path.join(self.directory, f"{key}.json"), encoding="utf-8") as file:
+                data = json.load(file)
+            return data["created_at"], data["value"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _write_disk(self, key, entry):
+        if not self.directory:
+            return
+        path = os.path.join(self.directory, f"{key}.json")
+        temp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            json.dump({"created_at": entry[0], "value": entry[1]}, file, ensure_ascii=False)
+        os.replace(temp_path, path)
+        os.utime(path, (entry[0], entry[0]))
+
+        with self.lock:
+            self.disk_entries[key] = entry[0]
+            self.disk_entries.move_to_end(key)
+            while len(self.disk_entries) > self.max_disk_entries:
+                self._evict_disk(next(iter(self.disk_entries)))
+
+    def _load_disk_index(self):
+        # Files keep the creation time as mtime and the last use as atime (set explicitly, so noatime
+        # mounts don't matter); expired files go now, the rest are ordered for LRU eviction.
+        now = time.time()
+        files = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try:
+                if name.endswith(".json"):
+                    stat = os.stat(path)
+                    if now - stat.st_mtime >= self.ttl:
+                        os.remove(path)
+                        self.disk_evictions += 1
+                    else:
+                        files.append((stat.st_atime, name[:-5], stat.st_mtime))
+            except OSError:
+                continue
+        for _, key, created_at in sorted(files):
+            self.disk_entries[key] = created_at
+        while len(self.disk_entries) > self.max_disk_entries:
+            self._evict_disk(next(iter(self.disk_entries)))
+
+    def _touch_disk(self, key, now):
+        created_at = self.disk_entries.get(key)
+        if created_at is None:
+            return
+        self.disk_entries.move_to_end(key)
+        try:
+            os.utime(os.path.join(self.directory, f"{key}.json"), (now, created_at))
+        except OSError:
+            pass
+
+    def _evict_disk(self, key):
+        self.disk_entries.pop(key, None)
+        try:
+            os.remove(os.path.join(self.directory, f"{key}.json"))
+            self.disk_evictions += 1
+        except OSError:
+            pass  # already gone, e.g. evicted by another shard sharing the directory
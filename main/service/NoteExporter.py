@@ -0,0 +1,54 @@
+import json
+import os
+import tempfile
+import zipfile
+
+EXPORT_FORMATS = ("zip", "md", "jsonl")
+ALL_NOTES = ("все", "all")
+
+
+def parse_note_numbers(spec, total):
+    # "1, 3, 10-20" or "все"; ranges are clipped to the notes that exist. A note listed twice is exported once,
+    # so the archive never gets two entries with the same name.
+    if spec.strip().lower() in ALL_NOTES:
+        return range(1, total + 1)
+
+    numbers = {}
+    for part in spec.split(','):
+        part = part.strip()
+        if '-' in part:
+            first, last = (int(value) for value in part.split('-', 1))
+            numbers.update(dict.fromkeys(range(max(first, 1), min(last, total) + 1)))
+        else:
+            numbers[int(part)] = None
+    return list(numbers)
+
+
+class NoteExporter:
+    def __init__(self, spool_size=None):
+        # Archives stay in memory up to spool_size bytes and spill to a temporary file beyond that.
+        self.spool_size = spool_size or int(os.getenv('EXPORT_SPOOL_BYTES', str(8 * 1024 * 1024)))
+
+    def export(self, numbered_notes, export_format="zip"):
+        archive = tempfile.SpooledTemporaryFile(max_size=self.spool_size)
+        count = 0
+        try:
+            if export_format == "zip":
+                with zipfile.ZipFile(archive, "w", compression=zipfile.ZIP_DEFLATED) as zip_file:
+                    for note_number, note_text in numbered_notes:
+                        zip_file.writestr(f"note_{note_number}.txt", note_text)
+                        count += 1
+            else:
+                for note_number, note_text in numbered_notes:
+                    if export_format == "jsonl":
+                        line = json.dumps({"number": note_number, "text": note_text}, ensure_ascii=False) + "\n"
+                    else:
+                        line = f"## Заметка {note_number}\n\n{note_text}\n\n"
+                    archive.write(line.encode("utf-8"))
+                    count += 1
+        except Exception:
+            archive.close()
+            raise
+
+        archive.seek(0)
+        return archive, count
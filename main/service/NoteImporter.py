@@ -0,0 +1,132 @@
+import io
+import json
+import multiprocessing
+import os
+import re
+import tempfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from Note_bot.main.service.Recurrence import is_too_frequent, next_occurrence, parse_recurrence
+from Note_bot.main.service.TimeParser import TimeParser
+
+IMPORT_FORMATS = {".txt": "txt", ".md": "md", ".markdown": "md", ".jsonl": "jsonl"}
+EXPORTED_HEADING = re.compile(r'Заметка \d+')
+LIST_MARKER = re.compile(r'(?:[-*+]|\d+[.)])\s+')
+
+time_parser = TimeParser()
+
+
+def detect_import_format(file_name):
+    return IMPORT_FORMATS.get(os.path.splitext(file_name or "")[1].lower())
+
+
+def extract_batch(note_texts, now):
+    # [(remind_time, rule)] for a batch of notes; runs in the importing thread or in a pool worker.
+    reminders = []
+    for note_text in note_texts:
+        rule = parse_recurrence(note_text)
+        if rule and not is_too_frequent(rule):
+            reminders.append((next_occurrence(rule, now), rule))
+        else:
+            reminders.append((time_parser.extract(note_text, now), None))
+    return reminders
+
+
+class NoteImporter:
+    def __init__(self, batch_size=None, workers=None, spool_size=None):
+        self.batch_size = batch_size or int(os.getenv('IMPORT_BATCH_SIZE', '1000'))
+        self.workers = workers if workers is not None else int(os.getenv('IMPORT_WORKERS', '0'))
+        self.spool_size = spool_size or int(os.getenv('IMPORT_SPOOL_BYTES', str(8 * 1024 * 1024)))
+        self.executor = None
+
+    def spool(self):
+        # Downloads stay in memory up to spool_size bytes and spill to a temporary file beyond that.
+        return tempfile.SpooledTemporaryFile(max_size=self.spool_size)
+
+    def read_notes(self, document, import_format):
+        # The inverse of NoteExporter: txt has a note per line, md a note per heading (lines before the first
+        # heading are notes of their own), jsonl an object with "text" or a plain string per line.
+        lines = io.TextIOWrapper(document, encoding='utf-8-sig', errors='replace')
+        try:
+            if import_format == "jsonl":
+                yield from self._read_jsonl(lines)
+            elif import_format == "md":
+                yield from self._read_markdown(lines)
+            else:
+                for line in lines:
+                    line = line.strip()
+                    if line:
+                        yield line
+        finally:
+            lines.detach()
+
+    def _read_jsonl(self, lines):
+        for line_number, line in enumerate(lines, 1):
+            if not line.strip():
+                continue
+            try:
+                value = json.loads(line)
+            except json.JSONDecodeError:
+                raise ValueError(f"строка {line_number} не является JSON") from None
+            note_text = value.get("text") if isinstance(value, dict) else value
+            if not isinstance(note_text, str):
+                raise ValueError(f"в строке {line_number} нет текста заметки")
+            if note_text.strip():
+                yield note_text.strip()
+
+    def _read_markdown(self, lines):
+        section = None
+        for line in lines:
+            line = line.rstrip()
+            if line.startswith('#'):
+                if section and "\n".join(section).strip():
+                    yield "\n".join(section).strip()
+                heading = line.lstrip('#').strip()
+                section = [] if EXPORTED_HEADING.fullmatch(heading) else [heading]
+            elif section is not None:
+                section.append(line)
+            elif line.strip():
+                yield LIST_MARKER.sub('', line.strip(), count=1)
+        if section and "\n".join(section).strip():
+            yield "\n".join(section).strip()
+
+    def batches(self, document, import_format):
+        batch = []
+        for note_text in self.read_notes(document, import_format):
+            batch.append(note_text)
+            if len(batch) == self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def parse(self, document, import_format, now):
+        # Yields (batch, reminders) in file order; with workers, a bounded number of batches is in flight.
+        if not self.workers:
+            for batch in self.batches(document, import_format):
+                yield batch, extract_batch(batch, now)
+            return
+
+        pending = deque()
+        executor = self._get_executor()
+        for batch in self.batches(document, import_format):
+            pending.append((batch, executor.submit(extract_batch, batch, now)))
+            if len(pending) >= self.workers * 2:
+                batch, future = pending.popleft()
+                yield batch, future.result()
+        while pending:
+            batch, future = pending.popleft()
+            yield batch, future.result()
+
+    def _get_executor(self):
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return self.executor
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
@@ -1,110 +1,216 @@
-import re
+import os
+from datetime import datetime
 
-import dateparser
+from Note_bot.main.service.NoteExporter import EXPORT_FORMATS, NoteExporter, parse_note_numbers
+from Note_bot.main.service.NoteImporter import NoteImporter
+from Note_bot.main.service.Recurrence import MIN_INTERVAL_MINUTES, describe_rule, is_too_frequent, next_occurrence, parse_recurrence
+from Note_bot.main.service.SearchIndex import SearchIndex
+from Note_bot.main.service.SimilarityIndex import SimilarityIndex
+from Note_bot.main.service.TimeParser import TimeParser
 
 
 class NoteManager:
-    def __init__(self, user_data_manager):
+    def __init__(self, user_data_manager, scheduler):
         self.user_data = user_data_manager
+        self.scheduler = scheduler
+        self.search_index = SearchIndex()
+        self.similarity_index = SimilarityIndex()
+        self.similar_limit = int(os.getenv('SIMILAR_NOTES_LIMIT', '5'))
+        self.duplicate_threshold = float(os.getenv('DUPLICATE_THRESHOLD', '0.9'))
+        self.time_parser = TimeParser()
+        self.exporter = NoteExporter()
+        self.exporter_format = os.getenv('EXPORT_FORMAT', 'zip')
+        self.importer = NoteImporter()
 
     def extract_time(self, note_text):
-        patterns = [
-            r'через \d+ (минут|минуту|час|часов|день|дней|неделю|недель|месяц|месяцев)',
-            r'сегодня в \d{1,2}(:\d{2})?',
-            r'завтра в \d{1,2}(:\d{2})?',
-            r'послезавтра в \d{1,2}(:\d{2})?',
-            r'\d{1,2}(:\d{2})? (утра|вечера|дня|ночи)',
-            r'в \d{1,2}(:\d{2})?',
-            r'через час',
-            r'через минуту',
-        ]
-
-        for pattern in patterns:
-            match = re.search(pattern, note_text.lower())
-            if match:
-                parsed_date = dateparser.parse(match.group(), settings={'PREFER_DATES_FROM': 'future'})
-                if parsed_date:
-                    return parsed_date
-        return None
+        return self.time_parser.extract(note_text)
+
+    def extract_recurrence(self, note_text):
+        return parse_recurrence(note_text)
 
     def add_note(self, message):
         chat_id = message.chat.id
-        notes = self.user_data.get_user_notes(chat_id)
-        reminders = self.user_data.get_user_reminders(chat_id)
+        with self.user_data.chat_lock(chat_id):
+            return self._add_note(chat_id, message.text.strip())
 
-        note_text = message.text.strip()
+    def _add_note(self, chat_id, note_text):
         if note_text:
-            note_id = len(notes) + 1
-            notes[note_id] = note_text
+            note_id = self.user_data.add_note(chat_id, note_text)
+            self.search_index.add(chat_id, note_id, note_text)
+            self.similarity_index.add(chat_id, note_id, note_text)
             self.user_data.update_user_statistics(chat_id, "notes_created")
 
+            rule = self.extract_recurrence(note_text)
+            if rule and is_too_frequent(rule):
+                return f"Заметка добавлена без напоминания: повторять чаще раза в {MIN_INTERVAL_MINUTES} мин. нельзя."
+            if rule:
+                next_time = self.start_series(chat_id, note_id, rule)
+                return (f"Заметка добавлена с повторяющимся напоминанием ({describe_rule(rule)}), "
+                        f"ближайшее — {next_time.strftime('%Y-%m-%d %H:%M')}.")
+
             time_to_remind = self.extract_time(note_text)
             if time_to_remind:
-                reminders.append((note_id, time_to_remind))
+                self.user_data.add_reminder(chat_id, note_id, time_to_remind)
+                self.scheduler.schedule(chat_id, note_id, time_to_remind)
                 return f"Заметка добавлена с напоминанием на {time_to_remind.strftime('%Y-%m-%d %H:%M:%S')}."
             else:
                 return "Заметка добавлена без напоминания."
         else:
             return "Текст заметки не может быть пустым."
 
-    def delete_note(self, chat_id, note_id_str):
-        notes = self.user_data.get_user_notes(chat_id)
-        reminders = self.user_data.get_user_reminders(chat_id)
+    def delete_note(self, chat_id, note_number_str):
+        with self.user_data.chat_lock(chat_id):
+            return self._delete_note(chat_id, note_number_str)
 
+    def _delete_note(self, chat_id, note_number_str):
         try:
-            note_id = int(note_id_str.strip())
-            if note_id in notes:
-                notes.pop(note_id)
+            note_number = int(note_number_str.strip())
+            note_id = self.user_data.resolve_note_id(chat_id, note_number)
+            if note_id is not None:
+                self.user_data.delete_note(chat_id, note_id)
+                self.search_index.remove(chat_id, note_id)
+                self.similarity_index.remove(chat_id, note_id)
+                self.scheduler.cancel(chat_id, note_id)
                 self.user_data.update_user_statistics(chat_id, "notes_deleted")
-
-                old_notes = dict(notes)
-                notes.clear()
-                for new_id, old_id in enumerate(sorted(old_notes.keys()), start=1):
-                    notes[new_id] = old_notes[old_id]
-
-                new_reminders = []
-                for rem_note_id, rem_time in reminders:
-                    if rem_note_id == note_id:
-                        continue
-
-                    new_id = None
-                    for k, v in notes.items():
-                        if old_notes.get(rem_note_id) == v:
-                            new_id = k
-                            break
-                    if new_id is not None:
-                        new_reminders.append((new_id, rem_time))
-
-                self.user_data.user_reminders[chat_id] = new_reminders
-                return f"Заметка {note_id} удалена."
+                return f"Заметка {note_number} удалена."
             else:
                 return "Такой заметки нет."
         except ValueError:
             return "Пожалуйста, укажите корректный номер заметки."
 
     def edit_note(self, chat_id, note_id, new_text):
-        notes = self.user_data.get_user_notes(chat_id)
-        reminders = self.user_data.get_user_reminders(chat_id)
+        with self.user_data.chat_lock(chat_id):
+            return self._edit_note(chat_id, note_id, new_text)
+
+    def _edit_note(self, chat_id, note_id, new_text):
+        note_number = self.user_data.get_display_number(chat_id, note_id)
+        if note_number is None:
+            return "Такой заметки нет."
 
         new_text = new_text.strip()
         if new_text:
-            notes[note_id] = new_text
+            self.user_data.set_note(chat_id, note_id, new_text)
+            self.search_index.add(chat_id, note_id, new_text)
+            self.similarity_index.add(chat_id, note_id, new_text)
+            rule = self.extract_recurrence(new_text)
+            if rule and not is_too_frequent(rule):
+                next_time = self.start_series(chat_id, note_id, rule)
+                return (f"Заметка {note_number} обновлена с повторяющимся напоминанием ({describe_rule(rule)}), "
+                        f"ближайшее — {next_time.strftime('%Y-%m-%d %H:%M')}.")
+
+            # A series lives only as long as the text still describes it; an edit without a recurrence ends it,
+            # and a one-shot time in the new text then becomes the note's only reminder.
+            series_ended = self._end_series(chat_id, note_id)
+            if rule:
+                return (f"Заметка {note_number} обновлена без напоминания: "
+                        f"повторять чаще раза в {MIN_INTERVAL_MINUTES} мин. нельзя.")
             time_to_remind = self.extract_time(new_text)
             if time_to_remind:
-                reminders.append((note_id, time_to_remind))
-                return f"Заметка {note_id} обновлена с напоминанием на {time_to_remind.strftime('%Y-%m-%d %H:%M:%S')}."
+                self.user_data.add_reminder(chat_id, note_id, time_to_remind)
+                self.scheduler.schedule(chat_id, note_id, time_to_remind)
+                return f"Заметка {note_number} обновлена с напоминанием на {time_to_remind.strftime('%Y-%m-%d %H:%M:%S')}."
+            elif series_ended:
+                return f"Заметка {note_number} обновлена, повторяющееся напоминание отключено."
             else:
-                return f"Заметка {note_id} успешно обновлена."
+                return f"Заметка {note_number} успешно обновлена."
         else:
             return "Текст заметки не может быть пустым."
 
+    def start_series(self, chat_id, note_id, rule):
+        # A series replaces every other reminder of the note; only its next occurrence is ever scheduled.
+        self.user_data.remove_note_reminders(chat_id, note_id)
+        self.scheduler.cancel(chat_id, note_id)
+
+        next_time = next_occurrence(rule, datetime.now())
+        self.user_data.set_series(chat_id, note_id, rule, next_time)
+        self.scheduler.schedule(chat_id, note_id, next_time)
+        return next_time
+
+    def _end_series(self, chat_id, note_id):
+        # A series never shares its note with one-shot reminders, so cancelling the note's entries is enough.
+        if not self.user_data.delete_series(chat_id, note_id):
+            return False
+        self.scheduler.cancel(chat_id, note_id)
+        return True
+
+    def pause_series(self, chat_id, note_id):
+        with self.user_data.chat_lock(chat_id):
+            series = self.user_data.get_series(chat_id, note_id)
+            if series is None:
+                return None
+            rule, next_time, paused = series
+            if not paused:
+                self.scheduler.cancel(chat_id, note_id)
+                self.user_data.set_series(chat_id, note_id, rule, next_time, paused=True)
+            return f"Напоминание ({describe_rule(rule)}) приостановлено."
+
+    def resume_series(self, chat_id, note_id):
+        with self.user_data.chat_lock(chat_id):
+            series = self.user_data.get_series(chat_id, note_id)
+            if series is None:
+                return None
+            rule, next_time, paused = series
+            if paused:
+                next_time = next_occurrence(rule, datetime.now())
+                self.user_data.set_series(chat_id, note_id, rule, next_time)
+                self.scheduler.schedule(chat_id, note_id, next_time)
+            return f"Напоминание возобновлено, ближайшее — {next_time.strftime('%Y-%m-%d %H:%M')}."
+
+    def end_series(self, chat_id, note_id):
+        with self.user_data.chat_lock(chat_id):
+            if not self._end_series(chat_id, note_id):
+                return None
+            return "Повторяющееся напоминание завершено."
+
     def search_notes(self, chat_id, search_query):
+        # Runs on a worker thread; the chat lock keeps the notes and their index from changing underneath.
+        self.ensure_index(self.search_index, chat_id)
+        with self.user_data.chat_lock(chat_id):
+            return self._search_notes(chat_id, search_query)
+
+    def with_index(self, index, chat_id, action):
+        # Runs action under the chat lock once the index exists; an import may drop it in between.
+        while True:
+            self.ensure_index(index, chat_id)
+            with self.user_data.chat_lock(chat_id):
+                if index.is_indexed(chat_id):
+                    return action()
+
+    def ensure_index(self, index, chat_id):
+        # A missing index is built from a snapshot outside the chat lock, so a large build does not stall the
+        # other chats on the same lock stripe. It is installed only if the notes did not change meanwhile.
+        while not index.is_indexed(chat_id):
+            with self.user_data.chat_lock(chat_id):
+                version = self.user_data.get_notes_version(chat_id)
+                notes = self.user_data.get_notes_snapshot(chat_id)
+            prepared = index.prepare(notes)
+            with self.user_data.chat_lock(chat_id):
+                if self.user_data.get_notes_version(chat_id) == version and not index.is_indexed(chat_id):
+                    index.install(chat_id, prepared)
+
+    def _search_notes(self, chat_id, search_query):
         notes = self.user_data.get_user_notes(chat_id)
         search_query = search_query.strip().lower()
 
         if not search_query:
             return "Вы ввели пустой запрос."
 
+        found_notes = {
+            note_id: self.search_index.highlight(notes[note_id], search_query)
+            for note_id in self.search_index.search(chat_id, search_query)
+        }
+        if not found_notes:
+            found_notes = self.scan_notes(notes, search_query)
+
+        if found_notes:
+            response = "🔍 Найдены заметки:\n\n"
+            for note_id, note_text in found_notes.items():
+                response += f"{self.user_data.get_display_number(chat_id, note_id)}. {note_text}\n\n"
+            return response
+        else:
+            return f"Заметки, содержащие '{search_query}', не найдены."
+
+    def scan_notes(self, notes, search_query):
         found_notes = {}
         for note_id, note_text in notes.items():
             if search_query in note_text.lower():
@@ -113,32 +219,109 @@ class NoteManager:
                     f"*{search_query}*"
                 )
                 found_notes[note_id] = highlighted_text
+        return found_notes
 
-        if found_notes:
-            response = "🔍 Найдены заметки:\n\n"
-            for note_id, note_text in found_notes.items():
-                response += f"{note_id}. {note_text}\n\n"
-            return response
-        else:
-            return f"Заметки, содержащие '{search_query}', не найдены."
+    def similar_notes(self, chat_id, note_number_str):
+        return self.with_index(self.similarity_index, chat_id, lambda: self._similar_notes(chat_id, note_number_str))
+
+    def _similar_notes(self, chat_id, note_number_str):
+        try:
+            note_number = int(note_number_str.strip())
+        except ValueError:
+            return "Пожалуйста, укажите корректный номер заметки."
+
+        note_id = self.user_data.resolve_note_id(chat_id, note_number)
+        if note_id is None:
+            return "Такой заметки нет."
+
+        similar = self.similarity_index.similar(chat_id, note_id, self.similar_limit)
+        if not similar:
+            return f"Похожих на заметку {note_number} заметок не найдено."
 
-    def export_notes(self, chat_id, note_ids_str):
         notes = self.user_data.get_user_notes(chat_id)
+        response = f"🔗 Похожие на заметку {note_number}:\n\n"
+        for similar_id, score in similar:
+            response += f"{self.user_data.get_display_number(chat_id, similar_id)}. ({score:.0%}) {notes[similar_id]}\n\n"
+        return response
 
-        try:
-            note_ids = list(map(int, note_ids_str.split(',')))
-            selected_notes = [notes[note_id] for note_id in note_ids if note_id in notes]
+    def find_duplicates(self, chat_id, max_groups=20):
+        if not self.user_data.has_notes(chat_id):
+            return "У вас пока нет заметок."
+
+        # The scan runs on a snapshot outside the chat lock; notes deleted meanwhile are left out.
+        snapshot = self.with_index(self.similarity_index, chat_id, lambda: self.similarity_index.snapshot(chat_id))
+        duplicates = self.similarity_index.duplicates(snapshot, self.duplicate_threshold)
+        with self.user_data.chat_lock(chat_id):
+            groups = []
+            for group in duplicates:
+                numbers = [self.user_data.get_display_number(chat_id, note_id) for note_id in group]
+                numbers = sorted(number for number in numbers if number is not None)
+                if len(numbers) > 1:
+                    groups.append(numbers)
 
-            if not selected_notes:
-                return "Вы ввели некорректные номера заметок. Попробуйте снова."
+        if not groups:
+            return "Повторяющихся заметок не найдено."
+        groups.sort()
+        response = f"🧹 Почти одинаковые заметки (групп: {len(groups)}):\n\n"
+        response += "\n".join("• " + ", ".join(map(str, group)) for group in groups[:max_groups])
+        if len(groups) > max_groups:
+            response += f"\n… и ещё {len(groups) - max_groups}"
+        return response + "\n\nЛишние можно удалить через «❌ Удалить заметку»."
 
-            files = []
-            for note_id, note_text in zip(note_ids, selected_notes):
-                file_name = f"note_{note_id}.txt"
-                with open(file_name, "w", encoding="utf-8") as file:
-                    file.write(note_text)
-                files.append(file_name)
+    def preselect_notes(self, chat_id, note_ids, limit):
+        # For AI analysis of a large selection: the limit notes closest to the selection's centroid.
+        snapshot = self.with_index(self.similarity_index, chat_id, lambda: self.similarity_index.snapshot(chat_id))
+        return self.similarity_index.representative(snapshot, note_ids, limit)
 
-            return files
+    def export_notes(self, chat_id, export_request):
+        with self.user_data.chat_lock(chat_id):
+            notes = self.user_data.get_notes_snapshot(chat_id)
+            order = list(self.user_data.get_note_order(chat_id))
+
+        parts = export_request.strip().rsplit(maxsplit=1)
+        export_format = self.exporter_format
+        if len(parts) == 2 and parts[1].lower() in EXPORT_FORMATS:
+            export_format = parts[1].lower()
+            export_request = parts[0]
+
+        try:
+            note_numbers = parse_note_numbers(export_request, len(notes))
+        except ValueError:
+            return "Вы ввели некорректные номера заметок. Попробуйте снова."
+
+        def selected_notes():
+            for note_number in note_numbers:
+                if 1 <= note_number <= len(order):
+                    yield note_number, notes[order[note_number - 1]]
+
+        try:
+            archive, count = self.exporter.export(selected_notes(), export_format)
         except Exception as e:
             return f"Произошла ошибка при экспорте заметок: {str(e)}"
+
+        if not count:
+            archive.close()
+            return "Вы ввели некорректные номера заметок. Попробуйте снова."
+        return archive, f"notes.{export_format}", count
+
+    def import_notes(self, chat_id, document, import_format, progress=None):
+        # Parsing and time extraction run batch by batch; nothing is applied until the whole file is read.
+        staged = []
+        try:
+            for batch, reminders in self.importer.parse(document, import_format, datetime.now()):
+                staged.extend((note_text, remind_time, rule) for note_text, (remind_time, rule) in zip(batch, reminders))
+                if progress is not None:
+                    progress["notes"] = len(staged)
+        except ValueError as e:
+            return f"Импорт отменён: {e}."
+
+        if not staged:
+            return "В файле не найдено заметок."
+
+        reminders, series = self.user_data.import_notes(chat_id, staged)
+        self.search_index.drop(chat_id)  # rebuilt on the next search instead of note by note
+        self.similarity_index.drop(chat_id)
+        self.user_data.update_user_statistics(chat_id, "notes_created", len(staged))
+        self.scheduler.schedule_all({chat_id: reminders + [(note_id, next_time) for note_id, _, next_time in series]})
+        return (f"Импортировано заметок: {len(staged)}. "
+                f"С напоминанием: {len(reminders)}, с повторяющимся напоминанием: {len(series)}.")
@@ -0,0 +1,137 @@
+import os
+import re
+import sys
+from datetime import timedelta
+from functools import lru_cache
+
+from Note_bot.main.service.TimeParser import HOUR, MINUTE, PERIOD, to_24_hour
+
+# Whole word forms only: "по пятницам", "каждую пятницу", but not "по Пятницкой" or "по пятницу".
+WEEKDAYS_PLURAL = r'понедельникам|вторникам|средам|четвергам|пятницам|субботам|воскресеньям|будням|выходным'
+WEEKDAY_SINGULAR = r'понедельник|вторник|среду|четверг|пятницу|субботу|воскресенье'
+AT_TIME = rf'(?: в ({HOUR}){MINUTE}(?: {PERIOD}\b)?)?'
+
+RECURRENCE_PATTERN = re.compile(
+    rf'\b(?:каждый день|ежедневно){AT_TIME}'
+    rf'|\bпо ((?:{WEEKDAYS_PLURAL})(?:(?:, | и )(?:{WEEKDAYS_PLURAL}))*)\b{AT_TIME}'
+    rf'|\b(?:каждый|каждую|каждое) ((?:{WEEKDAY_SINGULAR})(?:(?:, | и )(?:{WEEKDAY_SINGULAR}))*)\b{AT_TIME}'
+    r'|\b(?:каждые|каждый|каждую) (?:(\d+) )?(минут[уы]?|час(?:а|ов)?|дн(?:я|ей)|недел[июь]|недель)\b'
+)
+
+# Stems in Monday-first order, matching datetime.weekday().
+WEEKDAY_STEMS = ('пон', 'вто', 'сре', 'чет', 'пят', 'суб', 'вос')
+WEEKDAY_NAMES = ('пн', 'вт', 'ср', 'чт', 'пт', 'сб', 'вс')
+WORKDAYS = 0b0011111
+WEEKENDS = 0b1100000
+UNIT_MINUTES = {'мин': 1, 'час': 60, 'дн': 24 * 60, 'нед': 7 * 24 * 60}
+DEFAULT_MINUTE_OF_DAY = 9 * 60
+# Shorter intervals would turn a note into a message flood; such rules are refused, not clamped.
+MIN_INTERVAL_MINUTES = int(os.getenv('RECURRENCE_MIN_MINUTES', '15'))
+
+
+def parse_recurrence(note_text):
+    match = RECURRENCE_PATTERN.search(note_text.lower())
+    if match is None:
+        return None
+    return parse_rule_phrase(match.group())
+
+
+@lru_cache(maxsize=1024)
+def parse_rule_phrase(phrase):
+    # Rules are short strings: "D540" daily at 09:00, "W5:540" on the weekdays in the bit mask at 09:00,
+    # "I120" every 120 minutes. Interning them lets every series with the same schedule share one object.
+    match = RECURRENCE_PATTERN.fullmatch(phrase)
+    (daily_hour, daily_minute, daily_period, plural_days, plural_hour, plural_minute, plural_period,
+     singular_days, singular_hour, singular_minute, singular_period, amount, unit) = match.groups()
+
+    if unit is not None:
+        minutes = int(amount or 1) * next(value for prefix, value in UNIT_MINUTES.items() if unit.startswith(prefix))
+        return sys.intern(f"I{minutes}") if minutes else None
+
+    weekdays = plural_days or singular_days
+    if weekdays is not None:
+        if plural_days is not None:
+            weekly_hour, weekly_minute, weekly_period = plural_hour, plural_minute, plural_period
+        else:
+            weekly_hour, weekly_minute, weekly_period = singular_hour, singular_minute, singular_period
+        mask = 0
+        for day in re.split(r', | и ', weekdays):
+            if day.startswith('будн'):
+                mask |= WORKDAYS
+            elif day.startswith('выходн'):
+                mask |= WEEKENDS
+            else:
+                mask |= 1 << WEEKDAY_STEMS.index(day[:3])
+        minute_of_day = to_minute_of_day(weekly_hour, weekly_minute, weekly_period)
+        return sys.intern(f"W{mask}:{minute_of_day}") if minute_of_day is not None else None
+
+    minute_of_day = to_minute_of_day(daily_hour, daily_minute, daily_period)
+    return sys.intern(f"D{minute_of_day}") if minute_of_day is not None else None
+
+
+def to_minute_of_day(hour, minute, period):
+    if hour is None:
+        return DEFAULT_MINUTE_OF_DAY
+    hour = to_24_hour(int(hour), period)
+    minute = int(minute or 0)
+    if hour > 23 or minute > 59:
+        return None
+    return hour * 60 + minute
+
+
+@lru_cache(maxsize=1024)
+def decode_rule(rule):
+    kind, value = rule[0], rule[1:]
+    if kind == 'W':
+        mask, minute_of_day = value.split(':')
+        return kind, int(mask), int(minute_of_day)
+    return kind, 0, int(value)
+
+
+def is_too_frequent(rule):
+    kind, _, value = decode_rule(rule)
+    return kind == 'I' and value < MIN_INTERVAL_MINUTES
+
+
+def next_occurrence(rule, after):
+    kind, mask, value = decode_rule(rule)
+    if kind == 'I':
+        return after + timedelta(minutes=value)
+
+    moment = after.replace(hour=value // 60, minute=value % 60, second=0, microsecond=0)
+    if moment <= after:
+        moment += timedelta(days=1)
+    if kind == 'W':
+        while not mask & (1 << moment.weekday()):
+            moment += timedelta(days=1)
+    return moment
+
+
+def advance(rule, fired_at, now):
+    # Occurrences missed while the bot was down collapse into the one just delivered.
+    moment = next_occurrence(rule, fired_at)
+    if moment > now:
+        return moment
+    kind, _, value = decode_rule(rule)
+    if kind == 'I':
+        step = timedelta(minutes=value)
+        return moment + step * ((now - moment) // step + 1)
+    return next_occurrence(rule, now)
+
+
+def describe_rule(rule):
+    kind, mask, value = decode_rule(rule)
+    if kind == 'I':
+        for unit, minutes in (('нед.', 7 * 24 * 60), ('дн.', 24 * 60), ('ч.', 60)):
+            if value % minutes == 0:
+                return f"каждые {value // minutes} {unit}"
+        return f"каждые {value} мин."
+
+    at = f"в {value // 60:02d}:{value % 60:02d}"
+    if kind == 'D':
+        return f"каждый день {at}"
+    if mask == WORKDAYS:
+        return f"по будням {at}"
+    if mask == WEEKENDS:
+        return f"по выходным {at}"
+    return f"по {', '.join(name for day, name in enumerate(WEEKDAY_NAMES) if mask & (1 << day))} {at}"
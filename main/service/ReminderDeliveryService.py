@@ -0,0 +1,125 @@
+import asyncio
+import logging
+import threading
+import time
+
+from telebot.asyncio_helper import ApiTelegramException
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimiter:
+    def __init__(self, rate, burst=1):
+        self.interval = 1.0 / rate
+        self.burst = burst
+        self.next_time = {}  # {key: theoretical time of the next send}
+        self.lock = threading.Lock()
+
+    def reserve(self, key=None):
+        with self.lock:
+            now = time.monotonic()
+            next_time = max(self.next_time.get(key, now), now)
+            send_at = max(now, next_time - (self.burst - 1) * self.interval)
+            self.next_time[key] = next_time + self.interval
+
+            if len(self.next_time) > 10000:
+                self.next_time = {k: t for k, t in self.next_time.items() if t > now}
+
+            return send_at - now
+
+    def pause(self, seconds, key=None):
+        with self.lock:
+            # Offset by the burst allowance that reserve() subtracts, so nothing goes out before resume time.
+            resume_at = time.monotonic() + seconds + (self.burst - 1) * self.interval
+            self.next_time[key] = max(self.next_time.get(key, resume_at), resume_at)
+
+
+class ReminderDeliveryService:
+    def __init__(self, bot, workers=8, queue_size=100000, global_rate=25, chat_rate=1, max_retries=5):
+        self.bot = bot
+        self.worker_count = workers
+        self.queue_size = queue_size
+        self.global_limiter = RateLimiter(global_rate, burst=max(1, int(global_rate)))
+        self.chat_limiter = RateLimiter(chat_rate)
+        self.max_retries = max_retries
+        self.loop = None
+        self.queue = None
+        self.workers = []
+
+        self.delivered = 0
+        self.failed = 0
+        self.retries = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+    def start(self):
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+        self.workers = [self.loop.create_task(self._work()) for _ in range(self.worker_count)]
+
+    async def stop(self, drain_timeout=10):
+        # Fired reminders are already gone from storage, so the queue is drained before the workers go.
+        try:
+            await asyncio.wait_for(self.queue.join(), drain_timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Stopping with %d reminders still queued", self.queue.qsize())
+        for worker in self.workers:
+            worker.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+
+    def submit(self, chat_id, text, reply_markup=None):
+        # Called from the reminder thread; blocks it while the queue is full.
+        item = (chat_id, text, time.monotonic(), reply_markup)
+        asyncio.run_coroutine_threadsafe(self.queue.put(item), self.loop).result()
+
+    def metrics(self):
+        return {
+            "queue_depth": self.queue.qsize() if self.queue else 0,
+            "delivered": self.delivered,
+            "failed": self.failed,
+            "retries": self.retries,
+            "avg_latency": self.total_latency / self.delivered if self.delivered else 0.0,
+            "max_latency": self.max_latency,
+        }
+
+    async def _work(self):
+        while True:
+            item = await self.queue.get()
+            try:
+                await self._deliver(*item)
+            finally:
+                self.queue.task_done()
+
+    async def _deliver(self, chat_id, text, enqueued_at, reply_markup=None):
+        for attempt in range(self.max_retries + 1):
+            await asyncio.sleep(max(self.chat_limiter.reserve(chat_id), self.global_limiter.reserve()))
+            try:
+                await self.bot.send_message(chat_id, text, reply_markup=reply_markup)
+            except ApiTelegramException as e:
+                if e.error_code != 429 and e.error_code < 500:
+                    logger.warning("Reminder for chat %s rejected: %s", chat_id, e.description)
+                    break
+                retry_after = (e.result_json or {}).get("parameters", {}).get("retry_after")
+                if e.error_code == 429 and retry_after:
+                    self.global_limiter.pause(retry_after)
+                    delay = retry_after
+                else:
+                    delay = min(2 ** attempt, 60)
+            except Exception:
+                logger.exception("Failed to send reminder to chat %s", chat_id)
+                delay = min(2 ** attempt, 60)
+            else:
+                self._record_delivery(time.monotonic() - enqueued_at)
+                return
+
+            if attempt == self.max_retries:
+                break
+            self.retries += 1
+            await asyncio.sleep(delay)
+
+        self.failed += 1
+
+    def _record_delivery(self, latency):
+        self.delivered += 1
+        self.total_latency += latency
+        self.max_latency = max(self.max_latency, latency)
@@ -0,0 +1,99 @@
+import heapq
+import itertools
+import threading
+from datetime import datetime
+
+
+class ReminderScheduler:
+    def __init__(self):
+        self.heap = []  # [remind_time, seq, chat_id, note_id, active]
+        self.entries = {}  # {chat_id: {note_id: [entry]}}
+        self.cancelled = 0
+        self.counter = itertools.count()
+        self.condition = threading.Condition()
+        self.running = True
+
+    def __len__(self):
+        return len(self.heap) - self.cancelled
+
+    def schedule(self, chat_id, note_id, remind_time):
+        with self.condition:
+            entry = self._push(chat_id, note_id, remind_time)
+            if self.heap[0] is entry:
+                self.condition.notify_all()
+
+    def schedule_all(self, user_reminders):
+        with self.condition:
+            for chat_id, reminders in user_reminders.items():
+                for note_id, remind_time in reminders:
+                    self.heap.append(self._new_entry(chat_id, note_id, remind_time))
+            heapq.heapify(self.heap)
+            self.condition.notify_all()
+
+    def cancel(self, chat_id, note_id):
+        with self.condition:
+            chat_entries = self.entries.get(chat_id, {})
+            for entry in chat_entries.pop(note_id, []):
+                self._deactivate(entry)
+            if not chat_entries:
+                self.entries.pop(chat_id, None)
+            self._compact()
+            self.condition.notify_all()
+
+    def wait_due(self):
+        with self.condition:
+            while self.running:
+                now = datetime.now()
+                due = []
+                while self.heap and (not self.heap[0][4] or self.heap[0][0] <= now):
+                    entry = heapq.heappop(self.heap)
+                    if not entry[4]:
+                        self.cancelled -= 1
+                        continue
+                    remind_time, _, chat_id, note_id, _ = entry
+                    self._forget(entry)
+                    due.append((chat_id, note_id, remind_time))
+                if due:
+                    return due
+
+                timeout = (self.heap[0][0] - now).total_seconds() if self.heap else None
+                self.condition.wait(timeout)
+            return []
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify_all()
+
+    def _new_entry(self, chat_id, note_id, remind_time):
+        entry = [remind_time, next(self.counter), chat_id, note_id, True]
+        self.entries.setdefault(chat_id, {}).setdefault(note_id, []).append(entry)
+        return entry
+
+    def _push(self, chat_id, note_id, remind_time):
+        entry = self._new_entry(chat_id, note_id, remind_time)
+        heapq.heappush(self.heap, entry)
+        return entry
+
+    def _deactivate(self, entry):
+        if entry[4]:
+            entry[4] = False
+            self.cancelled += 1
+
+    def _forget(self, entry):
+        chat_entries = self.entries.get(entry[2], {})
+        note_entries = chat_entries.get(entry[3], [])
+        if entry in note_entries:
+            note_entries.remove(entry)
+        if not note_entries:
+            chat_entries.pop(entry[3], None)
+        if not chat_entries:
+            self.entries.pop(entry[2], None)
+
+    def _compact(self):
+        # Cancelled entries are dropped lazily when they reach the top of the heap;
+        # rebuild only once they make up most of it.
+        if self.cancelled > 1024 and self.cancelled * 2 > len(self.heap):
+            self.heap = [entry for entry in self.heap if entry[4]]
+            heapq.heapify(self.heap)
+            self.cancelled = 0
@@ -1,29 +1,53 @@
+import logging
 import threading
-import time
 from datetime import datetime
 
+from Note_bot.main.ui.UIManager import build_series_markup
+
+logger = logging.getLogger(__name__)
+
 
 class ReminderWorkerService(threading.Thread):
-    def __init__(self, bot, user_data_manager):
+    def __init__(self, delivery, user_data_manager, scheduler):
         super().__init__(daemon=True)
-        self.bot = bot
+        self.delivery = delivery
         self.user_data = user_data_manager
+        self.scheduler = scheduler
         self.running = True
 
+    def start(self):
+        # Loaded in the caller, before any handler runs: loading in the thread would schedule twice
+        # a reminder that a handler adds before the thread gets to it.
+        self.scheduler.schedule_all(self.user_data.get_pending_reminders())
+        self.scheduler.schedule_all(self.user_data.get_active_series())
+        super().start()
+
     def run(self):
         while self.running:
-            now = datetime.now()
-            for chat_id in list(self.user_data.user_reminders.keys()):
-                reminders = self.user_data.get_user_reminders(chat_id)
-                notes = self.user_data.get_user_notes(chat_id)
-
-                for reminder in reminders[:]:
-                    note_id, remind_time = reminder
-                    if now >= remind_time:
-                        if note_id in notes:
-                            self.bot.send_message(chat_id, f"Напоминание: {notes[note_id]}")
-                        reminders.remove(reminder)
-            time.sleep(30)
+            for chat_id, note_id, remind_time in self.scheduler.wait_due():
+                # One bad reminder must not kill the thread and silently stop every later one.
+                try:
+                    self.fire(chat_id, note_id, remind_time)
+                except Exception:
+                    logger.exception("Failed to fire reminder %s for chat %s", note_id, chat_id)
+
+    def fire(self, chat_id, note_id, remind_time):
+        note_text = self.user_data.get_user_notes(chat_id).get(note_id)
+
+        # Series are expanded one occurrence at a time: the next one is scheduled as this one fires.
+        # The chat lock keeps a concurrent pause from missing the entry scheduled here.
+        with self.user_data.chat_lock(chat_id):
+            next_time = self.user_data.advance_series(chat_id, note_id, remind_time, datetime.now())
+            if next_time is not None:
+                self.scheduler.schedule(chat_id, note_id, next_time)
+
+        if next_time is None:
+            self.user_data.remove_reminder(chat_id, note_id, remind_time)
+
+        if note_text is not None:
+            markup = build_series_markup(note_id, paused=False) if next_time is not None else None
+            self.delivery.submit(chat_id, f"Напоминание: {note_text}", markup)
 
     def stop(self):
         self.running = False
+        self.scheduler.stop()
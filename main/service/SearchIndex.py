@@ -0,0 +1,130 @@
+import bisect
+import math
+import re
+from collections import Counter
+from functools import lru_cache
+
+TOKEN_PATTERN = re.compile(r'\w+')
+RUSSIAN_ENDINGS = sorted([
+    'иями', 'ями', 'ами', 'иях', 'ого', 'его', 'ому', 'ему', 'ыми', 'ими', 'ией', 'ать', 'ять', 'ить', 'еть',
+    'ах', 'ях', 'ам', 'ям', 'ой', 'ей', 'ий', 'ый', 'ая', 'яя', 'ое', 'ее', 'ые', 'ие', 'ом', 'ем', 'ов', 'ев',
+    'ую', 'юю', 'ть', 'а', 'я', 'о', 'е', 'ы', 'и', 'у', 'ю', 'ь',
+], key=len, reverse=True)
+
+
+@lru_cache(maxsize=65536)
+def normalize_word(word):
+    word = word.casefold().replace('ё', 'е')
+    for ending in RUSSIAN_ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= 3:
+            return word[:-len(ending)]
+    return word
+
+
+def tokenize(text):
+    return [normalize_word(word) for word in TOKEN_PATTERN.findall(text)]
+
+
+class SearchIndex:
+    def __init__(self):
+        self.postings = {}  # {chat_id: {term: {note_id: term_count}}}
+        self.documents = {}  # {chat_id: {note_id: Counter(terms)}}
+        self.vocabulary = {}  # {chat_id: sorted list of terms}
+
+    def is_indexed(self, chat_id):
+        return chat_id in self.documents
+
+    def build(self, chat_id, notes):
+        self.install(chat_id, self.prepare(notes))
+
+    def prepare(self, notes):
+        # Touches no shared state, so it can run on a snapshot outside the chat lock.
+        postings, documents = {}, {}
+        for note_id, note_text in notes.items():
+            terms = Counter(tokenize(note_text))
+            documents[note_id] = terms
+            for term, count in terms.items():
+                postings.setdefault(term, {})[note_id] = count
+        return postings, documents, sorted(postings)
+
+    def install(self, chat_id, prepared):
+        self.postings[chat_id], self.documents[chat_id], self.vocabulary[chat_id] = prepared
+
+    def drop(self, chat_id):
+        self.postings.pop(chat_id, None)
+        self.documents.pop(chat_id, None)
+        self.vocabulary.pop(chat_id, None)
+
+    def add(self, chat_id, note_id, note_text):
+        if not self.is_indexed(chat_id):
+            return
+        self.remove(chat_id, note_id)
+
+        postings = self.postings[chat_id]
+        vocabulary = self.vocabulary[chat_id]
+        terms = Counter(tokenize(note_text))
+        self.documents[chat_id][note_id] = terms
+        for term, count in terms.items():
+            if term not in postings:
+                postings[term] = {}
+                bisect.insort(vocabulary, term)
+            postings[term][note_id] = count
+
+    def remove(self, chat_id, note_id):
+        if not self.is_indexed(chat_id):
+            return
+
+        postings = self.postings[chat_id]
+        vocabulary = self.vocabulary[chat_id]
+        for term in self.documents[chat_id].pop(note_id, ()):
+            term_postings = postings[term]
+            term_postings.pop(note_id, None)
+            if not term_postings:
+                del postings[term]
+                del vocabulary[bisect.bisect_left(vocabulary, term)]
+
+    def search(self, chat_id, query):
+        query_terms = set(tokenize(query))
+        if not query_terms or not self.is_indexed(chat_id):
+            return []
+
+        postings = self.postings[chat_id]
+        total_notes = len(self.documents[chat_id])
+        scores = None
+        for query_term in query_terms:
+            term_scores = {}
+            for term in self._expand(chat_id, query_term):
+                term_postings = postings[term]
+                weight = math.log(1 + total_notes / len(term_postings))
+                if term != query_term:
+                    weight /= 2
+                for note_id, count in term_postings.items():
+                    term_scores[note_id] = term_scores.get(note_id, 0.0) + count * weight
+
+            if scores is None:
+                scores = term_scores
+            else:
+                scores = {note_id: score + term_scores[note_id]
+                          for note_id, score in scores.items() if note_id in term_scores}
+            if not scores:
+                return []
+
+        return sorted(scores, key=lambda note_id: (-scores[note_id], note_id))
+
+    def highlight(self, note_text, query):
+        query_terms = set(tokenize(query))
+
+        def mark(match):
+            term = normalize_word(match.group())
+            if any(term.startswith(query_term) for query_term in query_terms):
+                return f"*{match.group()}*"
+            return match.group()
+
+        return TOKEN_PATTERN.sub(mark, note_text)
+
+    def _expand(self, chat_id, prefix):
+        vocabulary = self.vocabulary[chat_id]
+        position = bisect.bisect_left(vocabulary, prefix)
+        while position < len(vocabulary) and vocabulary[position].startswith(prefix):
+            yield vocabulary[position]
+            position += 1
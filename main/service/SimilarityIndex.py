@@ -0,0 +1,295 @@
+import math
+import os
+from collections import Counter
+
+from Note_bot.main.service.SearchIndex import tokenize
+
+
+def load_numpy():
+    # numpy and scipy.sparse load on the first similarity query (or in NoteBot.prewarm), not at startup.
+    import numpy
+    from scipy import sparse
+    return numpy, sparse
+
+
+class NoteVectors:
+    # One chat's notes as sublinear tf rows: a merged CSR base plus the rows added or edited since the last merge.
+    # idf is applied at query time, so scores always use the current document frequencies.
+    def __init__(self, np):
+        self.vocabulary = {}  # {term: column}
+        self.df = np.zeros(1024, np.int32)
+        self.base = None  # csr_matrix of tf rows, set by SimilarityIndex.build
+        self.base_squared = None  # base with squared data, for the weighted row norms
+        self.base_ids = np.zeros(0, np.int64)
+        self.alive = np.zeros(0, bool)
+        self.rows = {}  # {note_id: base row}
+        self.delta = {}  # {note_id: (columns, tf)}
+        self.dead = 0
+        self.normalized = None  # (csr_matrix of unit tf-idf rows, note ids), until the next change
+
+    def __len__(self):
+        return len(self.rows) + len(self.delta)
+
+    def columns(self, np, terms):
+        vocabulary = self.vocabulary
+        for term in terms:
+            if term not in vocabulary:
+                vocabulary[term] = len(vocabulary)
+        if len(vocabulary) > len(self.df):
+            df = np.zeros(max(len(vocabulary), 2 * len(self.df)), np.int32)
+            df[:len(self.df)] = self.df
+            self.df = df
+        return np.fromiter((vocabulary[term] for term in terms), np.int32, len(terms))
+
+    def idf(self, np):
+        # Smoothed idf, as in scikit-learn: log((1 + n) / (1 + df)) + 1.
+        df = self.df[:len(self.vocabulary)]
+        return (np.log((1 + len(self)) / (1 + df)) + 1).astype(np.float32)
+
+
+class SimilarityIndex:
+    def __init__(self, merge_rows=None):
+        self.merge_rows = merge_rows or int(os.getenv('SIMILARITY_MERGE_ROWS', '256'))
+        self.vectors = {}  # {chat_id: NoteVectors}
+
+    def warm_up(self):
+        load_numpy()
+
+    def is_indexed(self, chat_id):
+        return chat_id in self.vectors
+
+    def build(self, chat_id, notes):
+        self.install(chat_id, self.prepare(notes))
+
+    def prepare(self, notes):
+        # Touches no shared state, so it can run on a snapshot outside the chat lock.
+        np, sparse = load_numpy()
+        vectors = NoteVectors(np)
+        note_ids, columns, counts, indptr = [], [], [], [0]
+        for note_id, note_text in notes.items():
+            terms = Counter(tokenize(note_text))
+            note_ids.append(note_id)
+            columns.extend(vectors.columns(np, list(terms)).tolist())
+            counts.extend(terms.values())
+            indptr.append(len(columns))
+
+        columns = np.array(columns, np.int32)
+        vectors.base = sparse.csr_matrix(
+            (1 + np.log(np.array(counts, np.float32)), columns, np.array(indptr, np.int64)),
+            shape=(len(note_ids), len(vectors.vocabulary))
+        )
+        vectors.base_squared = vectors.base.power(2)
+        vectors.base_ids = np.array(note_ids, np.int64)
+        vectors.alive = np.ones(len(note_ids), bool)
+        vectors.rows = {note_id: row for row, note_id in enumerate(note_ids)}
+        np.add.at(vectors.df, columns, 1)
+        return vectors
+
+    def install(self, chat_id, vectors):
+        self.vectors[chat_id] = vectors
+
+    def drop(self, chat_id):
+        self.vectors.pop(chat_id, None)
+
+    def add(self, chat_id, note_id, note_text):
+        vectors = self.vectors.get(chat_id)
+        if vectors is None:
+            return
+        self.remove(chat_id, note_id)
+
+        np, _ = load_numpy()
+        terms = Counter(tokenize(note_text))
+        columns = vectors.columns(np, list(terms))
+        vectors.df[columns] += 1
+        vectors.delta[note_id] = (columns, 1 + np.log(np.fromiter(terms.values(), np.float32, len(terms))))
+        if len(vectors.delta) + vectors.dead > max(self.merge_rows, len(vectors.rows) // 8):
+            self._merge(vectors)
+
+    def remove(self, chat_id, note_id):
+        vectors = self.vectors.get(chat_id)
+        if vectors is None:
+            return
+
+        vectors.normalized = None
+        if note_id in vectors.delta:
+            columns, _ = vectors.delta.pop(note_id)
+        elif note_id in vectors.rows:
+            row = vectors.rows.pop(note_id)
+            vectors.alive[row] = False
+            vectors.dead += 1
+            base = vectors.base
+            columns = base.indices[base.indptr[row]:base.indptr[row + 1]]
+        else:
+            return
+        vectors.df[columns] -= 1
+
+    def similar(self, chat_id, note_id, limit=5, min_score=0.1):
+        # Top-limit notes by tf-idf cosine to note_id: one sparse product over the base rows and one over the delta.
+        np, sparse = load_numpy()
+        vectors = self.vectors[chat_id]
+        if note_id in vectors.delta:
+            columns, tf = vectors.delta[note_id]
+        elif note_id in vectors.rows:
+            base, row = vectors.base, vectors.rows[note_id]
+            columns = base.indices[base.indptr[row]:base.indptr[row + 1]]
+            tf = base.data[base.indptr[row]:base.indptr[row + 1]]
+        else:
+            return []
+
+        idf = vectors.idf(np)
+        query = np.zeros(len(idf), np.float32)
+        query[columns] = tf * idf[columns] ** 2
+        query_norm = math.sqrt(float(np.dot(tf * idf[columns], tf * idf[columns])))
+        if not query_norm:
+            return []
+
+        note_ids, scores = [], []
+        if vectors.base.shape[0]:
+            width = vectors.base.shape[1]
+            norms = np.sqrt(vectors.base_squared @ (idf[:width] ** 2))
+            base_scores = (vectors.base @ query[:width]) / np.maximum(norms, 1e-12)
+            base_scores[~vectors.alive] = 0
+            note_ids.append(vectors.base_ids)
+            scores.append(base_scores)
+        if vectors.delta:
+            delta = self._delta_matrix(vectors, len(idf))
+            norms = np.sqrt(delta.power(2) @ (idf ** 2))
+            note_ids.append(np.fromiter(vectors.delta, np.int64, len(vectors.delta)))
+            scores.append((delta @ query) / np.maximum(norms, 1e-12))
+
+        note_ids, scores = np.concatenate(note_ids), np.concatenate(scores) / query_norm
+        scores[note_ids == note_id] = 0
+        limit = min(limit, len(scores))
+        if not limit:
+            return []
+        top = np.argpartition(-scores, limit - 1)[:limit]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return [(int(note_ids[i]), float(scores[i])) for i in top if scores[i] >= min_score]
+
+    def snapshot(self, chat_id):
+        # (unit tf-idf rows, their note ids, document frequencies) that later changes to the chat leave intact,
+        # for the whole-collection queries below to run outside the chat lock.
+        vectors = self.vectors[chat_id]
+        matrix, ids = self._normalized(vectors)
+        return matrix, ids, vectors.df[:matrix.shape[1]].copy()
+
+    def representative(self, snapshot, note_ids, limit):
+        # The limit notes closest to the centroid of note_ids, in their original order.
+        np, _ = load_numpy()
+        matrix, ids, _ = snapshot
+        positions = {note_id: row for row, note_id in enumerate(ids.tolist())}
+        rows = np.array([positions[note_id] for note_id in note_ids if note_id in positions], np.int64)
+        if len(rows) <= limit:
+            return [note_id for note_id in note_ids if note_id in positions]
+
+        selected = matrix[rows]
+        centroid = np.asarray(selected.sum(axis=0)).ravel()
+        scores = selected @ centroid
+        keep = set(ids[rows[np.argpartition(-scores, limit - 1)[:limit]]].tolist())
+        return [note_id for note_id in note_ids if note_id in keep]
+
+    def duplicates(self, snapshot, threshold=0.9, chunk_rows=1024):
+        # Groups of notes whose cosine is at least threshold. Columns are ordered from the most to the least
+        # frequent term; each row indexes only its rare suffix, whose leading (frequent) part has norm < threshold.
+        # The suffix product covers the terms past the later of a pair's two suffix starts; the rest of the score
+        # comes from the prefix of the row whose suffix starts later, so it is at most that prefix's norm. Rows
+        # sharing no suffix term therefore score below threshold, and only candidates where this bound reaches
+        # threshold get an exact score.
+        np, sparse = load_numpy()
+        matrix, ids, df = snapshot
+        if matrix.shape[0] < 2:
+            return []
+
+        rank = np.empty(matrix.shape[1], np.int32)
+        rank[np.argsort(-df, kind='stable')] = np.arange(matrix.shape[1], dtype=np.int32)
+        ranked = sparse.csr_matrix((matrix.data.copy(), rank[matrix.indices], matrix.indptr), shape=matrix.shape)
+        ranked.sort_indices()
+
+        lengths = np.diff(ranked.indptr)
+        cumulative = np.cumsum(ranked.data.astype(np.float64) ** 2)
+        row_start = np.concatenate(([0.0], cumulative))[ranked.indptr[:-1]]
+        prefix = cumulative - np.repeat(row_start, lengths) < threshold ** 2
+        prefix_rows = np.repeat(np.arange(matrix.shape[0]), lengths)[prefix]
+        prefix_norms = np.sqrt(np.bincount(prefix_rows, weights=ranked.data[prefix].astype(np.float64) ** 2,
+                                           minlength=matrix.shape[0]))
+        prefix_lengths = np.bincount(prefix_rows, minlength=matrix.shape[0])
+        suffix_start = np.full(matrix.shape[0], matrix.shape[1], np.int64)  # rank of the first suffix term
+        has_suffix = prefix_lengths < lengths
+        suffix_start[has_suffix] = ranked.indices[ranked.indptr[:-1][has_suffix] + prefix_lengths[has_suffix]]
+        suffix = ranked.copy()
+        suffix.data[prefix] = 0
+        suffix.eliminate_zeros()
+        suffix_t = suffix.T.tocsr()
+
+        parent = {}
+
+        def find(note_id):
+            while parent.get(note_id, note_id) != note_id:
+                note_id = parent[note_id]
+            return note_id
+
+        for start in range(0, matrix.shape[0], chunk_rows):
+            candidates = (suffix[start:start + chunk_rows] @ suffix_t).tocoo()
+            left = candidates.row.astype(np.int64) + start
+            right = candidates.col.astype(np.int64)
+            rest = np.where(suffix_start[left] >= suffix_start[right], prefix_norms[left], prefix_norms[right])
+            keep = (right > left) & (candidates.data + rest >= threshold)
+            left, right = left[keep], right[keep]
+            if not len(left):
+                continue
+            scores = np.asarray(ranked[left].multiply(ranked[right]).sum(axis=1)).ravel()
+            for a, b in zip(ids[left[scores >= threshold]].tolist(), ids[right[scores >= threshold]].tolist()):
+                root_a, root_b = find(a), find(b)
+                if root_a != root_b:
+                    parent[max(root_a, root_b)] = min(root_a, root_b)
+
+        groups = {}
+        for note_id in parent:
+            groups.setdefault(find(note_id), set()).add(note_id)
+        for root, group in groups.items():
+            group.add(root)
+        return sorted(sorted(group) for group in groups.values())
+
+    def _delta_matrix(self, vectors, width):
+        np, sparse = load_numpy()
+        rows = list(vectors.delta.values())
+        return sparse.csr_matrix((
+            np.concatenate([tf for _, tf in rows]),
+            np.concatenate([columns for columns, _ in rows]),
+            np.concatenate(([0], np.cumsum([len(columns) for columns, _ in rows])))
+        ), shape=(len(rows), width))
+
+    def _merge(self, vectors):
+        np, sparse = load_numpy()
+        width = len(vectors.vocabulary)
+        parts, note_ids = [], []
+        base = vectors.base[vectors.alive]
+        parts.append(sparse.csr_matrix((base.data, base.indices, base.indptr), shape=(base.shape[0], width)))
+        note_ids.append(vectors.base_ids[vectors.alive])
+        if vectors.delta:
+            parts.append(self._delta_matrix(vectors, width))
+            note_ids.append(np.fromiter(vectors.delta, np.int64, len(vectors.delta)))
+
+        vectors.base = sparse.vstack(parts, format='csr')
+        vectors.base_squared = vectors.base.power(2)
+        vectors.base_ids = np.concatenate(note_ids)
+        vectors.alive = np.ones(len(vectors.base_ids), bool)
+        vectors.rows = {note_id: row for row, note_id in enumerate(vectors.base_ids.tolist())}
+        vectors.delta = {}
+        vectors.dead = 0
+
+    def _normalized(self, vectors):
+        if vectors.normalized is None:
+            np, sparse = load_numpy()
+            if vectors.delta or vectors.dead:
+                self._merge(vectors)
+            base = vectors.base
+            idf = vectors.idf(np)[:base.shape[1]]
+            data = base.data * idf[base.indices]
+            lengths = np.diff(base.indptr)
+            norms = np.sqrt(np.bincount(np.repeat(np.arange(base.shape[0]), lengths), weights=data ** 2,
+                                        minlength=base.shape[0]))
+            data /= np.repeat(np.maximum(norms, 1e-12), lengths).astype(np.float32)
+            vectors.normalized = (sparse.csr_matrix((data, base.indices, base.indptr), shape=base.shape),
+                                  vectors.base_ids)
+        return vectors.normalized
@@ -0,0 +1,111 @@
+import calendar
+import re
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+HOUR = r'(?<!\d)\d{1,2}(?!\d)'
+MINUTE = r'(?::(\d{2}))?'
+PERIOD = r'(утра|дня|вечера|ночи)'
+
+TIME_PATTERN = re.compile(
+    r'\bчерез (?:(\d+) )?(полчаса|минут[уы]?|час(?:а|ов)?|день|дн(?:я|ей)|недел[юиь]|месяц(?:а|ев)?)\b'
+    rf'|\b(сегодня|завтра|послезавтра) в ({HOUR}){MINUTE}(?: {PERIOD}\b)?'
+    rf'|(?:\bв )?({HOUR}){MINUTE} {PERIOD}\b'
+    rf'|\bв ({HOUR}){MINUTE}'
+)
+FALLBACK_PATTERN = re.compile(
+    r'\b\d{1,2} (?:января|февраля|марта|апреля|мая|июня|июля|августа|сентября|октября|ноября|декабря)'
+    r'(?: в \d{1,2}(?::\d{2})?)?'
+    r'|\bв (?:понедельник|вторник|среду|четверг|пятницу|субботу|воскресенье)\b'
+)
+BARE_HOUR = re.compile(r' в (\d{1,2})$')
+
+DAY_OFFSETS = {'сегодня': 0, 'завтра': 1, 'послезавтра': 2}
+UNITS = {'мин': 'minutes', 'час': 'hours', 'ден': 'days', 'дн': 'days', 'нед': 'weeks', 'мес': 'months'}
+
+
+@lru_cache(maxsize=4096)
+def parse_phrase(phrase):
+    match = TIME_PATTERN.fullmatch(phrase)
+    if match is None:
+        return None
+    (amount, unit, day, day_hour, day_minute, day_period,
+     period_hour, period_minute, period, hour, minute) = match.groups()
+
+    if unit is not None:
+        if unit == 'полчаса':
+            return 'relative', 'minutes', 30 * int(amount or 1)
+        unit = next(value for prefix, value in UNITS.items() if unit.startswith(prefix))
+        return 'relative', unit, int(amount or 1)
+
+    if day is not None:
+        hour, minute, period = day_hour, day_minute, day_period
+    elif period_hour is not None:
+        hour, minute = period_hour, period_minute
+
+    hour = to_24_hour(int(hour), period)
+    minute = int(minute or 0)
+    if hour > 23 or minute > 59:
+        return None
+    return 'clock', DAY_OFFSETS.get(day), hour, minute
+
+
+def to_24_hour(hour, period):
+    if period in ('дня', 'вечера') and hour < 12:
+        return hour + 12
+    if period == 'ночи':
+        return 0 if hour == 12 else hour + 12 if 6 <= hour < 12 else hour
+    if period == 'утра' and hour == 12:
+        return 0
+    return hour
+
+
+@lru_cache(maxsize=1024)
+def parse_fallback(phrase, relative_base):
+    import dateparser
+
+    return dateparser.parse(phrase, settings={'PREFER_DATES_FROM': 'future', 'RELATIVE_BASE': relative_base})
+
+
+def add_months(moment, months):
+    month_index = moment.month - 1 + months
+    year, month = moment.year + month_index // 12, month_index % 12 + 1
+    return moment.replace(year=year, month=month, day=min(moment.day, calendar.monthrange(year, month)[1]))
+
+
+class TimeParser:
+    def warm_up(self):
+        # Loads dateparser and its locale data before the first note that needs the fallback.
+        parse_fallback('15 марта', datetime.now().replace(second=0, microsecond=0))
+
+    def extract(self, note_text, now=None):
+        now = now or datetime.now()
+        text = note_text.lower()
+
+        match = TIME_PATTERN.search(text)
+        fallback_match = FALLBACK_PATTERN.search(text)
+        if match and not (fallback_match and fallback_match.start() < match.start()):
+            spec = parse_phrase(match.group())
+            if spec is not None:
+                return self.resolve(spec, now)
+
+        if fallback_match:
+            # dateparser reads a bare "в 10" after a date as the year 2110.
+            phrase = BARE_HOUR.sub(r' в \1:00', fallback_match.group())
+            return parse_fallback(phrase, now.replace(second=0, microsecond=0))
+        return None
+
+    def resolve(self, spec, now):
+        if spec[0] == 'relative':
+            _, unit, amount = spec
+            if unit == 'months':
+                return add_months(now, amount)
+            return now + timedelta(**{unit: amount})
+
+        _, day_offset, hour, minute = spec
+        moment = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        if day_offset is not None:
+            return moment + timedelta(days=day_offset)
+        if moment <= now:
+            moment += timedelta(days=1)
+        return moment
@@ -0,0 +1,140 @@
+import asyncio
+import io
+import multiprocessing
+import os
+import struct
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+SERIES_COLORS = ((0x1f, 0x77, 0xb4), (0xff, 0x7f, 0x0e), (0x2c, 0xa0, 0x2c))
+
+
+def render_matplotlib(dates, created, deleted, ai_used):
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=(12, 6))
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+
+    ax.plot(dates, created, marker='o', label='Создано заметок', linewidth=2)
+    ax.plot(dates, deleted, marker='s', label='Удалено заметок', linewidth=2)
+    ax.plot(dates, ai_used, marker='^', label='AI анализов', linewidth=2)
+
+    ax.set_title(f"Статистика активности за {len(dates)} дней", pad=20, fontsize=14)
+    ax.set_xlabel("Дата", fontsize=12)
+    ax.set_ylabel("Количество", fontsize=12)
+    ax.tick_params(axis='x', rotation=45, labelsize=10)
+    ax.tick_params(axis='y', labelsize=10)
+    ax.grid(True, linestyle='--', alpha=0.7)
+    ax.legend(fontsize=12)
+
+    fig.tight_layout()
+
+    buf = io.BytesIO()
+    fig.savefig(buf, format='png', dpi=120, bbox_inches='tight')
+    return buf.getvalue()
+
+
+def load_matplotlib():
+    from matplotlib.backends import backend_agg  # noqa: F401
+
+
+def render_fast(dates, created, deleted, ai_used, width=720, height=360, margin=24):
+    # Draws only the grid, lines and markers; the caption carries the legend and totals.
+    canvas = bytearray(b'\xff' * (width * height * 3))
+
+    def put(x, y, color):
+        if 0 <= x < width and 0 <= y < height:
+            offset = (y * width + x) * 3
+            canvas[offset:offset + 3] = bytes(color)
+
+    def line(x0, y0, x1, y1, color, thickness=2):
+        dx, dy = abs(x1 - x0), -abs(y1 - y0)
+        sx, sy = (1 if x0 < x1 else -1), (1 if y0 < y1 else -1)
+        error = dx + dy
+        while True:
+            for tx in range(thickness):
+                for ty in range(thickness):
+                    put(x0 + tx, y0 + ty, color)
+            if x0 == x1 and y0 == y1:
+                return
+            doubled = 2 * error
+            if doubled >= dy:
+                error += dy
+                x0 += sx
+            if doubled <= dx:
+                error += dx
+                y0 += sy
+
+    plot_width, plot_height = width - 2 * margin, height - 2 * margin
+    top = max(max(created), max(deleted), max(ai_used), 1)
+    steps = max(len(dates) - 1, 1)
+
+    def point(index, value):
+        return margin + index * plot_width // steps, margin + plot_height - value * plot_height // top
+
+    grid = (0xdd, 0xdd, 0xdd)
+    for level in range(5):
+        y = margin + level * plot_height // 4
+        line(margin, y, margin + plot_width, y, grid, thickness=1)
+    for index in range(len(dates)):
+        x = point(index, 0)[0]
+        line(x, margin, x, margin + plot_height, grid, thickness=1)
+
+    for values, color in zip((created, deleted, ai_used), SERIES_COLORS):
+        points = [point(index, value) for index, value in enumerate(values)]
+        for (x0, y0), (x1, y1) in zip(points, points[1:]):
+            line(x0, y0, x1, y1, color)
+        for x, y in points:
+            for mx in range(x - 3, x + 4):
+                for my in range(y - 3, y + 4):
+                    put(mx, my, color)
+
+    raw = b''.join(b'\x00' + canvas[row * width * 3:(row + 1) * width * 3] for row in range(height))
+    return b''.join((
+        b'\x89PNG\r\n\x1a\n',
+        _png_chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)),
+        _png_chunk(b'IDAT', zlib.compress(raw, 6)),
+        _png_chunk(b'IEND', b''),
+    ))
+
+
+def _png_chunk(chunk_type, data):
+    return struct.pack('>I', len(data)) + chunk_type + data + struct.pack('>I', zlib.crc32(chunk_type + data))
+
+
+class ChartRenderer:
+    def __init__(self, mode=None, max_workers=None):
+        self.mode = mode or os.getenv('CHART_RENDERER', 'matplotlib')
+        self.max_workers = max_workers or int(os.getenv('CHART_WORKERS', '2'))
+        self.semaphore = asyncio.Semaphore(self.max_workers)
+        self.executor = None
+
+    async def render(self, dates, created, deleted, ai_used):
+        async with self.semaphore:
+            if self.mode == 'fast':
+                return await asyncio.to_thread(render_fast, dates, created, deleted, ai_used)
+
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), render_matplotlib, dates, created, deleted, ai_used)
+
+    async def warm_up(self):
+        if self.mode == 'fast':
+            return
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        await asyncio.gather(*(loop.run_in_executor(executor, load_matplotlib) for _ in range(self.max_workers)))
+
+    def _get_executor(self):
+        if self.executor is None:
+            # Spawned workers do not inherit the bot's threads, sockets or sqlite connection.
+            self.executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context('spawn')
+            )
+        return self.executor
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,62 @@
+import time
+
+MESSAGE_LIMIT = 4096
+
+
+def split_message(text, limit=MESSAGE_LIMIT):
+    chunks = []
+    while len(text) > limit:
+        cut = text.rfind("\n", 0, limit)
+        if cut <= 0:
+            cut = limit
+        chunks.append(text[:cut])
+        text = text[cut:].lstrip("\n")
+    if text or not chunks:
+        chunks.append(text)
+    return chunks
+
+
+class StreamingMessage:
+    def __init__(self, bot, chat_id, header="", placeholder="⏳", min_interval=1.0):
+        self.bot = bot
+        self.chat_id = chat_id
+        self.header = header
+        self.placeholder = placeholder
+        self.min_interval = min_interval
+        self.body = ""
+        self.message_ids = []
+        self.rendered = []
+        self.last_render = 0.0
+
+    async def start(self):
+        await self._render(self.header + self.placeholder)
+
+    async def append(self, text):
+        self.body += text
+        if time.monotonic() - self.last_render >= self.min_interval:
+            await self._render(self.header + self.body + " " + self.placeholder)
+
+    async def finish(self, fallback_text):
+        if self.body.strip():
+            await self._render(self.header + self.body)
+        else:
+            await self._render(fallback_text)
+
+    async def _render(self, text):
+        self.last_render = time.monotonic()
+        chunks = split_message(text)
+        for index, chunk in enumerate(chunks):
+            if index < len(self.message_ids):
+                if self.rendered[index] != chunk:
+                    await self.bot.edit_message_text(chunk, self.chat_id, self.message_ids[index])
+                    self.rendered[index] = chunk
+            else:
+                message = await self.bot.send_message(self.chat_id, chunk)
+                self.message_ids.append(message.message_id)
+                self.rendered.append(chunk)
+
+        # The final text may need fewer messages than the last partial render, e.g. once the placeholder goes.
+        for message_id in self.message_ids[len(chunks):]:
+            await self.bot.delete_message(self.chat_id, message_id)
+        del self.message_ids[len(chunks):]
+        del self.rendered[len(chunks):]
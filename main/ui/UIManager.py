@@ -1,74 +1,260 @@
+import asyncio
+from collections import OrderedDict
 from datetime import datetime, timedelta
-import io
-from matplotlib import pyplot as plt
-from telebot.types import ReplyKeyboardMarkup, KeyboardButton
+import os
+import threading
+from telebot.types import InlineKeyboardButton, InlineKeyboardMarkup, ReplyKeyboardMarkup, KeyboardButton
+
+from Note_bot.main.ui.ChartRenderer import ChartRenderer
+from Note_bot.main.ui.StreamingMessage import MESSAGE_LIMIT
+
+
+def build_main_menu_markup():
+    markup = ReplyKeyboardMarkup(resize_keyboard=True)
+    markup.row(
+        KeyboardButton("➕ Добавить заметку"),
+        KeyboardButton("❌ Удалить заметку")
+    )
+    markup.row(
+        KeyboardButton("✏️ Редактировать заметку"),
+        KeyboardButton("📋 Показать список заметок")
+    )
+    markup.row(
+        KeyboardButton("🔍 Поиск по заметкам"),
+        KeyboardButton("🤖 Анализ от ИИ")
+    )
+    markup.row(
+        KeyboardButton("📊 Статистика"),
+        KeyboardButton("📤 Экспорт заметок")
+    )
+    markup.row(
+        KeyboardButton("🔗 Похожие заметки"),
+        KeyboardButton("🧹 Найти дубликаты")
+    )
+    markup.row(
+        KeyboardButton("📥 Импорт заметок"),
+        KeyboardButton("ℹ️ О боте")
+    )
+    return markup
+
+
+def build_statistics_markup():
+    markup = ReplyKeyboardMarkup(resize_keyboard=True, row_width=3)
+    markup.add(
+        KeyboardButton("📈 7 дней"),
+        KeyboardButton("📉 30 дней"),
+    )
+    markup.add(
+        KeyboardButton("🔙 Назад")
+    )
+    return markup
+
+
+def build_cancel_edit_markup():
+    markup = ReplyKeyboardMarkup(resize_keyboard=True)
+    markup.add(KeyboardButton("❌ Отмена редактирования"))
+    return markup
+
+
+def build_series_markup(note_id, paused):
+    markup = InlineKeyboardMarkup()
+    if paused:
+        toggle = InlineKeyboardButton("▶️ Продолжить", callback_data=f"{SERIES_CALLBACK}resume:{note_id}")
+    else:
+        toggle = InlineKeyboardButton("⏸ Пауза", callback_data=f"{SERIES_CALLBACK}pause:{note_id}")
+    markup.row(toggle, InlineKeyboardButton("⏹ Завершить", callback_data=f"{SERIES_CALLBACK}end:{note_id}"))
+    return markup.to_json()
+
+
+# Markups are serialized once; telebot sends JSON strings as they are.
+MAIN_MENU_MARKUP = build_main_menu_markup().to_json()
+STATISTICS_MARKUP = build_statistics_markup().to_json()
+CANCEL_EDIT_MARKUP = build_cancel_edit_markup().to_json()
+
+NOTES_LIST_HEADER = "Ваши заметки:\n"
+NOTES_LIST_LINE_LIMIT = 1024
+NOTES_PER_LIST_PAGE = 50
+NOTES_LIST_CALLBACK = "notes_list:"
+NOOP_CALLBACK = "noop"
+SERIES_CALLBACK = "series:"
+
+ABOUT_TEXT = (
+    "*О боте*\n\n"
+    "Этот бот создан для управления заметками и напоминаниями.\n\n"
+    "📋 *Функции:*\n"
+    "• ➕ Добавить заметку\n"
+    "• ❌ Удалить заметку\n"
+    "• ✏️ Редактировать заметку\n"
+    "• 📋 Показать список заметок\n"
+    "• 🔍 Поиск по заметкам\n"
+    "• 🔗 Похожие заметки и поиск дубликатов\n"
+    "• 🤖 Анализ от ИИ\n"
+    "• 📊 Статистика\n"
+    "• 📤 Экспорт заметок\n"
+    "• 📥 Импорт заметок из TXT, Markdown или JSONL\n\n"
+    "⚙️ Если у вас есть вопросы или предложения, свяжитесь с разработчиком ([@the\\_forest\\_owl]("
+    "https://t.me/the_forest_owl))."
+)
 
 
 class UIManager:
     def __init__(self, bot, user_data_manager):
         self.bot = bot
         self.user_data = user_data_manager
-
-    def send_main_menu(self, chat_id):
-        markup = ReplyKeyboardMarkup(resize_keyboard=True)
-        markup.row(
-            KeyboardButton("➕ Добавить заметку"),
-            KeyboardButton("❌ Удалить заметку")
-        )
-        markup.row(
-            KeyboardButton("✏️ Редактировать заметку"),
-            KeyboardButton("📋 Показать список заметок")
-        )
-        markup.row(
-            KeyboardButton("🔍 Поиск по заметкам"),
-            KeyboardButton("🤖 Анализ от ИИ")
-        )
-        markup.row(
-            KeyboardButton("📊 Статистика"),
-            KeyboardButton("📤 Экспорт заметок")
-        )
-        markup.row(
-            KeyboardButton("ℹ️ О боте")
-        )
-        self.bot.send_message(chat_id, "Выберите действие:", reply_markup=markup)
-
-    def send_notes_list(self, chat_id):
-        notes = self.user_data.get_user_notes(chat_id)
-
-        if not notes:
-            self.bot.send_message(chat_id, "У вас пока нет заметок.")
+        self.chart_renderer = ChartRenderer()
+        self.plot_cache = OrderedDict()  # {(chat_id, days): ((stats_version, date), png_bytes)}
+        self.plot_cache_size = int(os.getenv('PLOT_CACHE_SIZE', '256'))
+        self.page_markup_cache = OrderedDict()  # {(chat_id, page): (notes_version, markup_json)}
+        self.page_markup_cache_size = int(os.getenv('PAGE_MARKUP_CACHE_SIZE', '1024'))
+        self.list_pages_cache = OrderedDict()  # {chat_id: (notes_version, [first index of each list page])}
+        self.shown_keyboard = {}  # {chat_id: name of the reply keyboard last sent}
+        # Pages and plot data are read on worker threads, under the chat lock and off the event loop;
+        # the caches above are shared by all chats and guarded by their own short lock.
+        self.cache_lock = threading.Lock()
+
+    async def send_main_menu(self, chat_id, force=False, text="Выберите действие:"):
+        # The reply keyboard stays on the client, so it is only re-sent when another keyboard replaced it.
+        if not force and self.shown_keyboard.get(chat_id) == "main":
             return
+        await self.send_keyboard(chat_id, text, "main", MAIN_MENU_MARKUP)
 
-        message_text = "Ваши заметки:\n"
-        for note_id, note_text in notes.items():
-            message_text += f"{note_id}. {note_text}\n"
+    async def send_cancel_edit_keyboard(self, chat_id, text):
+        await self.send_keyboard(chat_id, text, "cancel_edit", CANCEL_EDIT_MARKUP)
 
-        self.bot.send_message(chat_id, message_text)
+    async def send_keyboard(self, chat_id, text, name, markup, **kwargs):
+        await self.bot.send_message(chat_id, text, reply_markup=markup, **kwargs)
+        self.shown_keyboard[chat_id] = name
 
-    def show_notes_page(self, chat_id, page=0):
-        notes = self.user_data.get_user_notes(chat_id)
-        note_ids = sorted(notes.keys())
-        total_notes = len(note_ids)
-        notes_per_page = 4
+    async def send_result(self, chat_id, text, **kwargs):
+        # The result carries the main keyboard instead of being followed by a separate menu message.
+        await self.attach_keyboard(self.bot.send_message, chat_id, "main", MAIN_MENU_MARKUP, text, **kwargs)
 
-        total_pages = (total_notes + notes_per_page - 1) // notes_per_page
+    async def attach_keyboard(self, send, chat_id, name, markup, *args, **kwargs):
+        if self.shown_keyboard.get(chat_id) != name:
+            kwargs["reply_markup"] = markup
+        await send(chat_id, *args, **kwargs)
+        self.shown_keyboard[chat_id] = name
 
-        if page < 0:
-            page = 0
-        elif page >= total_pages:
-            page = total_pages - 1
+    async def send_notes_list(self, chat_id):
+        page = await asyncio.to_thread(self.render_notes_list_page, chat_id, 0)
+
+        if page is None:
+            await self.bot.send_message(chat_id, "У вас пока нет заметок.")
+            return
 
-        self.user_data.set_current_page(chat_id, page)
+        text, markup = page
+        await self.bot.send_message(chat_id, text, reply_markup=markup)
 
+    async def edit_notes_list_page(self, chat_id, message_id, page):
+        page = await asyncio.to_thread(self.render_notes_list_page, chat_id, page)
+        if page is None:
+            return
+        text, markup = page
+        await self.bot.edit_message_text(text, chat_id, message_id, reply_markup=markup)
+
+    def paginate_notes_list(self, chat_id):
+        # Page boundaries depend only on the notes, so they are computed once per notes version.
+        version = self.user_data.get_notes_version(chat_id)
+        with self.cache_lock:
+            cached = self.list_pages_cache.get(chat_id)
+            if cached is not None and cached[0] == version:
+                self.list_pages_cache.move_to_end(chat_id)
+                return cached[1]
+
+        starts = [0]
+        page_chars = len(NOTES_LIST_HEADER)
+        for index, (note_number, _, note_text) in enumerate(self.user_data.get_numbered_notes(chat_id)):
+            line_chars = min(len(str(note_number)) + len(note_text) + 3, NOTES_LIST_LINE_LIMIT)
+            if index > starts[-1] and (page_chars + line_chars > MESSAGE_LIMIT
+                                       or index - starts[-1] >= NOTES_PER_LIST_PAGE):
+                starts.append(index)
+                page_chars = len(NOTES_LIST_HEADER)
+            page_chars += line_chars
+
+        with self.cache_lock:
+            self.list_pages_cache[chat_id] = (version, starts)
+            self.list_pages_cache.move_to_end(chat_id)
+            while len(self.list_pages_cache) > self.page_markup_cache_size:
+                self.list_pages_cache.popitem(last=False)
+        return starts
+
+    def render_notes_list_page(self, chat_id, page):
+        # None when the chat has no notes.
+        with self.user_data.chat_lock(chat_id):
+            notes = self.user_data.get_user_notes(chat_id)
+            if not notes:
+                return None
+            starts = self.paginate_notes_list(chat_id)
+            page = max(0, min(page, len(starts) - 1))
+            order = self.user_data.get_note_order(chat_id)
+            end = starts[page + 1] if page + 1 < len(starts) else len(order)
+
+            lines = [NOTES_LIST_HEADER]
+            for note_number, note_id in enumerate(order[starts[page]:end], starts[page] + 1):
+                line = f"{note_number}. {notes[note_id]}\n"
+                if len(line) > NOTES_LIST_LINE_LIMIT:
+                    line = line[:NOTES_LIST_LINE_LIMIT - 2] + "…\n"
+                lines.append(line)
+
+        markup = None
+        if len(starts) > 1:
+            markup = InlineKeyboardMarkup()
+            # Buttons that would not change the page do nothing, so Telegram never gets an identical edit.
+            previous_page = f"{NOTES_LIST_CALLBACK}{page - 1}" if page > 0 else NOOP_CALLBACK
+            next_page = f"{NOTES_LIST_CALLBACK}{page + 1}" if page + 1 < len(starts) else NOOP_CALLBACK
+            markup.row(
+                InlineKeyboardButton("⬅️", callback_data=previous_page),
+                InlineKeyboardButton(f"{page + 1}/{len(starts)}", callback_data=NOOP_CALLBACK),
+                InlineKeyboardButton("➡️", callback_data=next_page)
+            )
+        return "".join(lines), markup
+
+    async def show_notes_page(self, chat_id, page=0, notice=None):
+        page, total_pages, markup = await asyncio.to_thread(self.prepare_notes_page, chat_id, page)
+        text = f"Выберите заметку для редактирования (Страница {page + 1}/{total_pages}):"
+        if notice:
+            text = f"{notice}\n\n{text}"
+        await self.send_keyboard(chat_id, text, "notes_page", markup)
+
+    def prepare_notes_page(self, chat_id, page, notes_per_page=4):
+        with self.user_data.chat_lock(chat_id):
+            total_notes = len(self.user_data.get_note_order(chat_id))
+            total_pages = (total_notes + notes_per_page - 1) // notes_per_page
+
+            if page < 0:
+                page = 0
+            elif page >= total_pages:
+                page = total_pages - 1
+
+            self.user_data.set_current_page(chat_id, page)
+
+            key = (chat_id, page)
+            version = self.user_data.get_notes_version(chat_id)
+            with self.cache_lock:
+                cached = self.page_markup_cache.get(key)
+                if cached is not None and cached[0] == version:
+                    self.page_markup_cache.move_to_end(key)
+                    return page, total_pages, cached[1]
+
+            markup = self.build_notes_page_markup(chat_id, page, total_pages, notes_per_page)
+
+        with self.cache_lock:
+            self.page_markup_cache[key] = (version, markup)
+            self.page_markup_cache.move_to_end(key)
+            while len(self.page_markup_cache) > self.page_markup_cache_size:
+                self.page_markup_cache.popitem(last=False)
+        return page, total_pages, markup
+
+    def build_notes_page_markup(self, chat_id, page, total_pages, notes_per_page):
+        notes = self.user_data.get_user_notes(chat_id)
         start_idx = page * notes_per_page
-        end_idx = min(start_idx + notes_per_page, total_notes)
-        page_note_ids = note_ids[start_idx:end_idx]
+        page_note_ids = self.user_data.get_note_order(chat_id)[start_idx:start_idx + notes_per_page]
 
         markup = ReplyKeyboardMarkup(resize_keyboard=True, row_width=2)
 
-        for note_id in page_note_ids:
+        for note_number, note_id in enumerate(page_note_ids, start_idx + 1):
             note_preview = notes[note_id][:20] + "..." if len(notes[note_id]) > 20 else notes[note_id]
-            markup.add(KeyboardButton(f" {note_id}: {note_preview}"))
+            markup.add(KeyboardButton(f" {note_number}: {note_preview}"))
 
         nav_buttons = []
         if page > 0:
@@ -80,89 +266,58 @@ class UIManager:
             markup.row(*nav_buttons)
 
         markup.add(KeyboardButton("❌ Отмена"))
-
-        self.bot.send_message(
-            chat_id,
-            f"Выберите заметку для редактирования (Страница {page + 1}/{total_pages}):",
-            reply_markup=markup
-        )
-
-    def show_statistics(self, chat_id):
-        markup = ReplyKeyboardMarkup(resize_keyboard=True, row_width=3)
-        markup.add(
-            KeyboardButton("📈 7 дней"),
-            KeyboardButton("📉 30 дней"),
-        )
-        markup.add(
-            KeyboardButton("🔙 Назад")
-        )
-
-        self.bot.send_message(
-            chat_id,
-            "Выберите период для отображения статистики:",
-            reply_markup=markup
-        )
-
-    def generate_combined_plot(self, chat_id, days=7):
-        stats = self.user_data.get_user_statistics(chat_id)
-        fig, ax = plt.subplots(figsize=(12, 6))
-
-        today = datetime.now()
-        dates = [(today - timedelta(days=i)).strftime("%m-%d") for i in range(days)][::-1]
-
-        created = [stats["notes_created"].get(date, 0) for date in dates]
-        deleted = [stats["notes_deleted"].get(date, 0) for date in dates]
-        ai_used = [stats["ai_analysis"].get(date, 0) for date in dates]
-
-        ax.plot(dates, created, marker='o', label='Создано заметок', linewidth=2)
-        ax.plot(dates, deleted, marker='s', label='Удалено заметок', linewidth=2)
-        ax.plot(dates, ai_used, marker='^', label='AI анализов', linewidth=2)
-
-        ax.set_title(f"Статистика активности за {days} дней", pad=20, fontsize=14)
-        ax.set_xlabel("Дата", fontsize=12)
-        ax.set_ylabel("Количество", fontsize=12)
-        ax.tick_params(axis='x', rotation=45, labelsize=10)
-        ax.tick_params(axis='y', labelsize=10)
-        ax.grid(True, linestyle='--', alpha=0.7)
-        ax.legend(fontsize=12)
-
-        fig.tight_layout()
-
-        buf = io.BytesIO()
-        fig.savefig(buf, format='png', dpi=120, bbox_inches='tight')
-        buf.seek(0)
-        plt.close(fig)
-
-        return buf
-
-    def send_statistics_plot(self, chat_id, days):
-        stats = self.user_data.get_user_statistics(chat_id)
-        plot = self.generate_combined_plot(chat_id, days)
+        return markup.to_json()
+
+    async def show_statistics(self, chat_id):
+        await self.send_keyboard(chat_id, "Выберите период для отображения статистики:", "statistics", STATISTICS_MARKUP)
+
+    def collect_plot_data(self, chat_id, days):
+        # (cache stamp, chart series, totals) read together under the chat lock.
+        with self.user_data.chat_lock(chat_id):
+            stats = self.user_data.get_user_statistics(chat_id)
+            today = datetime.now()
+            dates = [(today - timedelta(days=i)).strftime("%m-%d") for i in range(days)][::-1]
+            return (
+                (stats.version, today.date()),
+                (
+                    dates,
+                    stats.series("notes_created", days),
+                    stats.series("notes_deleted", days),
+                    stats.series("ai_analysis", days),
+                ),
+                {name: stats.total(name) for name in ("notes_created", "notes_deleted", "ai_analysis")},
+            )
+
+    async def get_statistics_plot(self, chat_id, days, stamp, plot_data):
+        key = (chat_id, days)
+        cached = self.plot_cache.get(key)
+        if cached is not None and cached[0] == stamp:
+            self.plot_cache.move_to_end(key)
+            return cached[1]
+
+        png = await self.chart_renderer.render(*plot_data)
+        self.plot_cache[key] = (stamp, png)
+        self.plot_cache.move_to_end(key)
+        while len(self.plot_cache) > self.plot_cache_size:
+            self.plot_cache.popitem(last=False)
+        return png
+
+    async def send_statistics_plot(self, chat_id, days):
+        stamp, plot_data, totals = await asyncio.to_thread(self.collect_plot_data, chat_id, days)
+        plot = await self.get_statistics_plot(chat_id, days, stamp, plot_data)
 
         stats_text = (
             f"📊 Статистика за {days} дней:\n"
-            f"• Всего заметок создано: {sum(stats['notes_created'].values())}\n"
-            f"• Всего заметок удалено: {sum(stats['notes_deleted'].values())}\n"
-            f"• Всего AI анализов: {stats['total_ai_used']}"
+            f"• Всего заметок создано: {totals['notes_created']}\n"
+            f"• Всего заметок удалено: {totals['notes_deleted']}\n"
+            f"• Всего AI анализов: {totals['ai_analysis']}"
         )
+        if self.chart_renderer.mode == 'fast':
+            stats_text += "\n\n🔵 создано · 🟠 удалено · 🟢 AI анализы"
 
-        self.bot.send_photo(chat_id, plot, caption=stats_text)
-        plot.close()
-
-    def about_bot(self, chat_id):
-        bot_info = (
-            "*О боте*\n\n"
-            "Этот бот создан для управления заметками и напоминаниями.\n\n"
-            "📋 *Функции:*\n"
-            "• ➕ Добавить заметку\n"
-            "• ❌ Удалить заметку\n"
-            "• ✏️ Редактировать заметку\n"
-            "• 📋 Показать список заметок\n"
-            "• 🔍 Поиск по заметкам\n"
-            "• 🤖 Анализ от ИИ\n"
-            "• 📊 Статистика\n"
-            "• 📤 Экспорт заметок\n\n"
-            "⚙️ Если у вас есть вопросы или предложения, свяжитесь с разработчиком ([@the\\_forest\\_owl]("
-            "https://t.me/the_forest_owl))."
-        )
-        self.bot.send_message(chat_id, bot_info, parse_mode="Markdown")
+        # Sent from the statistics keyboard, which stays in place for picking another period.
+        await self.attach_keyboard(self.bot.send_photo, chat_id, "statistics", STATISTICS_MARKUP, plot,
+                                   caption=stats_text)
+
+    async def about_bot(self, chat_id):
+        await self.bot.send_message(chat_id, ABOUT_TEXT, parse_mode="Markdown")
@@ -0,0 +1,92 @@
+import json
+import sys
+import threading
+import time
+import types
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+# The repository root is the Note_bot package; make it importable when checked out under another name.
+ROOT = Path(__file__).resolve().parent.parent
+if "Note_bot" not in sys.modules and ROOT.name != "Note_bot":
+    package = types.ModuleType("Note_bot")
+    package.__path__ = [str(ROOT)]
+    sys.modules["Note_bot"] = package
+elif str(ROOT.parent) not in sys.path:
+    sys.path.insert(0, str(ROOT.parent))
+
+# Imported only once the package is registered above.
+from Note_bot.main.data.Storage import MemoryStorage  # noqa: E402
+from Note_bot.main.data.UserDataManager import UserDataManager  # noqa: E402
+from Note_bot.main.service.AIService import AIService  # noqa: E402
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    # A chat-completions endpoint: JSON answers, or SSE in chunked encoding like the real API.
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.server.requests.append(request)
+        time.sleep(self.server.delay)
+
+        if self.server.status != 200:
+            self.send_body(self.server.status, {"error": {"message": "upstream failed"}})
+        elif request.get("stream"):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            chunks = self.server.chunks or [
+                b"data: " + json.dumps({"choices": [{"delta": {"content": part}}]}).encode() + b"\n\n"
+                for part in ["Анализ ", "готов"]
+            ] + [b"data: [DONE]\n\n"]
+            for index, chunk in enumerate(chunks):
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+                self.wfile.flush()
+                if index == 0 and self.server.hold is not None:
+                    self.server.holding.set()
+                    self.server.hold.wait(5)
+            self.wfile.write(b"0\r\n\r\n")
+        else:
+            self.send_body(200, {"choices": [{"message": {"content": "Анализ готов"}}]})
+
+    def send_body(self, status, data):
+        body = json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    server.daemon_threads = True
+    server.requests = []
+    server.delay = 0.0
+    server.status = 200
+    server.chunks = None  # raw SSE bytes, one HTTP chunk each
+    server.hold = None  # when set, the stream stops after its first chunk until this event fires
+    server.holding = threading.Event()
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    yield server
+    if server.hold is not None:
+        server.hold.set()
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def make_service(stub_server, tmp_path, monkeypatch):
+    monkeypatch.setenv("API_KEY", "test")
+    monkeypatch.setenv("API_URL", f"http://127.0.0.1:{stub_server.server_port}/")
+    monkeypatch.setenv("AI_CACHE_DIR", str(tmp_path / "cache"))
+    return lambda: AIService(UserDataManager(MemoryStorage()))
@@ -0,0 +1,127 @@
+import asyncio
+import json
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from Note_bot.main.ui.StreamingMessage import StreamingMessage
+
+
+class FakeBot:
+    def __init__(self):
+        self.messages = {}
+        self.next_id = 0
+
+    async def send_message(self, chat_id, text, reply_markup=None):
+        self.next_id += 1
+        self.messages[self.next_id] = text
+        return SimpleNamespace(message_id=self.next_id)
+
+    async def edit_message_text(self, text, chat_id, message_id):
+        self.messages[message_id] = text
+
+    async def delete_message(self, chat_id, message_id):
+        del self.messages[message_id]
+
+
+def test_finish_removes_messages_the_final_text_no_longer_needs():
+    bot = FakeBot()
+
+    async def scenario():
+        stream = StreamingMessage(bot, 1, min_interval=0)
+        await stream.start()
+        await stream.append("x" * 4095)  # the trailing placeholder spills into a second message
+        assert len(bot.messages) == 2
+        await stream.finish("Ошибка анализа.")
+        return stream
+
+    stream = asyncio.run(scenario())
+    assert list(bot.messages.values()) == ["x" * 4095]
+    assert stream.message_ids == list(bot.messages)
+
+
+def delta(content):
+    return b"data: " + json.dumps({"choices": [{"delta": {"content": content}}]}, ensure_ascii=False).encode() + b"\n\n"
+
+
+PAYLOAD = {"model": "test", "messages": [{"role": "user", "content": "заметки"}]}
+
+
+def test_stream_parses_events_split_across_chunks(stub_server, make_service):
+    first, second = delta("Анализ "), delta("готов")
+    stub_server.chunks = [
+        b": keep-alive\n\n",
+        b"data: " + json.dumps({"choices": [{"delta": {"role": "assistant"}}]}).encode() + b"\n\n",
+        first[:9],  # splits the event, and a multibyte character, across chunks
+        first[9:] + second[:4],
+        second[4:],
+        b"data: [DONE]\n\n",
+        delta("после конца"),
+    ]
+    ai_service = make_service()
+
+    assert list(ai_service.stream_completion(PAYLOAD)) == ["Анализ ", "готов"]
+    assert stub_server.requests[0]["stream"] is True
+    assert ai_service.request_completion(PAYLOAD) == "Анализ готов"  # cached without another request
+    assert len(stub_server.requests) == 1
+
+
+def test_stream_with_an_error_status_yields_nothing_and_is_not_cached(stub_server, make_service):
+    stub_server.status = 502
+    ai_service = make_service()
+
+    assert list(ai_service.stream_completion(PAYLOAD)) == []
+    assert list(ai_service.stream_completion(PAYLOAD)) == []
+    assert len(stub_server.requests) == 2
+
+
+def test_error_event_mid_stream_raises_and_is_not_cached(stub_server, make_service):
+    stub_server.chunks = [delta("Анализ "), b'data: {"error": {"message": "provider overloaded"}}\n\n']
+    ai_service = make_service()
+
+    stream = ai_service.stream_completion(PAYLOAD)
+    assert next(stream) == "Анализ "
+    with pytest.raises(RuntimeError, match="provider overloaded"):
+        next(stream)
+
+    stub_server.chunks = None
+    assert "".join(ai_service.stream_completion(PAYLOAD)) == "Анализ готов"
+    assert len(stub_server.requests) == 2
+
+
+class SubscribedFlights(dict):
+    # Signals once a second caller has found the running request and will wait for it.
+    def __init__(self):
+        super().__init__()
+        self.joined = threading.Event()
+
+    def get(self, key, default=None):
+        value = super().get(key, default)
+        if value is not None:
+            self.joined.set()
+        return value
+
+
+def test_identical_streams_share_one_upstream_request(stub_server, make_service):
+    stub_server.hold = threading.Event()
+    ai_service = make_service()
+    ai_service.in_flight = SubscribedFlights()
+
+    owner = ai_service.stream_completion(PAYLOAD)
+    assert next(owner) == "Анализ "  # the response is now held open after its first event
+    assert stub_server.holding.is_set()
+
+    waiter_result = []
+    waiter = threading.Thread(target=lambda: waiter_result.extend(ai_service.stream_completion(PAYLOAD)))
+    waiter.start()
+    assert ai_service.in_flight.joined.wait(5)
+
+    stub_server.hold.set()
+    assert list(owner) == ["готов"]
+    waiter.join(5)
+
+    assert waiter_result == ["Анализ готов"]
+    assert len(stub_server.requests) == 1
+    assert ai_service.request_completion(PAYLOAD) == "Анализ готов"  # cached now
+    assert len(stub_server.requests) == 1
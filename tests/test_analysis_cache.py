@@ -0,0 +1,54 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from Note_bot.main.service.AnalysisCache import AnalysisCache
+
+PAYLOAD = {"model": "test", "messages": [{"role": "user", "content": "Проанализируйте заметки"}]}
+
+
+def test_repeated_and_concurrent_requests_reach_the_server_once(stub_server, make_service):
+    stub_server.delay = 0.2
+    ai_service = make_service()
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results = list(executor.map(lambda _: ai_service.request_completion(PAYLOAD), range(4)))
+    assert results == ["Анализ готов"] * 4
+    assert ai_service.request_completion(PAYLOAD) == "Анализ готов"
+    assert len(stub_server.requests) == 1
+    assert ai_service.cache.stats()["hits"] == 1
+
+
+def test_disk_tier_survives_a_restart(stub_server, make_service):
+    assert "".join(make_service().stream_completion(PAYLOAD)) == "Анализ готов"
+
+    restarted = make_service()
+    assert restarted.request_completion(PAYLOAD) == "Анализ готов"
+    assert len(stub_server.requests) == 1
+    assert restarted.cache.stats()["disk_hits"] == 1
+
+
+def test_disk_tier_evicts_least_recently_used_entries(tmp_path):
+    cache = AnalysisCache(max_entries=1, directory=str(tmp_path), max_disk_entries=2)
+    for key in ["a", "b"]:
+        cache.put(key, key)
+    assert cache.get("a") == "a"  # read back from disk, so b is now the least recently used
+    cache.put("c", "c")
+
+    assert sorted(os.listdir(tmp_path)) == ["a.json", "c.json"]
+    assert cache.stats()["disk_evictions"] == 1
+
+    # A restarted cache keeps the order by last use: reading a again makes c the next to go.
+    restarted = AnalysisCache(max_entries=1, directory=str(tmp_path), max_disk_entries=2)
+    assert restarted.get("a") == "a"
+    restarted.put("d", "d")
+    assert sorted(os.listdir(tmp_path)) == ["a.json", "d.json"]
+
+
+def test_expired_disk_entries_are_removed(tmp_path):
+    cache = AnalysisCache(directory=str(tmp_path), ttl=60)
+    cache.put("old", "value")
+    expired = time.time() - 120
+    os.utime(tmp_path / "old.json", (expired, expired))
+
+    assert AnalysisCache(directory=str(tmp_path), ttl=60).stats()["disk_evictions"] == 1
+    assert os.listdir(tmp_path) == []
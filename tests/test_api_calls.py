@@ -0,0 +1,84 @@
+import asyncio
+
+import pytest
+from telebot import asyncio_helper
+from telebot.types import Update
+
+from Note_bot.benchmarks.fake_telegram import FakeTelegram, text_update
+from Note_bot.main.NoteBot import NoteBot
+from Note_bot.main.TelegramSession import configure_session
+from Note_bot.main.data.Storage import MemoryStorage
+from Note_bot.main.data.UserDataManager import UserDataManager
+from Note_bot.main.ui.UIManager import NOOP_CALLBACK, NOTES_LIST_CALLBACK, SERIES_CALLBACK
+
+CHAT_ID = 42
+
+
+def callback_update(update_id, data):
+    return {"update_id": update_id, "callback_query": {
+        "id": str(update_id), "chat_instance": "1", "data": data,
+        "from": {"id": CHAT_ID, "is_bot": False, "first_name": "user"},
+        "message": {"message_id": 1, "date": 0, "chat": {"id": CHAT_ID, "type": "private"}, "text": ""},
+    }}
+
+
+@pytest.fixture
+def telegram_globals(monkeypatch):
+    # configure_session rewires telebot's module-level request settings; they are restored after the test.
+    for name in ("API_URL", "FILE_URL", "REQUEST_LIMIT", "_process_request"):
+        monkeypatch.setattr(asyncio_helper, name, getattr(asyncio_helper, name))
+    monkeypatch.setattr(asyncio_helper.session_manager, "create_session", asyncio_helper.session_manager.create_session)
+
+
+def test_each_interaction_costs_the_counted_calls(telegram_globals, monkeypatch):
+    telegram = FakeTelegram()
+    steps = []
+
+    async def scenario():
+        monkeypatch.setenv("TELEGRAM_API_URL", await telegram.start())
+        note_bot = NoteBot(bot=None, user_data=UserDataManager(MemoryStorage()))
+        configure_session()
+
+        async def step(update):
+            before = sum(telegram.calls.values())
+            await note_bot.bot.process_new_updates([Update.de_json(update)])
+            steps.append(sum(telegram.calls.values()) - before)
+
+        try:
+            await step(text_update(1, CHAT_ID, "➕ Добавить заметку"))
+            await step(text_update(2, CHAT_ID, "купить молоко"))
+            await step(text_update(3, CHAT_ID, "➕ Добавить заметку"))
+            await step(text_update(4, CHAT_ID, "планёрка каждый понедельник в 9"))
+            for number in range(60):
+                note_bot.user_data.add_note(CHAT_ID, f"заметка {number}")
+            await step(text_update(5, CHAT_ID, "📋 Показать список заметок"))
+            await step(callback_update(6, f"{NOTES_LIST_CALLBACK}1"))
+            await step(callback_update(7, NOOP_CALLBACK))
+            await step(callback_update(8, f"{SERIES_CALLBACK}pause:2"))
+            await step(text_update(9, CHAT_ID, "что-то непонятное"))
+        finally:
+            await asyncio_helper.session_manager.session.close()
+            note_bot.ui_manager.chart_renderer.close()
+            note_bot.executor.shutdown()
+            await telegram.stop()
+        return note_bot
+
+    monkeypatch.setenv("BOT_TOKEN", "1:test")
+    note_bot = asyncio.run(scenario())
+
+    # A prompt, a result with its keyboard, a list page or an unknown text is one call; a button press
+    # is the edit plus the callback answer.
+    assert steps == [1, 1, 1, 1, 1, 2, 1, 2, 1]
+    assert telegram.calls == {"sendMessage": 6, "editMessageText": 1, "editMessageReplyMarkup": 1,
+                              "answerCallbackQuery": 3}
+    assert note_bot.user_data.get_series(CHAT_ID, 2)[2]  # the series was paused
+    stats = {name: (count, calls) for name, (count, _, _, calls) in note_bot.handler_stats.items()}
+    assert stats == {
+        "add_note_step1": (2, 2),
+        "add_note_handler": (2, 2),
+        "show_notes_list": (1, 1),
+        "handle_notes_list_page": (1, 2),
+        "handle_noop_callback": (1, 1),
+        "handle_series_action": (1, 2),
+        "unknown_message": (1, 1),
+    }
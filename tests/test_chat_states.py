@@ -0,0 +1,86 @@
+import time
+
+import pytest
+
+from Note_bot.main.data.ChatStates import ADD_NOTE, EDIT_SELECT, EDIT_TEXT, ChatStates
+from Note_bot.main.data.Storage import MemoryStorage, SQLiteStorage
+from Note_bot.main.data.UserDataManager import UserDataManager
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_800_000_000.0]
+    monkeypatch.setattr(time, "time", lambda: now[0])
+    return now
+
+
+def test_state_expires_after_the_ttl():
+    states = ChatStates(ttl=60)
+    states.set(1, EDIT_TEXT, 12345, now=1000)
+
+    assert states.get(1, now=1059) == (EDIT_TEXT, 12345)
+    assert states.get(1, now=1060) is None
+    assert states.expire(now=1060) == [1]
+    assert states.states == {}
+
+
+def test_expire_drops_only_due_chats_and_a_new_step_extends_the_ttl():
+    states = ChatStates(ttl=60)
+    states.set(1, ADD_NOTE, now=1000)
+    states.set(2, ADD_NOTE, now=1010)
+    states.set(3, ADD_NOTE, now=1020)
+    states.set(1, EDIT_SELECT, 2, now=1030)  # chat 1 moved on, so it now expires last
+
+    assert states.expire(now=1075) == [2]
+    assert states.expire(now=1085) == [3]
+    assert states.get(1, now=1085) == (EDIT_SELECT, 2)
+    assert states.expire(now=1090) == [1]
+
+
+def test_argument_must_fit_the_packed_state():
+    states = ChatStates()
+    states.set(1, EDIT_TEXT, (1 << 28) - 1)
+    assert states.get(1) == (EDIT_TEXT, (1 << 28) - 1)
+    with pytest.raises(ValueError):
+        states.set(1, EDIT_TEXT, 1 << 28)
+    with pytest.raises(ValueError):
+        states.set(1, EDIT_TEXT, -1)
+
+
+def test_states_are_restored_from_storage_until_they_expire(clock):
+    storage = MemoryStorage()
+    user_data = UserDataManager(storage)
+    user_data.set_chat_state(1, ADD_NOTE)
+    clock[0] += 60
+    user_data.set_current_page(2, 3)
+
+    restarted = UserDataManager(storage)
+    assert restarted.get_chat_state(1) == (ADD_NOTE, 0)
+    assert restarted.get_current_page(2) == 3
+
+    clock[0] += user_data.chat_states.ttl - 30
+    assert UserDataManager(storage).get_chat_state(1) is None  # expired while the bot was down
+    assert restarted.get_chat_state(1) is None
+    assert restarted.expire_chat_states() == 1
+    assert storage.chat_states.keys() == {2}
+
+    restarted.clear_chat_state(2)
+    assert UserDataManager(storage).get_current_page(2) == 0
+
+
+def test_sqlite_states_survive_a_restart_in_expiry_order(tmp_path, clock):
+    path = str(tmp_path / "notes.db")
+    user_data = UserDataManager(SQLiteStorage(path))
+    for chat_id in (3, 1, 2):
+        user_data.set_chat_state(chat_id, EDIT_SELECT, chat_id)
+        clock[0] += 10
+    user_data.close()
+
+    restarted = UserDataManager(SQLiteStorage(path))
+    try:
+        assert list(restarted.chat_states.states) == [3, 1, 2]
+        clock[0] += restarted.chat_states.ttl - 15
+        assert restarted.expire_chat_states() == 2
+        assert restarted.get_current_page(2) == 2
+    finally:
+        restarted.close()
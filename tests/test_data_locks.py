@@ -0,0 +1,140 @@
+import logging
+import threading
+
+import pytest
+
+from Note_bot.benchmarks.load import run_mixed_load
+from Note_bot.main.data.Storage import MemoryStorage
+from Note_bot.main.data.UserDataManager import UserDataManager
+from Note_bot.main.service.NoteService import NoteManager
+from Note_bot.main.service.ReminderScheduler import ReminderScheduler
+
+
+@pytest.mark.parametrize("stripes", [1, 64])
+def test_concurrent_handlers_keep_chat_data_consistent(stripes, caplog):
+    user_data = UserDataManager(MemoryStorage(), lock_stripes=stripes)
+    note_manager = NoteManager(user_data, ReminderScheduler())
+
+    with caplog.at_level(logging.ERROR):
+        errors, delivered = run_mixed_load(note_manager, user_data)
+
+    assert errors == []
+    assert delivered > 0
+    assert not [record for record in caplog.records if record.levelno >= logging.ERROR]
+    assert len(note_manager.scheduler) == 0
+
+    for chat_id in range(20):
+        notes = user_data.get_user_notes(chat_id)
+        assert user_data.get_note_order(chat_id) == sorted(notes)
+        assert set(user_data.user_reminders.get(chat_id, {})) <= set(notes)
+        if note_manager.search_index.is_indexed(chat_id):
+            assert set(note_manager.search_index.documents[chat_id]) == set(notes)
+            assert note_manager.search_index.vocabulary[chat_id] == sorted(note_manager.search_index.postings[chat_id])
+
+
+def test_index_build_does_not_hold_the_chat_lock():
+    user_data = UserDataManager(MemoryStorage(), lock_stripes=1)
+    note_manager = NoteManager(user_data, ReminderScheduler())
+    for number in range(50):
+        user_data.add_note(1, f"заметка {number}")
+
+    building = threading.Event()
+    release = threading.Event()
+    prepare = note_manager.search_index.prepare
+
+    def slow_prepare(notes):
+        building.set()
+        release.wait(5)
+        return prepare(notes)
+
+    note_manager.search_index.prepare = slow_prepare
+    search = threading.Thread(target=note_manager.search_notes, args=(1, "заметка"))
+    search.start()
+    assert building.wait(5)
+
+    # Another chat on the same (only) stripe is served while the index is being built.
+    lock = user_data.chat_lock(2)
+    assert lock.acquire(timeout=1)
+    lock.release()
+    release.set()
+    search.join()
+    assert note_manager.search_index.is_indexed(1)
+
+
+def test_index_built_from_a_stale_snapshot_is_not_installed():
+    user_data = UserDataManager(MemoryStorage())
+    note_manager = NoteManager(user_data, ReminderScheduler())
+    user_data.add_note(1, "первая")
+    prepare = note_manager.search_index.prepare
+    calls = []
+
+    def racing_prepare(notes):
+        if not calls:
+            user_data.add_note(1, "вторая")  # lands between the snapshot and the install
+        calls.append(len(notes))
+        return prepare(notes)
+
+    note_manager.search_index.prepare = racing_prepare
+    assert "вторая" in note_manager.search_notes(1, "вторая")
+    assert calls == [1, 2]
+
+
+def test_duplicate_scan_does_not_hold_the_chat_lock():
+    pytest.importorskip("scipy")
+    user_data = UserDataManager(MemoryStorage(), lock_stripes=1)
+    note_manager = NoteManager(user_data, ReminderScheduler())
+    for text in ["купить молоко и хлеб", "купить молоко и хлеб", "позвонить маме", "купить молоко и хлеб"]:
+        user_data.add_note(1, text)
+
+    scanning = threading.Event()
+    release = threading.Event()
+    duplicates = note_manager.similarity_index.duplicates
+
+    def slow_duplicates(snapshot, threshold):
+        scanning.set()
+        release.wait(5)
+        return duplicates(snapshot, threshold)
+
+    note_manager.similarity_index.duplicates = slow_duplicates
+    result = []
+    scan = threading.Thread(target=lambda: result.append(note_manager.find_duplicates(1)))
+    scan.start()
+    assert scanning.wait(5)
+
+    # The chat itself stays writable during the scan; a note deleted meanwhile drops out of the groups.
+    lock = user_data.chat_lock(2)
+    assert lock.acquire(timeout=1)
+    lock.release()
+    note_manager.delete_note(1, "4")
+    release.set()
+    scan.join()
+    assert "1, 2" in result[0] and "4" not in result[0]
+
+
+def test_analysis_selection_survives_concurrent_deletes(monkeypatch):
+    monkeypatch.setenv("API_KEY", "test")
+    monkeypatch.setenv("API_URL", "http://127.0.0.1:9/")
+    from Note_bot.main.service.AIService import AIService
+
+    user_data = UserDataManager(MemoryStorage())
+    ai_service = AIService(user_data)
+    stop = threading.Event()
+
+    def churn():
+        while not stop.is_set():
+            note_id = user_data.add_note(1, "временная заметка")
+            user_data.delete_note(1, note_id)
+            user_data.delete_note(1, user_data.resolve_note_id(1, 1))
+            user_data.add_note(1, "новая заметка")
+
+    for number in range(5):
+        user_data.add_note(1, f"заметка {number}")
+    churner = threading.Thread(target=churn)
+    churner.start()
+    try:
+        for _ in range(2000):
+            payload, error = ai_service.prepare_analysis(1, "1,2,3,4,5")
+            assert error is None, error
+    finally:
+        stop.set()
+        churner.join()
@@ -0,0 +1,70 @@
+import pytest
+
+from Note_bot.main.data.Storage import MemoryStorage
+from Note_bot.main.data.UserDataManager import UserDataManager
+from Note_bot.main.service.NoteService import NoteManager
+from Note_bot.main.service.ReminderScheduler import ReminderScheduler
+
+
+@pytest.fixture
+def note_manager():
+    return NoteManager(UserDataManager(MemoryStorage()), ReminderScheduler())
+
+
+def add(note_manager, text):
+    note_id = note_manager.user_data.add_note(1, text)
+    if note_manager.extract_recurrence(text):
+        note_manager.start_series(1, note_id, note_manager.extract_recurrence(text))
+    return note_id
+
+
+def scheduled(note_manager, note_id):
+    return [entry[0] for entry in note_manager.scheduler.entries.get(1, {}).get(note_id, []) if entry[4]]
+
+
+def test_edit_without_a_recurrence_ends_the_series(note_manager):
+    note_id = add(note_manager, "зарядка каждый день в 8")
+
+    response = note_manager.edit_note(1, note_id, "зарядка")
+    assert "отключено" in response
+    assert note_manager.user_data.get_series(1, note_id) is None
+    assert note_manager.user_data.get_note_reminders(1, note_id) == []
+    assert scheduled(note_manager, note_id) == []
+    assert len(note_manager.scheduler) == 0
+
+
+def test_ending_a_series_from_its_button(note_manager):
+    note_id = add(note_manager, "зарядка каждый день в 8")
+
+    assert note_manager.end_series(1, note_id) == "Повторяющееся напоминание завершено."
+    assert note_manager.user_data.get_series(1, note_id) is None
+    assert len(note_manager.scheduler) == 0
+    assert note_manager.end_series(1, note_id) is None  # a second press finds nothing to end
+
+
+def test_one_shot_time_replaces_the_series(note_manager):
+    note_id = add(note_manager, "зарядка каждый день в 8")
+
+    note_manager.edit_note(1, note_id, "зарядка завтра в 9")
+    assert note_manager.user_data.get_series(1, note_id) is None
+    reminders = note_manager.user_data.get_note_reminders(1, note_id)
+    assert [(moment.hour, moment.minute) for moment in reminders] == [(9, 0)]
+    assert scheduled(note_manager, note_id) == reminders
+
+
+def test_edit_keeping_a_recurrence_restarts_the_series(note_manager):
+    note_id = add(note_manager, "зарядка каждый день в 8")
+
+    note_manager.edit_note(1, note_id, "зарядка каждый день в 7")
+    rule, next_time, paused = note_manager.user_data.get_series(1, note_id)
+    assert (next_time.hour, next_time.minute, paused) == (7, 0, False)
+    assert scheduled(note_manager, note_id) == [next_time]
+
+
+def test_series_starting_from_an_edit_drops_one_shot_reminders(note_manager):
+    note_id = add(note_manager, "отчёт")
+    note_manager.edit_note(1, note_id, "отчёт завтра в 9")
+
+    note_manager.edit_note(1, note_id, "отчёт каждый понедельник")
+    assert note_manager.user_data.get_note_reminders(1, note_id) == []
+    assert scheduled(note_manager, note_id) == [note_manager.user_data.get_series(1, note_id)[1]]
@@ -0,0 +1,80 @@
+import json
+import zipfile
+
+import pytest
+
+from Note_bot.main.data.Storage import MemoryStorage
+from Note_bot.main.data.UserDataManager import UserDataManager
+from Note_bot.main.service.NoteExporter import NoteExporter, parse_note_numbers
+from Note_bot.main.service.NoteService import NoteManager
+from Note_bot.main.service.ReminderScheduler import ReminderScheduler
+
+
+@pytest.fixture
+def note_manager():
+    note_manager = NoteManager(UserDataManager(MemoryStorage()), ReminderScheduler())
+    for text in ["купить молоко", "позвонить маме", "список:\n- лопата", "отчёт клиенту"]:
+        note_manager.user_data.add_note(1, text)
+    return note_manager
+
+
+@pytest.mark.parametrize("spec, numbers", [
+    ("1, 3, 10-12", [1, 3, 10, 11, 12]),
+    ("все", range(1, 21)),
+    (" ALL ", range(1, 21)),
+    ("1,1", [1]),
+    ("3-5, 4, 1, 3", [3, 4, 5, 1]),
+    ("18-30", [18, 19, 20]),
+    ("0-2", [1, 2]),
+    ("5-3", []),
+    ("25", [25]),  # left to the caller, which skips numbers without a note
+])
+def test_parse_note_numbers(spec, numbers):
+    assert list(parse_note_numbers(spec, 20)) == list(numbers)
+
+
+@pytest.mark.parametrize("spec", ["", "первая", "1-", "1-x", "1,,2"])
+def test_parse_note_numbers_rejects(spec):
+    with pytest.raises(ValueError):
+        parse_note_numbers(spec, 20)
+
+
+def test_zip_has_one_entry_per_note(note_manager):
+    archive, file_name, count = note_manager.export_notes(1, "3, 1, 1-2, 9")
+    with archive, zipfile.ZipFile(archive) as zip_file:
+        assert (file_name, count) == ("notes.zip", 3)
+        assert zip_file.namelist() == ["note_3.txt", "note_1.txt", "note_2.txt"]
+        assert zip_file.read("note_3.txt").decode("utf-8") == "список:\n- лопата"
+
+
+def test_text_formats(note_manager):
+    archive, file_name, count = note_manager.export_notes(1, "все jsonl")
+    with archive:
+        lines = [json.loads(line) for line in archive.read().decode("utf-8").splitlines()]
+    assert (file_name, count) == ("notes.jsonl", 4)
+    assert lines[2] == {"number": 3, "text": "список:\n- лопата"}
+
+    archive, file_name, _ = note_manager.export_notes(1, "2-3 MD")
+    with archive:
+        assert archive.read().decode("utf-8") == "## Заметка 2\n\nпозвонить маме\n\n## Заметка 3\n\nсписок:\n- лопата\n\n"
+    assert file_name == "notes.md"
+
+
+def test_invalid_selection(note_manager):
+    assert note_manager.export_notes(1, "первая") == "Вы ввели некорректные номера заметок. Попробуйте снова."
+    assert note_manager.export_notes(1, "7, 9-12") == "Вы ввели некорректные номера заметок. Попробуйте снова."
+    assert note_manager.export_notes(2, "все") == "Вы ввели некорректные номера заметок. Попробуйте снова."
+
+
+def test_large_exports_spill_to_disk():
+    exporter = NoteExporter(spool_size=64 * 1024)
+    notes = ((number, f"заметка {number} " + "текст " * 20) for number in range(1, 5001))
+    archive, count = exporter.export(notes, "md")
+    with archive:
+        assert count == 5000
+        assert archive._rolled  # written to a temporary file once past spool_size
+        assert archive.read().decode("utf-8").count("## Заметка ") == 5000
+
+    archive, _ = exporter.export([(1, "коротко")], "zip")
+    with archive:
+        assert not archive._rolled
@@ -0,0 +1,38 @@
+import pytest
+
+from Note_bot.main.data.Storage import MemoryStorage, SQLiteStorage
+from Note_bot.main.data.UserDataManager import UserDataManager
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def open_storage(request, tmp_path):
+    memory = MemoryStorage()
+    return lambda: memory if request.param == "memory" else SQLiteStorage(str(tmp_path / "notes.db"))
+
+
+def restart(user_data, open_storage):
+    user_data.close()
+    return UserDataManager(open_storage())
+
+
+def test_deleted_ids_are_not_reused_after_a_restart(open_storage):
+    user_data = UserDataManager(open_storage())
+    for text in ["первая", "вторая", "третья"]:
+        user_data.add_note(1, text)
+    user_data.delete_note(1, 2)
+    user_data.delete_note(1, 3)
+
+    user_data = restart(user_data, open_storage)
+    assert user_data.add_note(1, "четвёртая") == 4
+    assert user_data.add_note(2, "другой чат") == 1
+
+
+def test_import_moves_the_mark(open_storage):
+    user_data = UserDataManager(open_storage())
+    user_data.add_note(1, "первая")
+    user_data.import_notes(1, [("вторая", None, None), ("третья", None, None)])
+    for note_id in (2, 3):
+        user_data.delete_note(1, note_id)
+
+    user_data = restart(user_data, open_storage)
+    assert user_data.add_note(1, "четвёртая") == 4
@@ -0,0 +1,78 @@
+import io
+
+import pytest
+
+from Note_bot.main.data.Storage import MemoryStorage
+from Note_bot.main.data.UserDataManager import UserDataManager
+from Note_bot.main.service.NoteImporter import NoteImporter
+from Note_bot.main.service.NoteService import NoteManager
+from Note_bot.main.service.ReminderScheduler import ReminderScheduler
+
+NOTES = [
+    "купить молоко",
+    "позвонить маме завтра в 10:00",
+    "планёрка каждый понедельник в 9",
+    "список на дачу:\n- лопата\n- семена",
+    "проверять почту каждую минуту",  # too frequent to become a series
+    "бассейн по средам и пятницам в 7 утра",
+]
+
+
+@pytest.fixture
+def note_manager():
+    note_manager = NoteManager(UserDataManager(MemoryStorage()), ReminderScheduler())
+    note_manager.importer = NoteImporter(batch_size=2, workers=0)  # several batches for a short file
+    return note_manager
+
+
+def imported(note_manager, chat_id, content, import_format):
+    return note_manager.import_notes(chat_id, io.BytesIO(content.encode("utf-8")), import_format)
+
+
+def chat_summary(user_data, chat_id):
+    numbered = user_data.get_numbered_notes(chat_id)
+    return (
+        [text for _, _, text in numbered],
+        [user_data.get_series(chat_id, note_id) and user_data.get_series(chat_id, note_id)[0]
+         for _, note_id, _ in numbered],
+        [len(user_data.user_reminders.get(chat_id, {}).get(note_id, [])) for _, note_id, _ in numbered],
+    )
+
+
+@pytest.mark.parametrize("export_format", ["md", "jsonl"])
+def test_exported_notes_import_back_with_reminders_and_series(note_manager, export_format):
+    for text in NOTES:
+        note_manager._add_note(1, text)
+    archive, _, count = note_manager.export_notes(1, f"все {export_format}")
+    with archive:
+        result = note_manager.import_notes(2, archive, export_format)
+
+    assert count == len(NOTES)
+    assert result == "Импортировано заметок: 6. С напоминанием: 1, с повторяющимся напоминанием: 2."
+    texts, series, reminders = chat_summary(note_manager.user_data, 2)
+    assert (texts, series, reminders) == chat_summary(note_manager.user_data, 1)
+    assert texts == NOTES
+    assert series == [None, None, "W1:540", None, None, "W20:420"]
+    assert len(note_manager.scheduler) == 2 * 3  # a reminder and two series per chat
+    assert note_manager.user_data.get_user_statistics(2).total("notes_created") == len(NOTES)
+
+
+def test_handwritten_files(note_manager):
+    markdown = "- купить хлеб\n1. вынести мусор\n\n# Отпуск\nвзять паспорт\n\n## Заметка 7\nпо будням в 8\n"
+    assert imported(note_manager, 1, markdown, "md").startswith("Импортировано заметок: 4.")
+    assert chat_summary(note_manager.user_data, 1)[:2] == (
+        ["купить хлеб", "вынести мусор", "Отпуск\nвзять паспорт", "по будням в 8"],
+        [None, None, None, "W31:480"],
+    )
+
+    text = "﻿первая\n\n  вторая  \n"
+    assert imported(note_manager, 2, text, "txt").startswith("Импортировано заметок: 2.")
+    assert chat_summary(note_manager.user_data, 2)[0] == ["первая", "вторая"]
+
+
+def test_a_bad_line_cancels_the_whole_import(note_manager):
+    content = '{"text": "первая"}\n"вторая"\n{не json}\n{"text": "четвёртая"}\n'
+    assert imported(note_manager, 1, content, "jsonl") == "Импорт отменён: строка 3 не является JSON."
+    assert imported(note_manager, 1, '{"number": 1}\n', "jsonl") == "Импорт отменён: в строке 1 нет текста заметки."
+    assert imported(note_manager, 1, "\n\n", "txt") == "В файле не найдено заметок."
+    assert note_manager.user_data.get_user_notes(1) == {}
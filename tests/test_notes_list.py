@@ -0,0 +1,87 @@
+import re
+
+import pytest
+
+from Note_bot.main.data.Storage import MemoryStorage
+from Note_bot.main.data.UserDataManager import UserDataManager
+from Note_bot.main.ui.StreamingMessage import MESSAGE_LIMIT
+from Note_bot.main.ui.UIManager import (
+    NOOP_CALLBACK, NOTES_LIST_CALLBACK, NOTES_LIST_LINE_LIMIT, NOTES_PER_LIST_PAGE, UIManager
+)
+
+
+@pytest.fixture
+def ui_manager():
+    return UIManager(None, UserDataManager(MemoryStorage()))
+
+
+def add_notes(ui_manager, texts):
+    for text in texts:
+        ui_manager.user_data.add_note(1, text)
+
+
+def all_pages(ui_manager):
+    pages = []
+    while True:
+        text, markup = ui_manager.render_notes_list_page(1, len(pages))
+        pages.append((text, markup))
+        if markup is None or markup.keyboard[0][2].callback_data == NOOP_CALLBACK:
+            return pages
+
+
+def rendered(ui_manager, page):
+    text, markup = ui_manager.render_notes_list_page(1, page)
+    return text, markup.to_dict()
+
+
+def numbers_on(text):
+    return [int(number) for number in re.findall(r'^(\d+)\. ', text, re.MULTILINE)]
+
+
+def test_pages_split_on_the_note_count(ui_manager):
+    add_notes(ui_manager, [f"заметка {n}" for n in range(120)])
+    pages = all_pages(ui_manager)
+
+    assert [len(numbers_on(text)) for text, _ in pages] == [NOTES_PER_LIST_PAGE, NOTES_PER_LIST_PAGE, 20]
+    assert [number for text, _ in pages for number in numbers_on(text)] == list(range(1, 121))
+    assert [markup.keyboard[0][1].text for _, markup in pages] == ["1/3", "2/3", "3/3"]
+
+
+def test_pages_split_on_the_message_size(ui_manager):
+    add_notes(ui_manager, ["а" * 900] * 10 + ["б" * 5000])
+    pages = all_pages(ui_manager)
+
+    assert all(len(text) <= MESSAGE_LIMIT for text, _ in pages)
+    assert [number for text, _ in pages for number in numbers_on(text)] == list(range(1, 12))
+    # Four 900-character notes fit in one message, a fifth does not.
+    assert len(numbers_on(pages[0][0])) == 4
+    assert len(pages[-1][0].splitlines()[-1]) == NOTES_LIST_LINE_LIMIT - 1  # the long note is cut with "…"
+
+
+def test_navigation_buttons_stop_at_the_ends(ui_manager):
+    add_notes(ui_manager, [f"заметка {n}" for n in range(NOTES_PER_LIST_PAGE + 1)])
+
+    first = ui_manager.render_notes_list_page(1, 0)[1].keyboard[0]
+    last = ui_manager.render_notes_list_page(1, 1)[1].keyboard[0]
+    assert (first[0].callback_data, first[2].callback_data) == (NOOP_CALLBACK, f"{NOTES_LIST_CALLBACK}1")
+    assert (last[0].callback_data, last[2].callback_data) == (f"{NOTES_LIST_CALLBACK}0", NOOP_CALLBACK)
+
+    # Out-of-range pages, e.g. from an old message, are clamped.
+    assert rendered(ui_manager, 7) == rendered(ui_manager, 1)
+    assert rendered(ui_manager, -1) == rendered(ui_manager, 0)
+
+
+def test_single_page_and_empty_lists(ui_manager):
+    assert ui_manager.render_notes_list_page(1, 0) is None
+    add_notes(ui_manager, ["купить молоко"])
+    assert ui_manager.render_notes_list_page(1, 0) == ("Ваши заметки:\n1. купить молоко\n", None)
+
+
+def test_pages_follow_deletes(ui_manager):
+    add_notes(ui_manager, [f"заметка {n}" for n in range(NOTES_PER_LIST_PAGE + 1)])
+    assert len(all_pages(ui_manager)) == 2
+
+    ui_manager.user_data.delete_note(1, ui_manager.user_data.resolve_note_id(1, 1))
+    pages = all_pages(ui_manager)
+    assert len(pages) == 1
+    assert numbers_on(pages[0][0]) == list(range(1, NOTES_PER_LIST_PAGE + 1))
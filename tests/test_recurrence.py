@@ -0,0 +1,87 @@
+from datetime import datetime
+
+import pytest
+
+from Note_bot.main.data.Storage import MemoryStorage
+from Note_bot.main.data.UserDataManager import UserDataManager
+from Note_bot.main.service.NoteImporter import extract_batch
+from Note_bot.main.service.NoteService import NoteManager
+from Note_bot.main.service.Recurrence import advance, describe_rule, is_too_frequent, next_occurrence, parse_recurrence
+from Note_bot.main.service.ReminderScheduler import ReminderScheduler
+
+NOW = datetime(2024, 1, 31, 14, 20)  # a Wednesday
+
+
+@pytest.mark.parametrize("text, rule", [
+    ("зарядка каждый день в 8", "D480"),
+    ("ежедневно", "D540"),
+    ("созвон по пятницам в 18:30", "W16:1110"),
+    ("каждую пятницу", "W16:540"),
+    ("каждый понедельник и среду в 9", "W5:540"),
+    ("бассейн по понедельникам, средам и пятницам в 7 утра", "W21:420"),
+    ("по будням в 8", "W31:480"),
+    ("по выходным", "W96:540"),
+    ("каждое воскресенье в 11", "W64:660"),
+    ("каждые 15 минут", "I15"),
+    ("каждые 2 часа", "I120"),
+    ("полив каждую неделю", "I10080"),
+])
+def test_rules(text, rule):
+    assert parse_recurrence(text) == rule
+
+
+@pytest.mark.parametrize("text", [
+    "встреча по Пятницкой в 10",  # a street, not "по пятницам"
+    "гулять по Субботнику",
+    "ехать по Средней улице",
+    "отпуск с понедельника по пятницу",  # a date range, not a weekly rule
+    "по пятницу включительно",
+    "каждый понедельникам",
+    "каждый день в 25:00",
+    "пятница",
+])
+def test_phrases_that_are_not_rules(text):
+    assert parse_recurrence(text) is None
+
+
+def test_intervals_below_the_floor_are_refused():
+    assert is_too_frequent(parse_recurrence("пить воду каждую минуту"))
+    assert is_too_frequent(parse_recurrence("каждые 5 минут"))
+    assert not is_too_frequent(parse_recurrence("каждые 15 минут"))
+    assert not is_too_frequent(parse_recurrence("каждый день"))
+
+
+def test_too_frequent_rules_start_no_series():
+    note_manager = NoteManager(UserDataManager(MemoryStorage()), ReminderScheduler())
+    response = note_manager._add_note(1, "пить воду каждую минуту")
+    assert response.startswith("Заметка добавлена без напоминания")
+    assert note_manager.user_data.get_active_series() == {}
+    assert len(note_manager.scheduler) == 0
+
+    note_id = note_manager.user_data.resolve_note_id(1, 1)
+    note_manager.start_series(1, note_id, parse_recurrence("каждый день"))
+    assert "без напоминания" in note_manager.edit_note(1, note_id, "пить воду каждую минуту")
+    assert note_manager.user_data.get_series(1, note_id) is None
+    assert len(note_manager.scheduler) == 0
+
+    assert extract_batch(["пить воду каждую минуту"], NOW) == [(None, None)]
+
+
+def test_occurrences():
+    assert next_occurrence("D540", NOW) == datetime(2024, 2, 1, 9, 0)
+    assert next_occurrence("W16:1110", NOW) == datetime(2024, 2, 2, 18, 30)
+    assert next_occurrence("W96:540", NOW) == datetime(2024, 2, 3, 9, 0)
+    # Occurrences missed while the bot was down collapse into the next one after now.
+    assert advance("I60", datetime(2024, 1, 31, 10, 0), NOW) == datetime(2024, 1, 31, 15, 0)
+    assert advance("D540", datetime(2024, 1, 28, 9, 0), NOW) == datetime(2024, 2, 1, 9, 0)
+
+
+@pytest.mark.parametrize("rule, description", [
+    ("D480", "каждый день в 08:00"),
+    ("W31:480", "по будням в 08:00"),
+    ("W5:540", "по пн, ср в 09:00"),
+    ("I120", "каждые 2 ч."),
+    ("I45", "каждые 45 мин."),
+])
+def test_descriptions(rule, description):
+    assert describe_rule(rule) == description
@@ -0,0 +1,129 @@
+import asyncio
+import time
+
+from telebot.asyncio_helper import ApiTelegramException
+
+from Note_bot.main.service.ReminderDeliveryService import ReminderDeliveryService
+
+# asyncio may wake a timer up to a clock tick early.
+TOLERANCE = 0.01
+
+
+class FakeBot:
+    def __init__(self, delay=0.0, flood_chats=(), retry_after=1, floods=1):
+        self.delay = delay
+        self.sent = []
+        self.send_times = []  # [(chat_id, time.monotonic())]
+        self.flood_chats = set(flood_chats)
+        self.retry_after = retry_after
+        self.floods = floods
+        self.flood_times = []
+
+    async def send_message(self, chat_id, text, reply_markup=None):
+        if chat_id in self.flood_chats and len(self.flood_times) < self.floods:
+            self.flood_times.append(time.monotonic())
+            raise ApiTelegramException("sendMessage", None, {
+                "error_code": 429,
+                "description": "Too Many Requests: retry later",
+                "parameters": {"retry_after": self.retry_after},
+            })
+        self.send_times.append((chat_id, time.monotonic()))
+        await asyncio.sleep(self.delay)
+        self.sent.append((chat_id, text))
+
+
+def deliver(bot, messages, **options):
+    async def scenario():
+        delivery = ReminderDeliveryService(bot, **options)
+        delivery.start()
+        for chat_id, text in messages:
+            await asyncio.to_thread(delivery.submit, chat_id, text)
+        await delivery.stop(drain_timeout=10)
+        return delivery.metrics()
+
+    return asyncio.run(scenario())
+
+
+def test_stop_delivers_queued_reminders():
+    bot = FakeBot(delay=0.01)
+
+    async def scenario():
+        delivery = ReminderDeliveryService(bot, workers=2, global_rate=1000, chat_rate=1000)
+        delivery.start()
+        for number in range(20):
+            await asyncio.to_thread(delivery.submit, number % 3, f"Напоминание: {number}")
+        await delivery.stop(drain_timeout=5)
+        return delivery.metrics()
+
+    metrics = asyncio.run(scenario())
+    assert sorted(text for _, text in bot.sent) == sorted(f"Напоминание: {number}" for number in range(20))
+    assert metrics["queue_depth"] == 0
+    assert metrics["delivered"] == 20 and metrics["failed"] == 0
+    assert 0 < metrics["avg_latency"] <= metrics["max_latency"]
+
+
+def test_stop_gives_up_after_the_drain_timeout():
+    bot = FakeBot(delay=10)
+
+    async def scenario():
+        delivery = ReminderDeliveryService(bot, workers=1, global_rate=1000, chat_rate=1000)
+        delivery.start()
+        await asyncio.to_thread(delivery.submit, 1, "Напоминание")
+        await asyncio.wait_for(delivery.stop(drain_timeout=0.1), 5)
+        return delivery.metrics()
+
+    assert asyncio.run(scenario())["delivered"] == 0
+    assert bot.sent == []
+
+
+def test_sends_respect_the_per_chat_and_global_rates():
+    bot = FakeBot()
+    global_rate, chat_rate = 50, 20
+    messages = [(number % 10, f"Напоминание: {number}") for number in range(100)]
+
+    metrics = deliver(bot, messages, workers=16, global_rate=global_rate, chat_rate=chat_rate)
+    assert metrics["delivered"] == 100
+
+    for chat_id in range(10):
+        times = [sent_at for chat, sent_at in bot.send_times if chat == chat_id]
+        assert all(later - earlier >= 1 / chat_rate - TOLERANCE for earlier, later in zip(times, times[1:]))
+
+    # Token bucket: any run of sends fits in the burst plus the rate over its span.
+    times = sorted(sent_at for _, sent_at in bot.send_times)
+    burst = global_rate
+    for first in range(len(times)):
+        for last in range(first + burst, len(times)):
+            assert last - first + 1 <= burst + global_rate * (times[last] - times[first] + TOLERANCE)
+    assert times[-1] - times[0] >= (len(times) - burst) / global_rate - TOLERANCE
+
+
+def test_flood_wait_pauses_every_chat_and_retries():
+    bot = FakeBot(flood_chats={1}, retry_after=1)
+
+    async def scenario():
+        delivery = ReminderDeliveryService(bot, workers=2, global_rate=1000, chat_rate=1000)
+        delivery.start()
+        await asyncio.to_thread(delivery.submit, 1, "Напоминание: первое")
+        while not bot.flood_times:
+            await asyncio.sleep(0.01)
+        await asyncio.to_thread(delivery.submit, 2, "Напоминание: второе")
+        await delivery.stop(drain_timeout=5)
+        return delivery.metrics()
+
+    metrics = asyncio.run(scenario())
+    assert metrics["retries"] == 1
+    assert metrics["delivered"] == 2 and metrics["failed"] == 0
+    flooded_at = bot.flood_times[0]
+    # The other chat waits out the pause too, not just the flooded one.
+    assert all(sent_at >= flooded_at + 1 - TOLERANCE for _, sent_at in bot.send_times)
+    assert {chat_id for chat_id, _ in bot.send_times} == {1, 2}
+
+
+def test_gives_up_after_max_retries():
+    bot = FakeBot(flood_chats={1}, retry_after=0.05, floods=10)
+
+    metrics = deliver(bot, [(1, "Напоминание")], workers=1, global_rate=1000, chat_rate=1000, max_retries=2)
+    assert len(bot.flood_times) == 3
+    assert metrics["retries"] == 2
+    assert metrics["failed"] == 1 and metrics["delivered"] == 0
+    assert all(later - earlier >= 0.05 - TOLERANCE for earlier, later in zip(bot.flood_times, bot.flood_times[1:]))
@@ -0,0 +1,56 @@
+import queue
+from datetime import datetime, timedelta
+
+from Note_bot.main.data.Storage import MemoryStorage
+from Note_bot.main.data.UserDataManager import UserDataManager
+from Note_bot.main.service.NoteService import NoteManager
+from Note_bot.main.service.ReminderScheduler import ReminderScheduler
+from Note_bot.main.service.ReminderWorkerService import ReminderWorkerService
+
+
+class FlakyDelivery:
+    def __init__(self):
+        self.sent = queue.Queue()
+
+    def submit(self, chat_id, text, markup=None):
+        if "сломается" in text:
+            raise RuntimeError("delivery failed")
+        self.sent.put((chat_id, text))
+
+
+def test_failing_reminder_does_not_stop_the_worker():
+    user_data = UserDataManager(MemoryStorage())
+    past = datetime.now() - timedelta(minutes=1)
+    for text in ["сломается", "дойдёт"]:
+        note_id = user_data.add_note(1, text)
+        user_data.add_reminder(1, note_id, past)
+
+    delivery = FlakyDelivery()
+    worker = ReminderWorkerService(delivery, user_data, ReminderScheduler())
+    worker.start()
+    try:
+        assert delivery.sent.get(timeout=5) == (1, "Напоминание: дойдёт")
+        assert worker.is_alive()
+    finally:
+        worker.stop()
+        worker.join(5)
+
+
+def test_stored_reminders_are_scheduled_once_before_handlers_run():
+    user_data = UserDataManager(MemoryStorage())
+    note_manager = NoteManager(user_data, ReminderScheduler())
+    later = datetime.now() + timedelta(hours=1)
+    stored = user_data.add_note(1, "сохранённая")
+    user_data.add_reminder(1, stored, later)
+
+    worker = ReminderWorkerService(FlakyDelivery(), user_data, note_manager.scheduler)
+    worker.start()
+    try:
+        # Scheduled by the time start() returns, so a handler that runs next cannot be loaded a second time.
+        assert len(note_manager.scheduler) == 1
+        note_manager._add_note(1, "новая завтра в 10")
+        assert len(note_manager.scheduler) == 2
+        assert all(len(entries) == 1 for entries in note_manager.scheduler.entries[1].values())
+    finally:
+        worker.stop()
+        worker.join(5)
@@ -0,0 +1,73 @@
+import random
+
+from Note_bot.benchmarks.corpus import generate_notes
+from Note_bot.main.data.Storage import MemoryStorage
+from Note_bot.main.data.UserDataManager import UserDataManager
+from Note_bot.main.service.NoteService import NoteManager
+from Note_bot.main.service.ReminderScheduler import ReminderScheduler
+from Note_bot.main.service.SearchIndex import SearchIndex, tokenize
+
+
+def test_stemming_and_case_folding():
+    assert tokenize("Встречи, ВСТРЕЧА и встречами; Ёлка") == ["встреч", "встреч", "и", "встреч", "елк"]
+
+
+def test_ranked_and_prefix_queries():
+    index = SearchIndex()
+    index.build(1, {1: "отчёт по проекту", 2: "проект, проект и ещё раз проект", 3: "купить молоко"})
+
+    assert index.search(1, "проект") == [2, 1]
+    assert index.search(1, "проект отчёт") == [1]  # every term must match
+    assert index.search(1, "прое") == [2, 1]
+    assert index.search(1, "хлеб") == []
+    assert index.search(1, "   ") == []
+    assert index.search(2, "проект") == []  # not indexed
+
+
+def test_updates_match_a_fresh_build():
+    index = SearchIndex()
+    notes = dict(enumerate(generate_notes(300), 1))
+    index.build(1, notes)
+
+    rng = random.Random(3)
+    next_id = len(notes) + 1
+    for text in generate_notes(600, seed=4):
+        action = rng.random()
+        if action < 0.4:
+            notes[next_id] = text
+            index.add(1, next_id, text)
+            next_id += 1
+        elif action < 0.7 and notes:
+            note_id = rng.choice(list(notes))
+            notes[note_id] = text
+            index.add(1, note_id, text)
+        elif notes:
+            note_id = rng.choice(list(notes))
+            del notes[note_id]
+            index.remove(1, note_id)
+
+    fresh = SearchIndex()
+    fresh.build(1, notes)
+    assert index.documents[1] == fresh.documents[1]
+    assert index.postings[1] == fresh.postings[1]
+    assert index.vocabulary[1] == fresh.vocabulary[1]
+    for query in ["отчёт", "встреча клиент", "докум"]:
+        assert index.search(1, query) == fresh.search(1, query)
+
+
+def test_note_manager_keeps_the_index_current():
+    user_data = UserDataManager(MemoryStorage())
+    note_manager = NoteManager(user_data, ReminderScheduler())
+    note_manager._add_note(1, "купить молоко")
+    note_manager._add_note(1, "позвонить в банк")
+    assert "молоко" in note_manager.search_notes(1, "молоко")  # builds the index
+
+    note_id = user_data.resolve_note_id(1, 1)
+    note_manager.edit_note(1, note_id, "купить хлеб")
+    assert "не найдены" in note_manager.search_notes(1, "молоко")
+    assert "*хлеб*" in note_manager.search_notes(1, "хлеб")
+
+    note_manager.delete_note(1, "1")
+    assert "не найдены" in note_manager.search_notes(1, "хлеб")
+    assert "молок" not in note_manager.search_index.vocabulary[1]
+    assert set(note_manager.search_index.documents[1]) == set(user_data.get_user_notes(1))
@@ -0,0 +1,60 @@
+from datetime import datetime
+
+import pytest
+
+from Note_bot.main.ShardRouter import rebalance_shards, shard_database_path, shard_for
+from Note_bot.main.data.Storage import SQLiteStorage
+from Note_bot.main.data.UserDataManager import UserDataManager
+
+CHATS = range(1, 41)
+
+
+@pytest.fixture(autouse=True)
+def database_paths(tmp_path, monkeypatch):
+    monkeypatch.setenv("DATABASE_PATH", str(tmp_path / "notes.db"))
+    monkeypatch.setenv("SHARD_DATABASE_PATH", str(tmp_path / "notes.shard{shard}.db"))
+
+
+def open_shard(shard, shards):
+    return UserDataManager(SQLiteStorage(shard_database_path(shard, shards)))
+
+
+def fill_unsharded():
+    user_data = open_shard(0, 1)
+    for chat_id in CHATS:
+        note_id = user_data.add_note(chat_id, f"заметка чата {chat_id}")
+        user_data.add_reminder(chat_id, note_id, datetime(2030, 1, chat_id % 28 + 1, 9, 0))
+    user_data.close()
+
+
+def chats_in(shard, shards):
+    user_data = open_shard(shard, shards)
+    try:
+        chats = {chat_id for chat_id in CHATS if user_data.get_user_notes(chat_id)}
+        assert set(user_data.user_reminders) == chats
+        return chats
+    finally:
+        user_data.close()
+
+
+def test_growing_an_unsharded_deployment_moves_its_data():
+    fill_unsharded()
+
+    assert rebalance_shards(1, 4) == len(CHATS)
+    assert chats_in(0, 1) == set()
+    for shard in range(4):
+        assert chats_in(shard, 4) == {chat_id for chat_id in CHATS if shard_for(chat_id, 4) == shard}
+
+
+def test_resizing_and_shrinking_back_to_one_shard():
+    fill_unsharded()
+    rebalance_shards(1, 3)
+    rebalance_shards(3, 5)
+    for shard in range(5):
+        assert chats_in(shard, 5) == {chat_id for chat_id in CHATS if shard_for(chat_id, 5) == shard}
+
+    rebalance_shards(5, 1)
+    assert chats_in(0, 1) == set(CHATS)
+    user_data = open_shard(0, 1)
+    assert user_data.add_note(1, "ещё одна") == 2  # the id mark moved with the chat
+    user_data.close()
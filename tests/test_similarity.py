@@ -0,0 +1,147 @@
+import math
+import random
+from collections import Counter
+
+import pytest
+
+from Note_bot.main.data.Storage import MemoryStorage
+from Note_bot.main.data.UserDataManager import UserDataManager
+from Note_bot.main.service.NoteService import NoteManager
+from Note_bot.main.service.ReminderScheduler import ReminderScheduler
+from Note_bot.main.service.SearchIndex import tokenize
+from Note_bot.main.service.SimilarityIndex import SimilarityIndex
+
+pytest.importorskip("scipy")
+
+WORDS = ("молоко хлеб сыр врач анализы отчёт клиент бюджет созвон команда бассейн зал билеты отпуск "
+         "паспорт виза подарок мама дача ремонт кот корм аптека лекарства").split()
+
+
+def random_notes(count, seed=1):
+    rng = random.Random(seed)
+    return {note_id: " ".join(rng.choices(WORDS, k=rng.randint(2, 8))) for note_id in range(1, count + 1)}
+
+
+def cosines(notes):
+    # Plain-Python tf-idf cosine between every pair of notes, for comparison with the sparse matrices.
+    terms = {note_id: Counter(tokenize(text)) for note_id, text in notes.items()}
+    df = Counter(term for counts in terms.values() for term in counts)
+    idf = {term: math.log((1 + len(notes)) / (1 + count)) + 1 for term, count in df.items()}
+    vectors = {}
+    for note_id, counts in terms.items():
+        vector = {term: (1 + math.log(count)) * idf[term] for term, count in counts.items()}
+        norm = math.sqrt(sum(value * value for value in vector.values()))
+        vectors[note_id] = {term: value / norm for term, value in vector.items()} if norm else {}
+    return {(a, b): sum(value * vectors[b].get(term, 0) for term, value in vectors[a].items())
+            for a in notes for b in notes if a != b}
+
+
+def expected_similar(notes, note_id, limit=5, min_score=0.1):
+    scores = cosines(notes)
+    ranked = sorted((other for other in notes if other != note_id), key=lambda other: -scores[note_id, other])
+    return [(other, scores[note_id, other]) for other in ranked[:limit] if scores[note_id, other] >= min_score]
+
+
+def assert_same_ranking(actual, expected):
+    assert [score for _, score in actual] == pytest.approx([score for _, score in expected], abs=1e-5)
+    # Ties may come out in either order, so ids are compared together with their scores.
+    assert {(note_id, round(score, 4)) for note_id, score in actual} == \
+        {(note_id, round(score, 4)) for note_id, score in expected}
+
+
+def test_similar_matches_plain_cosine():
+    notes = random_notes(200)
+    index = SimilarityIndex()
+    index.build(1, notes)
+    for note_id in (1, 50, 200):
+        assert_same_ranking(index.similar(1, note_id), expected_similar(notes, note_id))
+    assert index.similar(1, 999) == []
+
+
+def test_incremental_changes_match_a_rebuild():
+    notes = random_notes(150)
+    index = SimilarityIndex(merge_rows=8)  # forces several merges of the delta rows
+    index.build(1, notes)
+    rng = random.Random(2)
+    for step in range(60):
+        note_id = rng.randint(1, 170)
+        if step % 3 == 0 and note_id in notes:
+            index.remove(1, note_id)
+            del notes[note_id]
+        else:
+            notes[note_id] = " ".join(rng.choices(WORDS, k=rng.randint(2, 8)))
+            index.add(1, note_id, notes[note_id])
+        if step % 10 == 0:
+            probe = rng.choice(list(notes))
+            assert_same_ranking(index.similar(1, probe), expected_similar(notes, probe))
+
+    rebuilt = SimilarityIndex()
+    rebuilt.build(1, notes)
+    assert len(index.vectors[1]) == len(notes)
+    for note_id in list(notes)[:20]:
+        assert_same_ranking(index.similar(1, note_id, limit=10), rebuilt.similar(1, note_id, limit=10))
+
+
+def test_unrelated_notes_are_not_similar():
+    index = SimilarityIndex()
+    index.build(1, {1: "купить молоко", 2: "купить молоко и хлеб", 3: "записаться к врачу", 4: "..."})
+    assert [note_id for note_id, _ in index.similar(1, 1)] == [2]
+    assert index.similar(1, 3) == []
+    assert index.similar(1, 4) == []  # no terms at all
+
+
+@pytest.mark.parametrize("threshold", [0.5, 0.7, 0.9])
+def test_duplicates_match_plain_pairs(threshold):
+    notes = random_notes(300, seed=3)
+    rng = random.Random(4)
+    for note_id in rng.sample(list(notes), 40):  # near copies: one word more or a changed case
+        notes[1000 + note_id] = notes[note_id].upper() if note_id % 2 else f"{notes[note_id]} {rng.choice(WORDS)}"
+    index = SimilarityIndex()
+    index.build(1, notes)
+
+    parent = {note_id: note_id for note_id in notes}
+
+    def find(note_id):
+        while parent[note_id] != note_id:
+            note_id = parent[note_id]
+        return note_id
+
+    for (a, b), score in cosines(notes).items():
+        if score >= threshold - 1e-6:
+            parent[max(find(a), find(b))] = min(find(a), find(b))
+    groups = {}
+    for note_id in notes:
+        groups.setdefault(find(note_id), []).append(note_id)
+    expected = sorted(sorted(group) for group in groups.values() if len(group) > 1)
+
+    assert index.duplicates(index.snapshot(1), threshold, chunk_rows=64) == expected
+
+
+def test_representative_keeps_the_selection_order():
+    notes = {1: "отчёт клиенту", 2: "отчёт клиенту бюджет", 3: "кот корм", 4: "отчёт бюджет клиент", 5: "дача"}
+    index = SimilarityIndex()
+    index.build(1, notes)
+    assert index.representative(index.snapshot(1), [5, 4, 2, 1], 2) == [4, 2]
+    assert index.representative(index.snapshot(1), [3, 1, 99], 5) == [3, 1]
+
+
+def test_note_manager_answers():
+    note_manager = NoteManager(UserDataManager(MemoryStorage()), ReminderScheduler())
+    for text in ["купить молоко и хлеб", "позвонить маме", "Купить молоко и хлеб", "купить хлеб"]:
+        note_manager._add_note(1, text)
+
+    assert note_manager.find_duplicates(1).startswith("🧹 Почти одинаковые заметки (групп: 1):\n\n• 1, 3\n")
+    answer = note_manager.similar_notes(1, "4")
+    assert answer.startswith("🔗 Похожие на заметку 4:\n\n")
+    assert [line.split(".")[0] for line in answer.split("\n\n")[1:-1]] == ["1", "3"]
+    assert note_manager.similar_notes(1, "2") == "Похожих на заметку 2 заметок не найдено."
+    assert note_manager.similar_notes(1, "9") == "Такой заметки нет."
+    assert note_manager.similar_notes(1, "x") == "Пожалуйста, укажите корректный номер заметки."
+
+    # Edits and deletes reach the vectors without a rebuild.
+    note_manager.edit_note(1, note_manager.user_data.resolve_note_id(1, 3), "позвонить маме вечером")
+    assert note_manager.find_duplicates(1) == "Повторяющихся заметок не найдено."
+    assert note_manager.delete_note(1, "1")
+    assert note_manager.similar_notes(1, "2").split("\n\n")[1].startswith("1. (")
+    assert NoteManager(UserDataManager(MemoryStorage()), ReminderScheduler()).find_duplicates(1) == \
+        "У вас пока нет заметок."
@@ -0,0 +1,81 @@
+import sqlite3
+import threading
+from datetime import datetime
+
+import pytest
+
+from Note_bot.main.data.Storage import SQLiteStorage
+from Note_bot.main.data.UserDataManager import UserDataManager
+
+
+def read(path, sql, params=()):
+    connection = sqlite3.connect(path)
+    try:
+        return connection.execute(sql, params).fetchall()
+    finally:
+        connection.close()
+
+
+def test_durable_write_is_committed_when_the_call_returns(tmp_path):
+    path = str(tmp_path / "notes.db")
+    storage = SQLiteStorage(path, flush_interval=10)
+    user_data = UserDataManager(storage)
+    try:
+        note_id = user_data.add_note(1, "купить молоко")
+        user_data.add_reminder(1, note_id, datetime(2030, 1, 1, 9, 0))
+        # Another connection sees both rows without a flush, although the batching interval is 10 s.
+        assert read(path, "SELECT note_id, note_text FROM notes") == [(note_id, "купить молоко")]
+        assert read(path, "SELECT last_note_id FROM note_ids WHERE chat_id = 1") == [(note_id,)]
+        assert len(read(path, "SELECT * FROM reminders")) == 1
+    finally:
+        user_data.close()
+
+
+def test_concurrent_writes_share_commits(tmp_path):
+    storage = SQLiteStorage(str(tmp_path / "notes.db"))
+    user_data = UserDataManager(storage)
+    commits = []
+    execute = storage._execute
+
+    def counting_execute(groups):
+        commits.append(len(groups))
+        return execute(groups)
+
+    storage._execute = counting_execute
+    def add_notes(chat_id):
+        for number in range(50):
+            user_data.add_note(chat_id, f"заметка {number}")
+
+    threads = [threading.Thread(target=add_notes, args=(chat_id,)) for chat_id in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    user_data.close()
+
+    assert sum(commits) == 16 * 50
+    assert len(commits) < 16 * 50  # several callers were committed together
+
+
+def test_failing_write_is_dropped_alone(tmp_path):
+    path = str(tmp_path / "notes.db")
+    storage = SQLiteStorage(path, flush_interval=10)
+    with storage.connection_lock:
+        storage.connection.execute(
+            "CREATE TRIGGER reject BEFORE INSERT ON notes WHEN NEW.note_text = 'плохая' "
+            "BEGIN SELECT RAISE(ABORT, 'rejected'); END"
+        )
+    user_data = UserDataManager(storage)
+    try:
+        # Writes behind wait for the batching interval, so they share the failing note's transaction.
+        for chat_id in range(2, 6):
+            user_data.update_user_statistics(chat_id, "notes_created")
+        with pytest.raises(sqlite3.IntegrityError):
+            user_data.add_note(1, "плохая")
+        assert user_data.get_user_notes(1) == {}
+
+        assert user_data.add_note(1, "хорошая") == 2  # the rejected note's id stays retired
+        assert read(path, "SELECT note_text FROM notes") == [("хорошая",)]
+        assert len(read(path, "SELECT chat_id FROM statistics")) == 4
+    finally:
+        user_data.close()
@@ -0,0 +1,97 @@
+from datetime import datetime
+
+import pytest
+
+from Note_bot.main.service.TimeParser import TimeParser, add_months, parse_phrase
+
+NOW = datetime(2024, 1, 31, 14, 20, 45)  # a Wednesday
+
+
+@pytest.fixture
+def parser():
+    return TimeParser()
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("позвонить через 5 минут", datetime(2024, 1, 31, 14, 25, 45)),
+    ("через минуту", datetime(2024, 1, 31, 14, 21, 45)),
+    ("через полчаса", datetime(2024, 1, 31, 14, 50, 45)),
+    ("выключить духовку через полчаса", datetime(2024, 1, 31, 14, 50, 45)),
+    ("забрать посылку через 40 минут", datetime(2024, 1, 31, 15, 0, 45)),
+    ("через час", datetime(2024, 1, 31, 15, 20, 45)),
+    ("через 3 часа", datetime(2024, 1, 31, 17, 20, 45)),
+    ("кофе с Мишей через 1 час", datetime(2024, 1, 31, 15, 20, 45)),
+    ("через день", datetime(2024, 2, 1, 14, 20, 45)),
+    ("через 10 дней", datetime(2024, 2, 10, 14, 20, 45)),
+    ("заехать в сервис через 5 дней", datetime(2024, 2, 5, 14, 20, 45)),
+    ("обновить резюме через 2 недели", datetime(2024, 2, 14, 14, 20, 45)),
+    ("через неделю", datetime(2024, 2, 7, 14, 20, 45)),
+    ("через месяц", datetime(2024, 2, 29, 14, 20, 45)),  # clamped to the end of the shorter month
+    ("через 13 месяцев", datetime(2025, 2, 28, 14, 20, 45)),
+])
+def test_relative_times(parser, text, expected):
+    assert parser.extract(text, NOW) == expected
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("сегодня в 18:30", datetime(2024, 1, 31, 18, 30)),
+    ("сегодня в 9", datetime(2024, 1, 31, 9, 0)),  # an explicit day is kept even if the time has passed
+    ("завтра в 9", datetime(2024, 2, 1, 9, 0)),
+    ("послезавтра в 7 вечера", datetime(2024, 2, 2, 19, 0)),
+    ("в 15:00", datetime(2024, 1, 31, 15, 0)),
+    ("в 14:20", datetime(2024, 2, 1, 14, 20)),  # not later than now, so tomorrow
+    ("в 10", datetime(2024, 2, 1, 10, 0)),
+    ("в 7 вечера", datetime(2024, 1, 31, 19, 0)),
+    ("5 дня", datetime(2024, 1, 31, 17, 0)),
+    ("в 12 дня", datetime(2024, 2, 1, 12, 0)),
+    ("в 12 ночи", datetime(2024, 2, 1, 0, 0)),
+    ("в 3 ночи", datetime(2024, 2, 1, 3, 0)),
+    ("в 11 ночи", datetime(2024, 1, 31, 23, 0)),
+    ("в 12 утра", datetime(2024, 2, 1, 0, 0)),
+    ("Встреча Завтра В 9:05", datetime(2024, 2, 1, 9, 5)),
+])
+def test_clock_times(parser, text, expected):
+    assert parser.extract(text, NOW) == expected
+
+
+@pytest.mark.parametrize("text", [
+    "купить молоко", "в 25", "в 10:75", "через", "комната 101, этаж 3", "в 123", "прочитать статью про asyncio",
+])
+def test_text_without_a_valid_time(parser, text):
+    assert parser.extract(text, NOW) is None
+
+
+@pytest.mark.parametrize("phrase, spec", [
+    ("через 2 недели", ("relative", "weeks", 2)),
+    ("завтра в 9 вечера", ("clock", 1, 21, 0)),
+    ("в 8:15", ("clock", None, 8, 15)),
+    ("в 24", None),
+])
+def test_parse_phrase(phrase, spec):
+    assert parse_phrase(phrase) == spec
+
+
+def test_add_months_crosses_the_year():
+    assert add_months(datetime(2023, 12, 31), 2) == datetime(2024, 2, 29)
+
+
+class TestFallback:
+    @pytest.fixture(autouse=True)
+    def dateparser(self):
+        pytest.importorskip("dateparser")
+
+    def test_date_goes_to_the_fallback(self, parser):
+        assert parser.extract("день рождения 15 марта", NOW) == datetime(2024, 3, 15, 0, 0)
+
+    def test_date_before_a_clock_time_takes_the_whole_phrase(self, parser):
+        # "в 10" alone would match the fast path; the date in front of it decides the day.
+        assert parser.extract("15 марта в 10", NOW) == datetime(2024, 3, 15, 10, 0)
+
+    def test_clock_time_before_a_date_stays_on_the_fast_path(self, parser):
+        assert parser.extract("в 10 утра, а 15 марта отпуск", NOW) == datetime(2024, 2, 1, 10, 0)
+
+    def test_weekday(self, parser):
+        assert parser.extract("созвон в пятницу", NOW).date() == datetime(2024, 2, 2).date()
+
+    def test_invalid_fast_path_time_falls_back(self, parser):
+        assert parser.extract("в 25 часов, 1 мая", NOW).date() == datetime(2024, 5, 1).date()
@@ -0,0 +1,74 @@
+import asyncio
+
+from Note_bot.main.UpdateDispatcher import UpdateDispatcher
+
+
+def update(update_id, chat_id, text="заметка"):
+    return {"update_id": update_id, "message": {
+        "message_id": update_id, "date": 0, "text": text, "chat": {"id": chat_id, "type": "private"},
+    }}
+
+
+class FakeBot:
+    def __init__(self):
+        self.handled = []
+        self.release = asyncio.Event()
+
+    async def process_new_updates(self, updates):
+        for new_update in updates:
+            if new_update.message.text == "медленно":
+                await self.release.wait()
+            self.handled.append((new_update.message.chat.id, new_update.update_id))
+
+
+def test_a_slow_update_holds_up_only_its_own_chat():
+    async def scenario():
+        bot = FakeBot()
+        dispatcher = UpdateDispatcher(bot, workers=4)
+        dispatcher.start()
+        await dispatcher.put(update(1, 1, "медленно"))
+        await dispatcher.put(update(2, 1))
+        for update_id in range(3, 8):
+            await dispatcher.put(update(update_id, 5))  # shared a fixed worker queue with chat 1 before
+        for _ in range(500):
+            if len(bot.handled) == 5:
+                break
+            await asyncio.sleep(0.01)
+
+        assert bot.handled == [(5, update_id) for update_id in range(3, 8)]
+        bot.release.set()
+        await asyncio.wait_for(dispatcher.stop(), 5)
+        return bot.handled
+
+    handled = asyncio.run(scenario())
+    assert [update_id for chat_id, update_id in handled if chat_id == 1] == [1, 2]
+    assert len(handled) == 7
+
+
+def test_submit_sheds_load_once_full():
+    async def scenario():
+        bot = FakeBot()
+        dispatcher = UpdateDispatcher(bot, workers=1, queue_size=2)
+        dispatcher.start()
+        accepted = [dispatcher.submit(update(1, 1, "медленно")), dispatcher.submit(update(2, 2)),
+                    dispatcher.submit(update(3, 3))]
+        bot.release.set()
+        await asyncio.wait_for(dispatcher.stop(), 5)
+        return accepted, bot.handled
+
+    accepted, handled = asyncio.run(scenario())
+    assert accepted == [True, True, False]
+    assert sorted(handled) == [(1, 1), (2, 2)]
+
+
+def test_a_failing_update_does_not_stop_its_chat():
+    async def scenario():
+        bot = FakeBot()
+        dispatcher = UpdateDispatcher(bot)
+        dispatcher.start()
+        await dispatcher.put({"update_id": 1, "message": {"chat": {"id": 1}}})  # not a parseable message
+        await dispatcher.put(update(2, 1))
+        await asyncio.wait_for(dispatcher.stop(), 5)
+        return bot.handled
+
+    assert asyncio.run(scenario()) == [(1, 2)]